@@ -9,6 +9,7 @@ echo '[-] Installed pip dependencies'
 echo '[-] Migrating database...'
 export FLASK_APP=manage.py
 export FLASK_CONFIG=prod
+flask name-constraints
 flask db migrate
 flask db upgrade
 echo '[-] Migrated database'
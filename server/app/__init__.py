@@ -13,6 +13,12 @@ def create_app(config_name):
 
     repos = repository.get(app)
     domain.inject_repos(**repos)
+    domain.configure(
+        secret_key=app.config['SECRET_KEY'],
+        token_cache_size=app.config['TOKEN_CACHE_SIZE'],
+        resolve_max_staleness=app.config['RESOLVE_MAX_STALENESS'],
+        event_backlog_size=app.config['EVENT_BACKLOG_SIZE'],
+        change_log_size=app.config['CHANGE_LOG_SIZE'])
 
     from . import views
     views.register(app)
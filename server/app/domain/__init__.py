@@ -1,9 +1,33 @@
-from .repos import AdminRepo, ServiceRepo, HostRepo
+from .repos import (AdminRepo, ServiceRepo, HostRepo, CatalogRepo,
+                    TransactionManager, ServiceStatusRepo, ProbeHistoryRepo,
+                    ChangeLogRepo)
 from .registry import repos
+from . import usecases
+from .usecases import token_cache, service_index, event_bus
+from .utils import set_secret_key
 
 
 def inject_repos(*, admin: AdminRepo = None, host: HostRepo = None,
-                 service: ServiceRepo = None):
+                 service: ServiceRepo = None, catalog: CatalogRepo = None,
+                 transaction: TransactionManager = None,
+                 service_status: ServiceStatusRepo = None,
+                 probe_history: ProbeHistoryRepo = None,
+                 change_log: ChangeLogRepo = None):
     for key, value in locals().items():
         if value:
             repos.build(**{key: value})
+
+
+def configure(*, secret_key=None, token_cache_size=None,
+              resolve_max_staleness=None, event_backlog_size=None,
+              change_log_size=None):
+    if secret_key:
+        set_secret_key(secret_key)
+    if token_cache_size:
+        token_cache.resize(token_cache_size)
+    if resolve_max_staleness is not None:
+        service_index.max_staleness = resolve_max_staleness
+    if event_backlog_size:
+        event_bus.resize(event_backlog_size)
+    if change_log_size:
+        usecases.change_log_size = change_log_size
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from threading import Lock
+
+from .utils import now
+
+
+class LRUCache(object):
+    r"""Thread-safe, size-bounded mapping evicting least recently used keys.
+
+    Entries may carry an ``expires_at`` datetime after which they are
+    treated as missing. ``hits`` and ``misses`` count lookups.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._stamp = None
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or now() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def validate(self, stamp):
+        r"""Drop every entry when ``stamp`` differs from the previous one.
+
+        :param stamp: any comparable value describing what the cached
+                      entries were derived from
+        """
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._entries.clear()
+                    self._stamp = stamp
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
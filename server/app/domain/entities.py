@@ -1,46 +1,134 @@
+from datetime import datetime
 from typing import NamedTuple
 
-from .utils import encrypt_irreversibly, encrypt_with_jwt, datetime_from_str, \
-    datetime_to_str, is_auth_time_valid
+from .utils import encrypt_irreversibly, encrypt_with_jwt, \
+    is_auth_time_valid, is_issued_after, claims_auth_at, datetime_to_epoch, \
+    auth_valid_period
 from .errors import EmptyField
 from .registry import repos
+from .timing import phase
+
+
+def _token_claims(auth_at, **claims):
+    iat = datetime_to_epoch(auth_at)
+    return dict(claims, iat=iat,
+                exp=int(iat) + int(auth_valid_period().total_seconds()))
 
 
 class Entity(object):
-    pass
+    __slots__ = ()
 
 
 class ValueObject(NamedTuple):
     pass
 
 
+_PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _traverse(value):
+    if value.__class__ in _PLAIN_TYPES:
+        return value
+    elif isinstance(value, ToDictMixin):
+        return value.to_dict()
+    elif isinstance(value, (list, tuple)):
+        return [_traverse(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: _traverse(value) for key, value in value.items()}
+    else:
+        return value
+
+
+def _parse_field(field):
+    if isinstance(field, tuple) or isinstance(field, list):
+        key, *rest = field
+        alias = rest[0] if rest else key
+    elif isinstance(field, str):
+        key = field
+        alias = key
+    else:
+        raise TypeError()
+    return key, alias
+
+
+def _compile_serializer(dict_fields):
+    r"""Generate a ``to_dict`` function specialised for ``dict_fields``.
+
+    Field specs are parsed once here so that serializing an instance is a
+    single dict display of attribute loads. Calls with ``fields`` are
+    handed over to the serializer compiled for that projection.
+    """
+    items = []
+    for field in dict_fields:
+        key, alias = _parse_field(field)
+        if key.isidentifier():
+            getter = 'self.{key}'.format(key=key)
+        else:
+            getter = 'getattr(self, {key!r})'.format(key=key)
+        items.append('{alias!r}: _traverse({getter})'.format(alias=alias,
+                                                            getter=getter))
+    source = ('def to_dict(self, fields=None):\n'
+              '    if fields is not None:\n'
+              '        return self._projection(fields)(self)\n'
+              '    return {{{items}}}\n').format(items=', '.join(items))
+    namespace = {'_traverse': _traverse}
+    exec(source, namespace)
+    to_dict = namespace['to_dict']
+    to_dict.compiled = True
+    return to_dict
+
+
 class ToDictMixin(object):
+    __slots__ = ()
     _dict_fields = tuple()
+    dict_keys = tuple()
+    _projections = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Keep a to_dict written by hand, in the class or a base.
+        if cls.to_dict is ToDictMixin.to_dict or \
+                getattr(cls.to_dict, 'compiled', False):
+            cls.to_dict = _compile_serializer(cls._dict_fields)
+        cls.dict_keys = tuple(_parse_field(field)[1]
+                              for field in cls._dict_fields)
+        cls._projections = {}
+
+    def to_dict(self, fields=None):
+        return {}
 
-    def to_dict(self):
-        return dict(self._parse_field(field) for field in self._dict_fields)
+    @classmethod
+    def _projection(cls, fields):
+        key = tuple(alias for alias in cls.dict_keys if alias in fields)
+        serializer = cls._projections.get(key)
+        if serializer is None:
+            serializer = _compile_serializer(
+                [field for field, alias in zip(cls._dict_fields,
+                                               cls.dict_keys)
+                 if alias in key])
+            cls._projections[key] = serializer
+        return serializer
 
-    def _parse_field(self, field):
-        if isinstance(field, tuple) or isinstance(field, list):
-            key, *rest = field
-            alias = rest[0] if rest else key
-        elif isinstance(field, str):
-            key = field
-            alias = key
-        else:
-            raise TypeError()
-        value = getattr(self, key)
-        return alias, self._traverse(value)
-
-    def _traverse(self, value):
-        if isinstance(value, ToDictMixin):
-            return value.to_dict()
-        elif isinstance(value, (list, tuple)):
-            return [self._traverse(item) for item in value]
-        elif isinstance(value, dict):
-            return {key: self._traverse(value) for key, value in value.items()}
-        else:
-            return value
+
+def serialize_many(entities, fields=None):
+    r"""Serialize an iterable of :class:`ToDictMixin` instances.
+
+    :param fields: keys to keep in each dict, None for all of them
+    :rtype: list of dict
+    """
+    with phase('serialize'):
+        return [entity.to_dict(fields) for entity in entities]
+
+
+def serialize_each(entities, fields=None):
+    r"""Lazy :func:`serialize_many`, for streamed responses.
+
+    :return: generator of dict
+    """
+    for entity in entities:
+        with phase('serialize'):
+            adict = entity.to_dict(fields)
+        yield adict
 
 
 class Admin(Entity):
@@ -88,12 +176,12 @@ class Admin(Entity):
         return self.sign == sign
 
     def is_auth_valid(self):
-        return self.auth_at and self.auth_at > self.updated_at and \
+        return self.auth_at and \
+               is_issued_after(self.auth_at, self.updated_at) and \
                is_auth_time_valid(self.auth_at)
 
     def token(self):
-        return encrypt_with_jwt(
-            {'role': self.role, 'auth_at': datetime_to_str(self.auth_at)})
+        return encrypt_with_jwt(_token_claims(self.auth_at, role=self.role))
 
 
 class Anonymous(Entity):
@@ -105,20 +193,20 @@ class Anonymous(Entity):
 
     def is_auth_valid(self, admin: Admin):
         return self.auth_at and self.sign == admin.sign and \
-               self.auth_at > admin.updated_at and \
+               is_issued_after(self.auth_at, admin.updated_at) and \
                is_auth_time_valid(self.auth_at)
 
     @classmethod
     def from_dict(cls, adict):
-        return cls(adict['sign'], datetime_from_str(adict['auth_at']))
+        return cls(adict['sign'], claims_auth_at(adict))
 
     def token(self):
-        return encrypt_with_jwt(
-            {'role': self.role, 'sign': self.sign,
-             'auth_at': datetime_to_str(self.auth_at)})
+        return encrypt_with_jwt(_token_claims(self.auth_at, role=self.role,
+                                              sign=self.sign))
 
 
 class Host(Entity, ToDictMixin):
+    __slots__ = ('_id', '_name', 'detail', '_address', 'services')
     _dict_fields = ('id', 'name', 'detail', 'address', 'services')
 
     def __init__(self, id, name, detail, address, services=None):
@@ -130,6 +218,21 @@ class Host(Entity, ToDictMixin):
         if services:
             self.services.extend(services)
 
+    @classmethod
+    def from_row(cls, id, name, detail, address, services=None):
+        r"""Build a host from trusted, already validated storage data.
+
+        Skips the field validation of :meth:`__init__`; only repositories
+        should use it. ``services`` is taken over without being copied.
+        """
+        host = cls.__new__(cls)
+        host._id = id
+        host._name = name
+        host.detail = detail
+        host._address = address
+        host.services = services if services is not None else []
+        return host
+
     def add_new_service(self, name, detail, port):
         service_id = repos.service.next_identity()
         new_service = Service(service_id, name, detail, port)
@@ -168,6 +271,7 @@ class Host(Entity, ToDictMixin):
 
 
 class Service(Entity, ToDictMixin):
+    __slots__ = ('_id', '_name', 'detail', '_port')
     _dict_fields = ('id', 'name', 'detail', 'port')
 
     def __init__(self, id, name, detail, port):
@@ -176,6 +280,20 @@ class Service(Entity, ToDictMixin):
         self.detail = detail
         self.port = port
 
+    @classmethod
+    def from_row(cls, id, name, detail, port):
+        r"""Build a service from trusted, already validated storage data.
+
+        Skips the field validation of :meth:`__init__`; only repositories
+        should use it.
+        """
+        service = cls.__new__(cls)
+        service._id = id
+        service._name = name
+        service.detail = detail
+        service._port = port
+        return service
+
     @property
     def id(self):
         return self._id
@@ -205,3 +323,10 @@ class Service(Entity, ToDictMixin):
         if not port:
             raise EmptyField('port')
         self._port = port
+
+
+class ServiceStatus(NamedTuple):
+    service_id: str
+    reachable: bool
+    latency: float
+    checked_at: datetime
@@ -19,9 +19,38 @@ class EmptyField(SDException):
         self.field = field
 
 
+class InvalidType(SDException):
+    def __init__(self, field, expected):
+        r"""
+
+        :param expected: JSON type the field should have, such as 'array'
+        """
+        self.field = field
+        self.expected = expected
+
+
 class NoAdministratorFound(SDException):
     pass
 
 
 class RequiredPropertyNotProvided(SDException):
     pass
+
+
+class HostNotFound(SDException):
+    pass
+
+
+class NoProbeHistory(SDException):
+    pass
+
+
+class InvalidBatch(SDException):
+    def __init__(self, errors):
+        r"""
+
+        :param errors: list of {'index': position in the batch,
+                                'field': invalid field,
+                                'msg': what is wrong with it}
+        """
+        self.errors = errors
@@ -0,0 +1,72 @@
+from collections import deque
+from threading import Condition
+from typing import NamedTuple
+
+
+class Event(NamedTuple):
+    id: int
+    type: str
+    data: dict
+
+
+class EventBus(object):
+    r"""Catalog events of this process, kept for the last ``maxlen``
+    revisions and delivered to any number of waiting threads.
+
+    Events are identified by the catalog revision of the write that
+    produced them, so that ids mean the same in every process. Revisions
+    missing from the backlog, evicted or written by another process, are
+    reported to subscribers as a gap.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._backlog = deque(maxlen=maxlen)
+        self._condition = Condition()
+
+    @property
+    def maxlen(self):
+        return self._backlog.maxlen
+
+    def resize(self, maxlen):
+        with self._condition:
+            self._backlog = deque(self._backlog, maxlen=maxlen)
+
+    def publish(self, revision, events):
+        r"""
+
+        :param revision: catalog revision of the write
+        :param events: list of ``(type, data)``
+        """
+        if revision is None:
+            return
+        with self._condition:
+            if self._backlog and self._backlog[-1][0] >= revision:
+                return
+            self._backlog.append((revision, [
+                Event(revision, type, data) for type, data in events]))
+            self._condition.notify_all()
+
+    def wait(self, after_id, timeout=None):
+        r"""Events of the revisions after ``after_id``, waiting up to
+        ``timeout`` seconds for one.
+
+        :return: ``(last_id, events, complete)``: the newest revision,
+                 ``after_id`` if none came; the events after ``after_id``,
+                 oldest first; whether no revision is missing among them
+        :rtype: tuple
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._backlog and self._backlog[-1][0] > after_id,
+                timeout)
+            revisions = []
+            for revision, events in reversed(self._backlog):
+                if revision <= after_id:
+                    break
+                revisions.append((revision, events))
+        revisions.reverse()
+        complete = all(revision == after_id + 1 + offset
+                       for offset, (revision, _) in enumerate(revisions))
+        last_id = revisions[-1][0] if revisions else after_id
+        return last_id, [event for _, events in revisions
+                         for event in events], complete
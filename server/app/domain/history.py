@@ -0,0 +1,209 @@
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from math import isnan
+
+# Upper bounds in seconds of the latency histogram bins of the rollups,
+# doubling from 0.25ms; a last bin holds everything slower.
+LATENCY_BINS = tuple(0.00025 * 2 ** i for i in range(14))
+
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<B')
+_RING_HEADER = struct.Struct('<III')
+
+
+class RingBuffer(object):
+    r"""Fixed-capacity table of numeric columns overwriting its oldest row.
+
+    Each column is a preallocated :class:`array.array` of ``typecodes``.
+    """
+
+    def __init__(self, capacity, typecodes):
+        self.capacity = capacity
+        self.columns = [array(typecode, bytes(
+            array(typecode).itemsize * capacity)) for typecode in typecodes]
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, *values):
+        r""":return: index of the new row"""
+        if self.size < self.capacity:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        for column, value in zip(self.columns, values):
+            column[index] = value
+        return index
+
+    def last(self):
+        r""":return: index of the newest row, None when empty"""
+        if not self.size:
+            return None
+        return (self.start + self.size - 1) % self.capacity
+
+    def indexes(self):
+        r"""Row indexes from the oldest to the newest."""
+        for offset in range(self.size):
+            yield (self.start + offset) % self.capacity
+
+    def to_bytes(self):
+        chunks = [_RING_HEADER.pack(self.capacity, self.start, self.size)]
+        for column in self.columns:
+            if sys.byteorder != 'little':
+                column = array(column.typecode, column)
+                column.byteswap()
+            chunks.append(column.tobytes())
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, typecodes, data, offset=0):
+        r""":return: the ring buffer and the offset right after it"""
+        capacity, start, size = _RING_HEADER.unpack_from(data, offset)
+        offset += _RING_HEADER.size
+        ring = cls(capacity, typecodes)
+        ring.start, ring.size = start, size
+        for column in ring.columns:
+            length = column.itemsize * capacity
+            column[:] = array(column.typecode, data[offset:offset + length])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            offset += length
+        return ring, offset
+
+
+class Rollup(object):
+    r"""Probe results aggregated per ``period`` seconds: number of probes,
+    number of successes and a histogram of latencies over
+    :data:`LATENCY_BINS`, for the last ``capacity`` periods.
+    """
+
+    typecodes = ('I', 'H', 'H') + ('H',) * (len(LATENCY_BINS) + 1)
+
+    def __init__(self, period, capacity, ring=None):
+        self.period = period
+        self.ring = ring if ring is not None else RingBuffer(
+            capacity, self.typecodes)
+
+    @property
+    def retention(self):
+        return self.period * self.ring.capacity
+
+    def add(self, at, reachable, latency):
+        slot = int(at // self.period)
+        columns = self.ring.columns
+        index = self.ring.last()
+        if index is None or columns[0][index] != slot:
+            index = self.ring.append(slot, *(0,) * (len(columns) - 1))
+        # Counters saturate rather than wrap around.
+        columns[1][index] = min(columns[1][index] + 1, 0xFFFF)
+        if reachable:
+            columns[2][index] = min(columns[2][index] + 1, 0xFFFF)
+            bin_column = columns[3 + bisect_left(LATENCY_BINS, latency)]
+            bin_column[index] = min(bin_column[index] + 1, 0xFFFF)
+
+    def totals(self, since, until):
+        r"""Sum the periods overlapping ``[since, until]``.
+
+        :return: probes, successes and the latency histogram
+        """
+        first, last = int(since // self.period), int(until // self.period)
+        columns = self.ring.columns
+        probes = successes = 0
+        histogram = [0] * (len(columns) - 3)
+        for index in self.ring.indexes():
+            if first <= columns[0][index] <= last:
+                probes += columns[1][index]
+                successes += columns[2][index]
+                for position, column in enumerate(columns[3:]):
+                    histogram[position] += column[index]
+        return probes, successes, histogram
+
+
+def _percentile(histogram, percentile):
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = total * percentile / 100
+    seen = 0
+    for position, count in enumerate(histogram):
+        seen += count
+        if count and seen >= rank:
+            break
+    return LATENCY_BINS[min(position, len(LATENCY_BINS) - 1)]
+
+
+class ProbeHistory(object):
+    r"""Probe results of one service: the last ``raw_size`` probes, and
+    rollups per minute and per hour answering window queries without
+    going through single probes.
+
+    Times are seconds since the epoch. Percentiles are approximated by the
+    upper bound of their histogram bin.
+    """
+
+    raw_typecodes = ('d', 'f', 'B')
+
+    def __init__(self, *, raw_size=128, minutes=360, hours=720):
+        self.raw = RingBuffer(raw_size, self.raw_typecodes)
+        self.minutes = Rollup(60, minutes)
+        self.hours = Rollup(3600, hours)
+
+    def record(self, at, reachable, latency=None):
+        self.raw.append(at, float('nan') if latency is None else latency,
+                        bool(reachable))
+        for rollup in (self.minutes, self.hours):
+            rollup.add(at, reachable, latency)
+
+    def samples(self):
+        r""":return: list of ``(at, reachable, latency)``, oldest first"""
+        at, latency, reachable = self.raw.columns
+        return [(at[index], bool(reachable[index]),
+                 None if isnan(latency[index]) else latency[index])
+                for index in self.raw.indexes()]
+
+    def summary(self, since, until, percentiles=(50, 90, 99)):
+        r"""Uptime and latency percentiles over ``[since, until]``, from the
+        minute rollup when the window fits its retention, hours otherwise.
+
+        :return: {'probes', 'uptime': ratio or None,
+                  'latency': {'p50': seconds or None, ...}}
+        """
+        rollup = self.minutes
+        if until - since > self.minutes.retention:
+            rollup = self.hours
+        probes, successes, histogram = rollup.totals(since, until)
+        return {
+            'probes': probes,
+            'uptime': successes / probes if probes else None,
+            'latency': {'p{}'.format(percentile):
+                        _percentile(histogram, percentile)
+                        for percentile in percentiles}}
+
+    def to_bytes(self):
+        return zlib.compress(_HEADER.pack(_FORMAT_VERSION) + b''.join(
+            ring.to_bytes()
+            for ring in (self.raw, self.minutes.ring, self.hours.ring)))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        version, = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(
+                'Unknown probe history format {}.'.format(version))
+        history = cls.__new__(cls)
+        offset = _HEADER.size
+        history.raw, offset = RingBuffer.from_bytes(
+            cls.raw_typecodes, data, offset)
+        ring, offset = RingBuffer.from_bytes(Rollup.typecodes, data, offset)
+        history.minutes = Rollup(60, ring.capacity, ring)
+        ring, offset = RingBuffer.from_bytes(Rollup.typecodes, data, offset)
+        history.hours = Rollup(3600, ring.capacity, ring)
+        return history
@@ -0,0 +1,242 @@
+from bisect import bisect_left
+from threading import Lock, local
+
+# Upper bounds in seconds of the latency histograms.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded(object):
+    r"""Lists of numbers, one per thread, summed when collected.
+
+    A thread only ever writes its own shard, so recording takes no lock;
+    the lock is taken once per thread to register its shard.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = local()
+        self._shards = []
+        self._lock = Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [0] * self._size
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _totals(self):
+        totals = [0] * self._size
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+
+class Counter(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self._shard()[0] += amount
+
+    def value(self):
+        return self._totals()[0]
+
+
+class Histogram(_Sharded):
+    r"""Counts of observations in fixed ``buckets``, and their sum."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket, one for +Inf, then the sum.
+        super().__init__(len(self.buckets) + 2)
+
+    def observe(self, value):
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def value(self):
+        r""":return: cumulative counts of the buckets and +Inf, and the sum"""
+        totals = self._totals()
+        cumulative, seen = [], 0
+        for count in totals[:-1]:
+            seen += count
+            cumulative.append(seen)
+        return cumulative, totals[-1]
+
+
+class Family(object):
+    r"""Metric ``name`` with one child per combination of label values."""
+
+    def __init__(self, name, help, type, labelnames, factory):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def samples(self):
+        r""":return: list of ``(suffix, labels, value)``"""
+        with self._lock:
+            children = sorted(self._children.items())
+        samples = []
+        for values, child in children:
+            labels = list(zip(self.labelnames, values))
+            if self.type == 'histogram':
+                counts, total = child.value()
+                bounds = [_format_value(bound) for bound in child.buckets]
+                for bound, count in zip(bounds + ['+Inf'], counts):
+                    samples.append(('_bucket', labels + [('le', bound)],
+                                    count))
+                samples.append(('_sum', labels, total))
+                samples.append(('_count', labels, counts[-1]))
+            else:
+                samples.append(('', labels, child.value()))
+        return samples
+
+
+class _Callback(object):
+    def __init__(self, name, help, type, collect):
+        self.name = name
+        self.help = help
+        self.type = type
+        self._collect = collect
+
+    def samples(self):
+        return [('', sorted(labels.items()), value)
+                for labels, value in self._collect()]
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return '{:.1f}'.format(value)
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace(
+        '"', r'\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value))
+                          for name, value in labels) + '}'
+
+
+class Registry(object):
+    r"""Metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Family(name, help, 'counter', labelnames, Counter))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Family(name, help, 'histogram', labelnames,
+                                lambda: Histogram(buckets)))
+
+    def callback(self, name, help, type, collect):
+        r"""Metric read when rendered.
+
+        :param collect: callable returning a list of ``(labels, value)``,
+                        labels being a dict
+        """
+        with self._lock:
+            self._metrics[name] = _Callback(name, help, type, collect)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(),
+                             key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            for suffix, labels, value in metric.samples():
+                lines.append('{}{}{} {}'.format(
+                    metric.name, suffix, _format_labels(labels),
+                    _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+_caches = {}
+_statements = local()
+
+db_statements = registry.counter(
+    'db_statements_total', 'SQL statements executed.').labels()
+db_seconds = registry.counter(
+    'db_statement_seconds_total', 'Seconds spent executing SQL statements.'
+).labels()
+
+
+def start_statements():
+    r"""Count the SQL statements of the current thread from now on."""
+    _statements.count, _statements.seconds = 0, 0.0
+
+
+def stop_statements():
+    r""":return: number and seconds of the statements counted since
+             :func:`start_statements`, None if not counting"""
+    count = getattr(_statements, 'count', None)
+    if count is None:
+        return None
+    seconds = _statements.seconds
+    _statements.count = None
+    return count, seconds
+
+
+def record_statement(seconds):
+    db_statements.inc()
+    db_seconds.inc(seconds)
+    if getattr(_statements, 'count', None) is not None:
+        _statements.count += 1
+        _statements.seconds += seconds
+
+
+def register_cache(name, cache):
+    r"""Report the hit ratio of ``cache``, any object with a ``stats()``
+    returning ``hits`` and ``misses``, as ``name``."""
+    _caches[name] = cache
+
+
+def _cache_samples(key):
+    samples = []
+    for name, cache in sorted(_caches.items()):
+        stats = cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        value = stats[key] if key != 'ratio' else \
+            stats['hits'] / lookups if lookups else 0.0
+        samples.append(({'cache': name}, value))
+    return samples
+
+
+registry.callback('cache_hits_total', 'Cache lookups found.', 'counter',
+                  lambda: _cache_samples('hits'))
+registry.callback('cache_misses_total', 'Cache lookups missed.', 'counter',
+                  lambda: _cache_samples('misses'))
+registry.callback('cache_hit_ratio', 'Hits over lookups of caches.', 'gauge',
+                  lambda: _cache_samples('ratio'))
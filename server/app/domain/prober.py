@@ -0,0 +1,56 @@
+import asyncio
+from time import monotonic
+
+
+async def probe(address, port, timeout):
+    r"""Try one TCP connection.
+
+    :return: ``(reachable, latency in seconds or None)``
+    """
+    started_at = monotonic()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port), timeout)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # Not only OSError and timeouts: an invalid address raises
+        # UnicodeError and a port out of range OverflowError, which must not
+        # abort the other probes.
+        return False, None
+    latency = monotonic() - started_at
+    writer.close()
+    return True, latency
+
+
+async def _probe(address, port, timeout, semaphore):
+    async with semaphore:
+        return await probe(address, port, timeout)
+
+
+async def _probe_all(endpoints, concurrency, timeout):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(_probe(address, port, timeout, semaphore)
+          for address, port in endpoints))
+
+
+def probe_endpoints(endpoints, *, concurrency=500, timeout=1.0):
+    r"""Try a TCP connection to every ``(address, port)`` concurrently.
+
+    Runs its own event loop, so it must not be called from a coroutine.
+
+    :param concurrency: maximum number of connections in flight
+    :param timeout: seconds to wait for each connection
+    :return: ``(reachable, latency in seconds or None)`` for each endpoint,
+             in order
+    :rtype: list of tuple
+    """
+    if not endpoints:
+        return []
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(
+            _probe_all(endpoints, concurrency, timeout))
+    finally:
+        loop.close()
@@ -1,6 +1,6 @@
 from abc import ABCMeta, abstractmethod
 
-from .entities import Admin, Host, Service
+from .entities import Admin, Host, Service, ServiceStatus
 
 
 class AdminRepo(metaclass=ABCMeta):
@@ -17,6 +17,15 @@ class AdminRepo(metaclass=ABCMeta):
     def set(self, admin: Admin):
         pass
 
+    @abstractmethod
+    def version(self):
+        r"""Stamp that changes every time the administrator is set.
+
+        :return: None if no administrator has been set yet
+        :rtype: int
+        """
+        pass
+
 
 class HostRepo(metaclass=ABCMeta):
     @abstractmethod
@@ -24,7 +33,21 @@ class HostRepo(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def save(self, host: Host):
+    def save(self, host: Host, *, include_services=True):
+        r"""Insert or update ``host``.
+
+        :param include_services: also make the stored services of the host
+                                 exactly ``host.services``; when False they
+                                 are left untouched
+        """
+        pass
+
+    @abstractmethod
+    def save_many(self, hosts):
+        r"""Insert new hosts with their services in one write.
+
+        :param hosts: list of Host
+        """
         pass
 
     @abstractmethod
@@ -32,9 +55,23 @@ class HostRepo(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def all(self):
+    def delete_many(self, ids):
+        r"""Delete hosts, and their services, in one write.
+
+        :param ids: list of host ids, unknown ones are ignored
+        :return: ids of the deleted hosts, once each, in the order of ``ids``
+        :rtype: list
+        """
+        pass
+
+    @abstractmethod
+    def all(self, *, fields=None, include_services=True):
         r"""
 
+        :param fields: host attributes needed besides the id, None for all;
+                       the others may be left None
+        :param include_services: whether services are needed, otherwise
+                                 they may be left empty
         :return:
         :rtype: list of Host
         """
@@ -42,12 +79,59 @@ class HostRepo(metaclass=ABCMeta):
 
     @abstractmethod
     def host_of_id(self, host_id):
+        r"""
+
+        :return: None if there is no such host
+        :rtype: Host
+        """
         pass
 
     @abstractmethod
-    def host_of_id(self, host_id):
+    def exists(self, host_id):
+        r"""Whether the host exists, without loading it.
+
+        :rtype: bool
+        """
         pass
 
+    @abstractmethod
+    def lock_for_update(self, host_id):
+        r"""Lock the host until the end of the current transaction.
+
+        Services added meanwhile cannot lose their host to a concurrent
+        delete.
+
+        :return: whether the host exists
+        :rtype: bool
+        """
+        pass
+
+    @abstractmethod
+    def page(self, after_id, limit, *, fields=None, include_services=True):
+        r"""Hosts ordered by id, starting right after ``after_id``.
+
+        :param after_id: id of the last host of the previous page, None for
+                         the first page
+        :param limit: maximum number of hosts to return
+        :param fields: see :meth:`all`
+        :param include_services: see :meth:`all`
+        :rtype: list of Host
+        """
+        pass
+
+    def iterate(self, batch_size=500, *, fields=None, include_services=True):
+        r"""Lazily iterate over all hosts, ``batch_size`` hosts at a time.
+
+        :rtype: iterator of Host
+        """
+        options = {'fields': fields, 'include_services': include_services}
+        hosts = self.page(None, batch_size, **options)
+        while hosts:
+            yield from hosts
+            if len(hosts) < batch_size:
+                break
+            hosts = self.page(hosts[-1].id, batch_size, **options)
+
 
 class ServiceRepo(metaclass=ABCMeta):
     @abstractmethod
@@ -61,3 +145,115 @@ class ServiceRepo(metaclass=ABCMeta):
     @abstractmethod
     def delete(self, id):
         pass
+
+    @abstractmethod
+    def delete_many(self, ids):
+        r"""Delete services in one write.
+
+        :param ids: list of service ids, unknown ones are ignored
+        :return: ids of the deleted services, once each, in the order
+                 of ``ids``
+        :rtype: list
+        """
+        pass
+
+
+class ServiceStatusRepo(metaclass=ABCMeta):
+    @abstractmethod
+    def save_many(self, statuses):
+        r"""Replace the last known status of services in one write.
+
+        :param statuses: list of :class:`ServiceStatus`, those of unknown
+                         services are ignored
+        """
+        pass
+
+    @abstractmethod
+    def status_of(self, service_id):
+        r"""
+
+        :return: None if the service was never probed
+        :rtype: ServiceStatus
+        """
+        pass
+
+
+class ProbeHistoryRepo(metaclass=ABCMeta):
+    @abstractmethod
+    def get_many(self, service_ids):
+        r"""
+
+        :return: histories of the services ever probed
+        :rtype: dict of service id to :class:`ProbeHistory`
+        """
+        pass
+
+    @abstractmethod
+    def save_many(self, histories):
+        r"""Replace histories in one write.
+
+        :param histories: dict of service id to :class:`ProbeHistory`, those
+                          of unknown services are ignored
+        """
+        pass
+
+
+class ChangeLogRepo(metaclass=ABCMeta):
+    @abstractmethod
+    def append(self, revision, changes):
+        r"""Log the changes of a catalog write, inside the current
+        transaction.
+
+        :param revision: catalog revision of the write
+        :param changes: list of ``(type, data)``
+        """
+        pass
+
+    @abstractmethod
+    def after(self, revision, limit):
+        r"""Changes of the oldest revisions after ``revision``, at least
+        ``limit`` of them if there are, revisions being never split.
+
+        :rtype: list of :class:`Event`, oldest first
+        """
+        pass
+
+    @abstractmethod
+    def oldest(self):
+        r"""
+
+        :return: revision of the oldest change kept, None if none is
+        """
+        pass
+
+    @abstractmethod
+    def compact(self, revision):
+        r"""Drop the changes of ``revision`` and older ones."""
+        pass
+
+
+class CatalogRepo(metaclass=ABCMeta):
+    @abstractmethod
+    def revision(self):
+        r"""Revision of the host/service catalog.
+
+        :return: 0 for a catalog that was never modified
+        :rtype: int
+        """
+        pass
+
+    @abstractmethod
+    def bump(self):
+        r"""Increase the revision, inside the current transaction."""
+        pass
+
+
+class TransactionManager(metaclass=ABCMeta):
+    @abstractmethod
+    def atomic(self):
+        r"""Context manager grouping repository writes in one transaction.
+
+        Writes are committed when the outermost block exits and rolled back
+        if it raises. Blocks can be nested.
+        """
+        pass
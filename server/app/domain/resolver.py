@@ -0,0 +1,130 @@
+from threading import Lock
+from time import monotonic
+
+
+class ServiceIndex(object):
+    r"""In-process index from service name to ``address:port`` endpoints.
+
+    The index is stamped with the catalog revision it reflects. A local
+    write applies its change incrementally when it is the very next
+    revision, otherwise the index is dropped and rebuilt on next lookup.
+    Writes of other workers are noticed by re-reading the revision at
+    most once every ``max_staleness`` seconds.
+    """
+
+    def __init__(self, max_staleness=1.0):
+        self.max_staleness = max_staleness
+        self.revision = None
+        self._checked_at = None
+        self._endpoints = {}
+        self._services = {}
+        self._hosts = {}
+        self._names = {}
+        self._lock = Lock()
+
+    def endpoints(self, name):
+        return list(self._endpoints.get(name, ()))
+
+    def is_fresh(self):
+        return self.revision is not None and \
+               monotonic() - self._checked_at < self.max_staleness
+
+    def sync(self, revision, load_hosts):
+        r"""Rebuild the index from ``load_hosts()`` unless it is already at
+        ``revision``.
+        """
+        with self._lock:
+            if revision != self.revision:
+                self._clear()
+                for host in load_hosts():
+                    self._put_host(host)
+                self.revision = revision
+            self._checked_at = monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.revision = None
+
+    def put_hosts(self, revision, hosts, include_services=True):
+        self._apply(revision, lambda: [
+            self._put_host(host, include_services) for host in hosts])
+
+    def remove_hosts(self, revision, ids):
+        self._apply(revision, lambda: [self._remove_host(id) for id in ids])
+
+    def put_service(self, revision, host_id, service):
+        self._apply(revision,
+                    lambda: self._put_service(host_id, service))
+
+    def remove_services(self, revision, ids):
+        self._apply(revision, lambda: self._remove_services(ids))
+
+    def _apply(self, revision, change):
+        with self._lock:
+            if self.revision is not None and self.revision + 1 == revision:
+                change()
+                self.revision = revision
+            else:
+                self.revision = None
+
+    def _clear(self):
+        self._endpoints = {}
+        self._services = {}
+        self._hosts = {}
+        self._names = {}
+
+    def _put_host(self, host, include_services=True):
+        address, service_ids = self._hosts.get(host.id, (None, set()))
+        self._hosts[host.id] = (host.address, service_ids)
+        if include_services:
+            self._remove_services(
+                service_ids - {service.id for service in host.services})
+            for service in host.services:
+                self._put_service(host.id, service)
+        elif address != host.address:
+            self._refresh({self._services[id][1] for id in service_ids})
+
+    def _remove_host(self, id):
+        if id in self._hosts:
+            self._remove_services(set(self._hosts[id][1]))
+            del self._hosts[id]
+
+    def _put_service(self, host_id, service):
+        names = {service.name}
+        if service.id in self._services:
+            old_host_id, old_name, _ = self._services[service.id]
+            self._hosts[old_host_id][1].discard(service.id)
+            self._names[old_name].discard(service.id)
+            names.add(old_name)
+        if host_id not in self._hosts:
+            self._hosts[host_id] = (None, set())
+        self._hosts[host_id][1].add(service.id)
+        self._names.setdefault(service.name, set()).add(service.id)
+        self._services[service.id] = (host_id, service.name, service.port)
+        self._refresh(names)
+
+    def _remove_services(self, ids):
+        names = set()
+        for id in ids:
+            if id not in self._services:
+                continue
+            host_id, name, _ = self._services.pop(id)
+            self._hosts[host_id][1].discard(id)
+            self._names[name].discard(id)
+            names.add(name)
+        self._refresh(names)
+
+    def _refresh(self, names):
+        for name in names:
+            endpoints = set()
+            for id in self._names.get(name, ()):
+                host_id, _, port = self._services[id]
+                address = self._hosts[host_id][0]
+                if address is not None:
+                    endpoints.add('{}:{}'.format(address, port))
+            if endpoints:
+                self._endpoints[name] = tuple(sorted(endpoints))
+            else:
+                self._endpoints.pop(name, None)
+            if not self._names.get(name, True):
+                del self._names[name]
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import random
+from heapq import heappush, heappop
+from time import monotonic
+
+from .entities import ServiceStatus
+from .prober import probe
+from .utils import now
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeSchedule(object):
+    r"""When each service of the catalog is to be probed next.
+
+    A service starts at ``min_interval``. Every successful probe multiplies
+    its interval by ``backoff`` up to ``max_interval``, a failure brings it
+    back to ``min_interval``. Delays are spread by +/- ``jitter`` of the
+    interval so that services added together drift apart.
+    """
+
+    def __init__(self, *, min_interval=10.0, max_interval=300.0, backoff=2.0,
+                 jitter=0.1, random=random.random):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self._random = random
+        # service id -> [endpoint, interval, generation, host id]
+        self._services = {}
+        self._addresses = {}
+        self._services_of_host = {}
+        self._heap = []
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._services)
+
+    def endpoints(self):
+        return {state[0] for state in self._services.values()}
+
+    def interval_of(self, service_id):
+        return self._services[service_id][1]
+
+    def sync(self, hosts, at):
+        r"""Follow the catalog: schedule new services, forget deleted ones
+        and re-probe those whose endpoint changed. Others keep their state.
+
+        :param hosts: iterable of :class:`Host` with services and address
+        """
+        seen = set()
+        self._addresses, self._services_of_host = {}, {}
+        for host in hosts:
+            self._addresses[host.id] = host.address
+            for service in host.services:
+                seen.add(service.id)
+                self._put(host.id, service.id, service.port, at)
+        for service_id in set(self._services) - seen:
+            del self._services[service_id]
+
+    def apply(self, changes, at):
+        r"""Follow the catalog through its change log, as :meth:`sync` does
+        from all of it.
+
+        :param changes: iterable of :class:`Event`
+        """
+        for change in changes:
+            data = change.data
+            if change.type == 'host.created':
+                self._addresses[data['id']] = data['address']
+                for service in data['services']:
+                    self._put(data['id'], service['id'], service['port'], at)
+            elif change.type == 'host.updated':
+                self._addresses[data['id']] = data['address']
+                for service_id in list(
+                        self._services_of_host.get(data['id'], ())):
+                    self._put(data['id'], service_id,
+                              self._services[service_id][0][1], at)
+            elif change.type == 'host.deleted':
+                self._addresses.pop(data['id'], None)
+                for service_id in self._services_of_host.pop(data['id'], ()):
+                    self._services.pop(service_id, None)
+            elif change.type in ('service.created', 'service.updated'):
+                if data['host_id'] in self._addresses:
+                    self._put(data['host_id'], data['id'], data['port'], at)
+            elif change.type == 'service.deleted':
+                state = self._services.pop(data['id'], None)
+                if state is not None:
+                    self._services_of_host[state[3]].discard(data['id'])
+
+    def _put(self, host_id, service_id, port, at):
+        r"""Schedule a new service, or re-probe one whose endpoint
+        changed."""
+        endpoint = (self._addresses[host_id], port)
+        state = self._services.get(service_id)
+        if state is not None and state[3] != host_id:
+            self._services_of_host.get(state[3], set()).discard(service_id)
+        self._services_of_host.setdefault(host_id, set()).add(service_id)
+        if state is None or state[0] != endpoint:
+            self._services[service_id] = [endpoint, self.min_interval, None,
+                                          host_id]
+            self._push(service_id, at + self._random() * self.min_interval)
+        else:
+            state[3] = host_id
+
+    def pop_due(self, at):
+        r"""Take out the services due at ``at``; they are not scheduled
+        again until their result is :meth:`record`-ed.
+
+        :return: list of ``(service_id, (address, port))``
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= at:
+            _, generation, service_id = heappop(self._heap)
+            state = self._services.get(service_id)
+            if state is not None and state[2] == generation:
+                state[2] = None
+                due.append((service_id, state[0]))
+        return due
+
+    def next_due(self):
+        r""":return: when the next service is due, None if none is"""
+        while self._heap:
+            _, generation, service_id = self._heap[0]
+            state = self._services.get(service_id)
+            if state is not None and state[2] == generation:
+                return self._heap[0][0]
+            heappop(self._heap)
+        return None
+
+    def record(self, service_id, reachable, at):
+        state = self._services.get(service_id)
+        if state is None:
+            return
+        if reachable:
+            state[1] = min(state[1] * self.backoff, self.max_interval)
+        else:
+            state[1] = self.min_interval
+        self._push(service_id, at + state[1] * (
+            1 + self.jitter * (2 * self._random() - 1)))
+
+    def _push(self, service_id, due_at):
+        self._generation += 1
+        self._services[service_id][2] = self._generation
+        heappush(self._heap, (due_at, self._generation, service_id))
+
+
+class ProbeScheduler(object):
+    r"""Probe services continuously following a :class:`ProbeSchedule`.
+
+    The catalog is loaded once, then followed through its changes, checked
+    every ``sync_interval`` seconds. At most ``concurrency`` connections are
+    in flight, of which at most ``per_host_concurrency`` to the same address.
+    Results are handed to ``save_statuses`` in batches.
+
+    Errors, of a probe, of ``save_statuses`` or of ``changes``, are logged
+    and do not stop the scheduler; a service whose probe failed is probed
+    again as an unreachable one.
+
+    :param changes: callable taking the revision synced last, None at
+                    first, and returning a :class:`CatalogChanges`
+    :param save_statuses: callable taking a list of :class:`ServiceStatus`
+    """
+
+    def __init__(self, changes, save_statuses, *,
+                 schedule=None, concurrency=500, per_host_concurrency=4,
+                 timeout=1.0, sync_interval=5.0, clock=monotonic):
+        self.schedule = schedule if schedule is not None else ProbeSchedule()
+        self._changes = changes
+        self._save_statuses = save_statuses
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._synced_revision = None
+        self._results = []
+
+    def run(self, until=None, tick=1.0):
+        r"""Run in a new event loop until ``until()`` returns true, forever
+        if None. Must not be called from a coroutine.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(until or (lambda: False),
+                                              tick))
+        finally:
+            loop.close()
+
+    def sync(self):
+        while True:
+            catalog = self._changes(self._synced_revision)
+            if catalog.hosts is not None:
+                self.schedule.sync(catalog.hosts, self._clock())
+            elif catalog.changes:
+                self.schedule.apply(catalog.changes, self._clock())
+            else:
+                return
+            self._synced_revision = catalog.revision
+
+    def flush(self):
+        results, self._results = self._results, []
+        if results:
+            try:
+                self._save_statuses(results)
+            except Exception:
+                # Probed again on schedule anyway.
+                logger.exception('Failed to save %d probe results.',
+                                 len(results))
+
+    async def _run(self, until, tick):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        host_semaphores = {}
+        tasks = set()
+        synced_at = None
+        try:
+            while not until():
+                at = self._clock()
+                if synced_at is None or at - synced_at >= self.sync_interval:
+                    try:
+                        self.sync()
+                    except Exception:
+                        logger.exception('Failed to sync the catalog.')
+                    synced_at = at
+                    for address in set(host_semaphores) - {
+                            address for address, _ in
+                            self.schedule.endpoints()}:
+                        del host_semaphores[address]
+                for service_id, endpoint in self.schedule.pop_due(at):
+                    host_semaphore = host_semaphores.setdefault(
+                        endpoint[0],
+                        asyncio.Semaphore(self.per_host_concurrency))
+                    task = asyncio.ensure_future(self._check(
+                        service_id, endpoint, semaphore, host_semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                self.flush()
+                next_due = self.schedule.next_due()
+                delay = tick if next_due is None else next_due - at
+                await asyncio.sleep(max(0, min(delay, tick)))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.flush()
+
+    async def _check(self, service_id, endpoint, semaphore, host_semaphore):
+        try:
+            async with host_semaphore, semaphore:
+                reachable, latency = await probe(*endpoint, self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Failed to probe %s:%s.', *endpoint)
+            reachable, latency = False, None
+        self.schedule.record(service_id, reachable, self._clock())
+        self._results.append(
+            ServiceStatus(service_id, reachable, latency, now()))
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from threading import local
+from time import perf_counter
+
+_state = local()
+
+
+class Timings(object):
+    r"""Seconds spent in each named phase of one request, phases of the
+    same name adding up."""
+
+    def __init__(self):
+        self.started_at = perf_counter()
+        self.durations = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def elapsed(self):
+        return perf_counter() - self.started_at
+
+
+def start():
+    r"""Collect the phases of the current thread from now on.
+
+    :rtype: Timings
+    """
+    _state.timings = Timings()
+    return _state.timings
+
+
+def stop():
+    r""":return: the timings collected since :func:`start`, None if none"""
+    timings = current()
+    _state.timings = None
+    return timings
+
+
+def current():
+    return getattr(_state, 'timings', None)
+
+
+@contextmanager
+def phase(name):
+    r"""Time the block as ``name`` if the thread collects timings."""
+    timings = current()
+    if timings is None:
+        yield
+        return
+    started_at = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - started_at)
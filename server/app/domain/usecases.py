@@ -1,11 +1,42 @@
-from jwt import DecodeError
+from typing import NamedTuple
+from datetime import datetime
+from itertools import islice
+
+from jwt import InvalidTokenError
 
 from .assertions import assert_not_none
-from .utils import decrypt_with_jwt, now, datetime_from_str
-from .entities import Anonymous, Admin, Host, Service
+from .cache import LRUCache
+from .utils import decrypt_with_jwt, now, claims_auth_at, auth_valid_period
+from .entities import Anonymous, Admin, Host, Service, ServiceStatus
+from .events import EventBus, Event
 from .errors import IncorrectSign, IncorrectUsername, IncorrectPassword, \
-    EmptyField
+    EmptyField, InvalidType, InvalidBatch, HostNotFound, NoProbeHistory
+from .history import ProbeHistory
+from .prober import probe_endpoints
 from .registry import repos
+from .resolver import ServiceIndex
+from .scheduler import ProbeSchedule, ProbeScheduler
+
+
+class TokenClaims(NamedTuple):
+    role: str
+    auth_at: datetime
+    sign: str = None
+
+
+class CatalogChanges(NamedTuple):
+    r"""Either the ``changes`` after a revision or, when some of them are
+    not logged anymore, a snapshot of all the ``hosts``."""
+    revision: int
+    changes: list = None
+    hosts: list = None
+
+
+token_cache = LRUCache()
+service_index = ServiceIndex()
+event_bus = EventBus()
+# Number of revisions whose changes are kept for GET /host/changes.
+change_log_size = 10000
 
 
 def set_admin(username, original_password, sign=None,
@@ -13,6 +44,7 @@ def set_admin(username, original_password, sign=None,
     admin = Admin(username, now(), sign, tip,
                   original_password=original_password)
     repos.admin.set(admin)
+    token_cache.clear()
 
 
 def get_tip():
@@ -38,67 +70,380 @@ def auth_admin_token(username, password):
     return admin.token()
 
 
-def get_user_by_token(token):
-    if not token:
-        return None
+def _verify_token(token):
     try:
         token_content = decrypt_with_jwt(token)
-    except DecodeError:
+    except InvalidTokenError:
         return None
-    else:
-        role = token_content.get('role', None)
-        if role == Admin.role:
-            admin = repos.admin.get()
-            admin.auth_at = datetime_from_str(token_content['auth_at'])
-            return admin
-        elif role == Anonymous.role:
-            return Anonymous.from_dict(token_content)
+    role = token_content.get('role', None)
+    if role == Admin.role:
+        return TokenClaims(role, claims_auth_at(token_content))
+    elif role == Anonymous.role:
+        anonymous = Anonymous.from_dict(token_content)
+        return TokenClaims(role, anonymous.auth_at, anonymous.sign)
+    return None
+
+
+def get_user_by_token(token):
+    if not token:
         return None
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = _verify_token(token)
+        if claims is None:
+            return None
+        token_cache.set(token, claims,
+                        expires_at=claims.auth_at + auth_valid_period())
+    if claims.role == Admin.role:
+        admin = repos.admin.get()
+        admin.auth_at = claims.auth_at
+        return admin
+    return Anonymous(claims.sign, claims.auth_at)
 
 
 def is_valid_admin(user):
-    return user and user.role == Admin.role and user.is_auth_valid()
+    if not (user and user.role == Admin.role):
+        return False
+    token_cache.validate(user.updated_at)
+    return user.is_auth_valid()
 
 
 def is_valid_anonymous(user):
-    return user and user.role == Anonymous.role and user.is_auth_valid(
-        repos.admin.get())
+    if not (user and user.role == Anonymous.role):
+        return False
+    admin = repos.admin.get()
+    token_cache.validate(admin.updated_at)
+    return user.is_auth_valid(admin)
+
+
+def _log_changes(changes):
+    r"""Bump the catalog revision and log ``changes`` under it, inside the
+    current transaction.
+
+    :param changes: list of ``(type, data)``
+    :return: the new revision
+    """
+    repos.catalog.bump()
+    revision = repos.catalog.revision()
+    repos.change_log.append(revision, changes)
+    repos.change_log.compact(revision - change_log_size)
+    return revision
 
 
 def add_host(name, detail, address):
     id = repos.host.next_identity()
     host = Host(id, name, detail, address)
-    repos.host.save(host)
+    changes = [('host.created', host.to_dict())]
+    with repos.transaction.atomic():
+        repos.host.save(host)
+        revision = _log_changes(changes)
+    service_index.put_hosts(revision, [host])
+    event_bus.publish(revision, changes)
+
+
+def _host_from_dict(adict):
+    if not isinstance(adict, dict):
+        raise InvalidType('host', 'object')
+    host = Host(repos.host.next_identity(), adict.get('name'),
+                adict.get('detail'), adict.get('address'))
+    services = adict.get('services')
+    if services is None:
+        services = []
+    elif not isinstance(services, list):
+        raise InvalidType('services', 'array')
+    for index, service in enumerate(services):
+        if not isinstance(service, dict):
+            raise InvalidType('services[{}]'.format(index), 'object')
+        try:
+            host.add_new_service(service.get('name'), service.get('detail'),
+                                 service.get('port'))
+        except EmptyField as e:
+            raise EmptyField('services[{}].{}'.format(index, e.field))
+    return host
+
+
+def import_hosts(items):
+    r"""Validate every host of ``items`` then insert them all at once.
+
+    :param items: list of {'name', 'detail', 'address',
+                           'services': [{'name', 'detail', 'port'}]}
+    :return: ids of the new hosts, in the order of ``items``
+    :raises InvalidBatch: nothing is written if any item is invalid
+    """
+    hosts, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            hosts.append(_host_from_dict(item))
+        except EmptyField as e:
+            errors.append({'index': index, 'field': e.field,
+                           'msg': 'is required'})
+        except InvalidType as e:
+            errors.append({'index': index, 'field': e.field,
+                           'msg': 'should be an {}'.format(e.expected)})
+    if errors:
+        raise InvalidBatch(errors)
+    changes = [('host.created', host.to_dict()) for host in hosts]
+    with repos.transaction.atomic():
+        repos.host.save_many(hosts)
+        revision = _log_changes(changes)
+    service_index.put_hosts(revision, hosts)
+    event_bus.publish(revision, changes)
+    return [host.id for host in hosts]
 
 
 def delete_host(id):
     if not id:
         raise EmptyField('id')
-    repos.host.delete(id)
+    changes = [('host.deleted', {'id': id})]
+    with repos.transaction.atomic():
+        repos.host.delete(id)
+        revision = _log_changes(changes)
+    service_index.remove_hosts(revision, [id])
+    event_bus.publish(revision, changes)
+
+
+def delete_hosts(ids):
+    assert_not_none(ids, field='ids')
+    with repos.transaction.atomic():
+        deleted = repos.host.delete_many(ids)
+        if not deleted:
+            return
+        changes = [('host.deleted', {'id': id}) for id in deleted]
+        revision = _log_changes(changes)
+    service_index.remove_hosts(revision, deleted)
+    event_bus.publish(revision, changes)
 
 
 def list_all_host():
     return repos.host.all()
 
 
+def iterate_all_host(batch_size=500, limit=None, *, fields=None,
+                     include_services=True):
+    return islice(repos.host.iterate(batch_size, fields=fields,
+                                     include_services=include_services),
+                  limit)
+
+
+def list_host_page(cursor, limit, *, fields=None, include_services=True):
+    r"""
+
+    :param fields: host attributes needed besides the id, None for all
+    :return: the hosts after ``cursor`` and the cursor of the next page,
+             None on the last page
+    """
+    hosts = repos.host.page(cursor, limit, fields=fields,
+                            include_services=include_services)
+    next_cursor = hosts[-1].id if len(hosts) == limit else None
+    return hosts, next_cursor
+
+
+def catalog_revision():
+    return repos.catalog.revision()
+
+
+def catalog_changes(since, limit):
+    r"""Changes of the catalog after revision ``since``, falling back to a
+    snapshot of it when they are not all in the change log anymore.
+
+    :param since: ``revision`` of the previous call, None for a snapshot
+    :param limit: number of changes above which the following revisions
+                  are left to the next call
+    :rtype: CatalogChanges
+    """
+    with repos.transaction.atomic():
+        revision = repos.catalog.revision()
+        if since == revision:
+            return CatalogChanges(revision, [])
+        oldest = repos.change_log.oldest()
+        if since is None or since > revision or oldest is None or \
+                oldest > since + 1:
+            return CatalogChanges(revision, hosts=repos.host.all())
+        changes = repos.change_log.after(since, limit)
+    # Also covers the writes committed since the revision was read.
+    if changes:
+        revision = changes[-1].id
+    return CatalogChanges(revision, changes)
+
+
+def catalog_events(last_event_id=None, keepalive=15.0):
+    r"""Follow the changes of the catalog, see :class:`EventBus`.
+
+    When changes were missed, because they were evicted from the backlog or
+    written by another process, a ``reset`` event tells to reload the
+    catalog.
+
+    :param last_event_id: id of the last event received, None to start now
+    :param keepalive: seconds after which None is yielded if nothing changed
+    :return: generator of :class:`Event` or None
+    """
+    after_id = last_event_id
+    if after_id is None:
+        after_id = _read_revision()
+    while True:
+        last_id, events, complete = event_bus.wait(after_id, keepalive)
+        if last_id == after_id:
+            revision = _read_revision()
+            if revision > after_id:
+                after_id = revision
+                yield Event(revision, 'reset', {})
+            else:
+                yield None
+        elif not complete:
+            after_id = last_id
+            yield Event(last_id, 'reset', {})
+        else:
+            after_id = last_id
+            yield from events
+
+
+def _read_revision():
+    # Ends its own transaction rather than holding one open for the whole
+    # stream.
+    with repos.transaction.atomic():
+        return repos.catalog.revision()
+
+
+def resolve_service(name):
+    r"""
+
+    :return: sorted ``address:port`` endpoints of the services named ``name``
+    """
+    if not service_index.is_fresh():
+        service_index.sync(repos.catalog.revision(),
+                           lambda: repos.host.iterate(fields=('address',)))
+    return service_index.endpoints(name)
+
+
 def modify_host(id, name, detail, address):
     host = Host(id, name, detail, address)
-    repos.host.save(host)
+    changes = [('host.updated',
+                host.to_dict(('id', 'name', 'detail', 'address')))]
+    with repos.transaction.atomic():
+        repos.host.save(host, include_services=False)
+        revision = _log_changes(changes)
+    service_index.put_hosts(revision, [host], include_services=False)
+    event_bus.publish(revision, changes)
 
 
 def add_service(host_id, name, detail, port):
     assert_not_none(host_id, field='host_id')
-    host = repos.host.host_of_id(host_id)
-    new_service = host.add_new_service(name, detail, port)
-    repos.service.save(host_id, new_service)
+    new_service = Service(repos.service.next_identity(), name, detail, port)
+    changes = [('service.created',
+                dict(new_service.to_dict(), host_id=host_id))]
+    with repos.transaction.atomic():
+        if not repos.host.lock_for_update(host_id):
+            raise HostNotFound()
+        repos.service.save(host_id, new_service)
+        revision = _log_changes(changes)
+    service_index.put_service(revision, host_id, new_service)
+    event_bus.publish(revision, changes)
 
 
 def delete_service(id):
     assert_not_none(id, field='id')
-    repos.service.delete(id)
+    changes = [('service.deleted', {'id': id})]
+    with repos.transaction.atomic():
+        repos.service.delete(id)
+        revision = _log_changes(changes)
+    service_index.remove_services(revision, [id])
+    event_bus.publish(revision, changes)
+
+
+def delete_services(ids):
+    assert_not_none(ids, field='ids')
+    with repos.transaction.atomic():
+        deleted = repos.service.delete_many(ids)
+        if not deleted:
+            return
+        changes = [('service.deleted', {'id': id}) for id in deleted]
+        revision = _log_changes(changes)
+    service_index.remove_services(revision, deleted)
+    event_bus.publish(revision, changes)
 
 
 def modify_service(id, name, detail, port, host_id):
     assert_not_none(host_id, field='host_id')
     service = Service(id, name, detail, port)
-    repos.service.save(host_id, service)
+    changes = [('service.updated', dict(service.to_dict(), host_id=host_id))]
+    with repos.transaction.atomic():
+        if not repos.host.lock_for_update(host_id):
+            raise HostNotFound()
+        repos.service.save(host_id, service)
+        revision = _log_changes(changes)
+    service_index.put_service(revision, host_id, service)
+    event_bus.publish(revision, changes)
+
+
+def probe_services(*, concurrency=500, timeout=1.0):
+    r"""Check whether every service accepts TCP connections on the address
+    of its host and save the results.
+
+    Services sharing an address and port are probed once.
+
+    :param concurrency: maximum number of connections in flight
+    :param timeout: seconds to wait for each connection
+    :rtype: list of ServiceStatus
+    """
+    service_ids = {}
+    for host in repos.host.iterate(fields=('address',)):
+        for service in host.services:
+            service_ids.setdefault((host.address, service.port),
+                                   []).append(service.id)
+    endpoints = list(service_ids)
+    results = probe_endpoints(endpoints, concurrency=concurrency,
+                              timeout=timeout)
+    checked_at = now()
+    statuses = [ServiceStatus(service_id, reachable, latency, checked_at)
+                for endpoint, (reachable, latency) in zip(endpoints, results)
+                for service_id in service_ids[endpoint]]
+    record_probes(statuses)
+    return statuses
+
+
+def record_probes(statuses):
+    r"""Save the last status of services and add it to their history.
+
+    :param statuses: list of :class:`ServiceStatus`
+    """
+    repos.service_status.save_many(statuses)
+    histories = repos.probe_history.get_many(
+        [status.service_id for status in statuses])
+    for status in statuses:
+        history = histories.get(status.service_id)
+        if history is None:
+            history = histories[status.service_id] = ProbeHistory()
+        history.record(status.checked_at.timestamp(), status.reachable,
+                       status.latency)
+    repos.probe_history.save_many(histories)
+
+
+def service_uptime(service_id, window):
+    r"""Uptime and latency percentiles of a service over the last ``window``
+    seconds, see :meth:`ProbeHistory.summary`.
+
+    :raises NoProbeHistory: if the service was never probed
+    """
+    assert_not_none(service_id, field='id')
+    history = repos.probe_history.get_many([service_id]).get(service_id)
+    if history is None:
+        raise NoProbeHistory()
+    until = now().timestamp()
+    return history.summary(until - window, until)
+
+
+def schedule_probes(*, min_interval=10.0, max_interval=300.0, jitter=0.1,
+                    concurrency=500, per_host_concurrency=4, timeout=1.0,
+                    sync_interval=5.0, until=None):
+    r"""Probe services continuously, each one again after an interval that
+    grows while it stays reachable. See :class:`ProbeScheduler`.
+
+    :param until: callable telling when to stop, None to run forever
+    """
+    scheduler = ProbeScheduler(
+        lambda since: catalog_changes(since, change_log_size), record_probes,
+        schedule=ProbeSchedule(min_interval=min_interval,
+                               max_interval=max_interval, jitter=jitter),
+        concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+        timeout=timeout, sync_interval=sync_interval)
+    scheduler.run(until)
@@ -1,8 +1,10 @@
+import json
 from datetime import datetime, timedelta
 from hashlib import sha256
-import jwt
 from flask import current_app
 
+from .tokens import TokenCodec
+
 TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
 
 
@@ -33,12 +35,55 @@ def encrypt_irreversibly(string):
     return algo.hexdigest()
 
 
+def datetime_to_epoch(datetime):
+    # A JWT NumericDate may be fractional, microseconds are kept.
+    return round(datetime.timestamp(), 6)
+
+
+def datetime_from_epoch(seconds):
+    return datetime.fromtimestamp(seconds)
+
+
+def claims_auth_at(claims):
+    r"""Authentication time of token claims, an ``iat`` epoch since the v2
+    tokens, a :data:`TIME_FORMAT` ``auth_at`` string before."""
+    if 'iat' in claims:
+        return datetime_from_epoch(claims['iat'])
+    return datetime_from_str(claims['auth_at'])
+
+
+def is_issued_after(auth_at, updated_at):
+    return auth_at > updated_at
+
+
+_token_codec = None
+
+
+def set_secret_key(secret_key):
+    global _token_codec
+    _token_codec = TokenCodec(secret_key)
+
+
+def _codec():
+    if _token_codec is None:
+        set_secret_key(current_app.config['SECRET_KEY'])
+    return _token_codec
+
+
 def encrypt_with_jwt(adict):
-    secret_key = current_app.config['SECRET_KEY']
-    return jwt.encode(adict, secret_key, algorithm='HS256').decode(encoding='utf-8')
+    return _codec().encode(adict)
 
 
 def decrypt_with_jwt(token):
-    secret_key = current_app.config['SECRET_KEY']
-    return jwt.decode(token.encode(encoding='utf-8'), secret_key, algorithms=['HS256'])
+    return _codec().decode(token)
+
+
+def load_json_or_ndjson(text):
+    r"""Parse a JSON array, or one JSON document per line (NDJSON).
 
+    :rtype: list
+    :raises ValueError: on malformed input
+    """
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
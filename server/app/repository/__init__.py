@@ -1,7 +1,27 @@
-def get(app):
+from .caching import CachingAdminRepo, cache_catalog
+from .timing import time_repos
+
+
+def _engine(app):
     engine_type = app.config['DB']
     if engine_type == 'sqlalchemy':
-        from .sqlalchemy import get_repos
+        from . import sqlalchemy as engine
+    elif engine_type == 'memory':
+        from . import memory as engine
     else:
         raise NotImplementedError()
-    return get_repos(app)
+    return engine
+
+
+def get(app):
+    repos = _engine(app).get_repos(app)
+    repos['admin'] = CachingAdminRepo(repos['admin'])
+    if app.config['REPOSITORY_CACHE_SIZE']:
+        cache_catalog(repos, app.config['REPOSITORY_CACHE_SIZE'])
+    if app.config['SERVER_TIMING']:
+        time_repos(repos)
+    return repos
+
+
+def init(app):
+    _engine(app).init(app)
@@ -0,0 +1,360 @@
+from bisect import bisect_right
+from contextlib import contextmanager
+from copy import copy
+from threading import Lock, local
+
+from app.domain.cache import LRUCache
+from app.domain.entities import Admin, Host, Service
+from app.domain.errors import NoAdministratorFound
+from app.domain.metrics import register_cache
+from app.domain.repos import (AdminRepo, HostRepo, ServiceRepo, CatalogRepo,
+                              TransactionManager)
+
+
+class CachingAdminRepo(AdminRepo):
+    r"""Keeps the hydrated administrator of ``repo`` in process memory.
+
+    Every read costs one ``repo.version()`` call; the administrator is only
+    reloaded when that stamp differs from the cached one, so a ``set`` from
+    any worker invalidates the cache of all the others.
+    """
+
+    def __init__(self, repo: AdminRepo):
+        self._repo = repo
+        self._cached = (None, None)
+        self._lock = Lock()
+
+    def get(self):
+        version = self._repo.version()
+        if version is None:
+            raise NoAdministratorFound()
+        cached_version, admin = self._cached
+        if admin is None or cached_version != version:
+            with self._lock:
+                cached_version, admin = self._cached
+                if admin is None or cached_version != version:
+                    admin = self._repo.get()
+                    self._cached = (version, admin)
+        # Callers set auth_at on the result, never hand out the cached one.
+        return copy(admin)
+
+    def set(self, admin: Admin):
+        self._repo.set(admin)
+        self._cached = (None, None)
+
+    def version(self):
+        return self._repo.version()
+
+
+def _copy_host(host, fields=None, include_services=True):
+    def field(name):
+        return getattr(host, name) if fields is None or name in fields \
+            else None
+
+    return Host.from_row(host.id, field('name'), field('detail'),
+                         field('address'),
+                         list(host.services) if include_services else [])
+
+
+class CatalogCache(object):
+    r"""Hosts cached for one catalog revision, shared by the caching repos.
+
+    Reads compare the stored revision with ``catalog.revision()`` and drop
+    everything when another process changed the catalog. Writes of this
+    process invalidate only the affected host and the listing, again when
+    their transaction commits since other threads still read the old rows
+    until then; the revisions they bump are acknowledged at that point, so
+    they do not flush the rest of the cache.
+    """
+
+    def __init__(self, catalog: CatalogRepo, maxsize):
+        self.catalog = catalog
+        self.maxsize = maxsize
+        self.hosts = LRUCache(maxsize)
+        self.listing = None
+        self.revision = None
+        self.generation = 0
+        # Generation at which the catalog did not fit in maxsize hosts.
+        self.oversize = None
+        self._host_of_service = {}
+        self._lock = Lock()
+        self._transaction = local()
+
+    def sync(self):
+        revision = self.catalog.revision()
+        if revision != self.revision:
+            with self._lock:
+                self._clear()
+                self.revision = revision
+        return self.generation
+
+    def _clear(self):
+        self.generation += 1
+        self.hosts.clear()
+        self.listing = None
+        self._host_of_service = {}
+
+    def store_host(self, host, generation):
+        with self._lock:
+            if generation == self.generation:
+                self.hosts.set(host.id, host)
+                self._index(host)
+
+    def store_listing(self, hosts, generation):
+        with self._lock:
+            if generation == self.generation and len(hosts) <= self.maxsize:
+                self.listing = ([host.id for host in hosts],
+                                {host.id: host for host in hosts}, hosts)
+                for host in hosts:
+                    self._index(host)
+
+    def store_oversize(self, generation):
+        with self._lock:
+            if generation == self.generation:
+                self.oversize = generation
+
+    def _index(self, host):
+        for service in host.services:
+            self._host_of_service[service.id] = host.id
+
+    def invalidate_host(self, host_id):
+        self._invalidate((host_id,), ())
+
+    def invalidate_service(self, service_id, host_id=None):
+        self._invalidate(() if host_id is None else (host_id,), (service_id,))
+
+    def _invalidate(self, host_ids, service_ids):
+        with self._lock:
+            self._drop(host_ids, service_ids)
+        state = self._transaction
+        if getattr(state, 'depth', 0):
+            # Other threads may cache the rows again until the commit.
+            state.host_ids.update(host_ids)
+            state.service_ids.update(service_ids)
+
+    def _drop(self, host_ids, service_ids):
+        self.generation += 1
+        ids = set(host_ids)
+        ids.update(self._host_of_service.pop(id, None) for id in service_ids)
+        ids.discard(None)
+        for id in ids:
+            self.hosts.pop(id)
+        self.listing = None
+
+    @contextmanager
+    def transaction(self):
+        state = self._transaction
+        depth = getattr(state, 'depth', 0)
+        if not depth:
+            state.bumps, state.revision = 0, None
+            state.host_ids, state.service_ids = set(), set()
+        state.depth = depth + 1
+        try:
+            yield
+        except BaseException:
+            state.depth = depth
+            raise
+        state.depth = depth
+        if not depth:
+            self._acknowledge(state.bumps, state.revision, state.host_ids,
+                              state.service_ids)
+
+    def bumped(self, revision):
+        state = self._transaction
+        if getattr(state, 'depth', 0):
+            state.bumps += 1
+            state.revision = revision
+        else:
+            self._acknowledge(1, revision)
+
+    def _acknowledge(self, bumps, revision, host_ids=(), service_ids=()):
+        r"""Account for a committed write of ``bumps`` revisions, dropping
+        again the hosts it wrote, read from before the commit meanwhile."""
+        if not bumps and not host_ids and not service_ids:
+            return
+        with self._lock:
+            if host_ids or service_ids:
+                self._drop(host_ids, service_ids)
+            if not bumps:
+                return
+            if self.revision is not None and \
+                    self.revision + bumps == revision:
+                self.revision = revision
+            else:
+                self._clear()
+                self.revision = None
+
+
+class CachingHostRepo(HostRepo):
+    r"""Read-through cache in front of any :class:`HostRepo`.
+
+    The listing of hosts is stored by ``all()`` and by a complete
+    ``iterate()`` as long as the catalog fits in ``cache.maxsize`` hosts, then
+    serves ``all()``, ``page()`` and ``iterate()`` until the next write;
+    ``host_of_id()`` is served from a bounded LRU. Returned hosts are copies
+    callers may modify.
+    """
+
+    def __init__(self, repo: HostRepo, cache: CatalogCache):
+        self._repo = repo
+        self._cache = cache
+
+    def next_identity(self):
+        return self._repo.next_identity()
+
+    def save(self, host: Host, *, include_services=True):
+        self._repo.save(host, include_services=include_services)
+        self._cache.invalidate_host(host.id)
+
+    def save_many(self, hosts):
+        self._repo.save_many(hosts)
+        for host in hosts:
+            self._cache.invalidate_host(host.id)
+
+    def delete(self, id):
+        self._repo.delete(id)
+        self._cache.invalidate_host(id)
+
+    def delete_many(self, ids):
+        deleted = self._repo.delete_many(ids)
+        for id in deleted:
+            self._cache.invalidate_host(id)
+        return deleted
+
+    def all(self, *, fields=None, include_services=True):
+        generation = self._cache.sync()
+        listing = self._cache.listing
+        if listing is not None:
+            return [_copy_host(host, fields, include_services)
+                    for host in listing[2]]
+        hosts = self._repo.all(fields=fields,
+                               include_services=include_services)
+        if fields is not None or not include_services:
+            return hosts
+        self._cache.store_listing(hosts, generation)
+        return [_copy_host(host) for host in hosts]
+
+    def page(self, after_id, limit, *, fields=None, include_services=True):
+        self._cache.sync()
+        listing = self._cache.listing
+        if listing is None:
+            return self._repo.page(after_id, limit, fields=fields,
+                                   include_services=include_services)
+        ids, _, hosts = listing
+        start = 0 if after_id is None else bisect_right(ids, after_id)
+        return [_copy_host(host, fields, include_services)
+                for host in hosts[start:start + limit]]
+
+    def iterate(self, batch_size=500, *, fields=None, include_services=True):
+        generation = self._cache.sync()
+        listing = self._cache.listing
+        if listing is not None:
+            return (_copy_host(host, fields, include_services)
+                    for host in listing[2])
+        hosts = self._repo.iterate(batch_size, fields=fields,
+                                   include_services=include_services)
+        if fields is not None or not include_services or \
+                self._cache.oversize == generation:
+            return hosts
+        return self._collect(hosts, generation)
+
+    def _collect(self, hosts, generation):
+        r"""Yield copies of ``hosts``, stored as the listing once they were
+        all read unless there were more than the cache holds."""
+        collected = []
+        for host in hosts:
+            if collected is not None:
+                if len(collected) < self._cache.maxsize:
+                    collected.append(host)
+                else:
+                    collected = None
+                    self._cache.store_oversize(generation)
+            yield _copy_host(host)
+        if collected is not None:
+            self._cache.store_listing(collected, generation)
+
+    def host_of_id(self, host_id):
+        generation = self._cache.sync()
+        host = self._cache.hosts.get(host_id)
+        if host is None and self._cache.listing is not None:
+            host = self._cache.listing[1].get(host_id)
+        if host is None:
+            host = self._repo.host_of_id(host_id)
+            if host is None:
+                return None
+            self._cache.store_host(host, generation)
+        return _copy_host(host)
+
+    def exists(self, host_id):
+        self._cache.sync()
+        listing = self._cache.listing
+        if listing is not None:
+            return host_id in listing[1]
+        return self._repo.exists(host_id)
+
+    def lock_for_update(self, host_id):
+        return self._repo.lock_for_update(host_id)
+
+
+class CachingServiceRepo(ServiceRepo):
+    def __init__(self, repo: ServiceRepo, cache: CatalogCache):
+        self._repo = repo
+        self._cache = cache
+
+    def next_identity(self):
+        return self._repo.next_identity()
+
+    def save(self, host_id, service: Service):
+        self._repo.save(host_id, service)
+        self._cache.invalidate_service(service.id, host_id)
+
+    def delete(self, id):
+        self._repo.delete(id)
+        self._cache.invalidate_service(id)
+
+    def delete_many(self, ids):
+        deleted = self._repo.delete_many(ids)
+        for id in deleted:
+            self._cache.invalidate_service(id)
+        return deleted
+
+
+class CachingCatalogRepo(CatalogRepo):
+    def __init__(self, repo: CatalogRepo, cache: CatalogCache):
+        self._repo = repo
+        self._cache = cache
+
+    def revision(self):
+        return self._repo.revision()
+
+    def bump(self):
+        self._repo.bump()
+        self._cache.bumped(self._repo.revision())
+
+
+class CachingTransactionManager(TransactionManager):
+    def __init__(self, manager: TransactionManager, cache: CatalogCache):
+        self._manager = manager
+        self._cache = cache
+
+    @contextmanager
+    def atomic(self):
+        with self._cache.transaction(), self._manager.atomic():
+            yield
+
+
+def cache_catalog(repos, maxsize):
+    r"""Stack the caching repos on top of the ``repos`` of an engine.
+
+    :param repos: dict of repositories as returned by an engine
+    :return: the same dict with host, service, catalog and transaction
+             repositories wrapped
+    """
+    cache = CatalogCache(repos['catalog'], maxsize)
+    register_cache('catalog_hosts', cache.hosts)
+    repos['host'] = CachingHostRepo(repos['host'], cache)
+    repos['service'] = CachingServiceRepo(repos['service'], cache)
+    repos['catalog'] = CachingCatalogRepo(repos['catalog'], cache)
+    repos['transaction'] = CachingTransactionManager(repos['transaction'],
+                                                     cache)
+    return repos
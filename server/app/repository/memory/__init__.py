@@ -0,0 +1,24 @@
+from .repos import (MemoryAdminRepo, MemoryHostRepo, MemoryServiceRepo,
+                    MemoryCatalogRepo, MemoryTransactionManager,
+                    MemoryServiceStatusRepo, MemoryProbeHistoryRepo,
+                    MemoryChangeLogRepo)
+from .store import MemoryStore
+
+
+def get_repos(app):
+    store = MemoryStore(app.config.get('MEMORY_JOURNAL_PATH'))
+
+    return {
+        'admin': MemoryAdminRepo(store),
+        'host': MemoryHostRepo(store),
+        'service': MemoryServiceRepo(store),
+        'catalog': MemoryCatalogRepo(store),
+        'transaction': MemoryTransactionManager(store),
+        'service_status': MemoryServiceStatusRepo(store),
+        'probe_history': MemoryProbeHistoryRepo(store),
+        'change_log': MemoryChangeLogRepo(store),
+    }
+
+
+def init(app):
+    pass
@@ -0,0 +1,197 @@
+from uuid import uuid4
+
+from app.domain.entities import Admin, Host, Service
+from app.domain.events import Event
+from app.domain.errors import NoAdministratorFound
+from app.domain.history import ProbeHistory
+from app.domain.repos import (AdminRepo, HostRepo, ServiceRepo, CatalogRepo,
+                              TransactionManager, ServiceStatusRepo,
+                              ProbeHistoryRepo, ChangeLogRepo)
+from app.domain.utils import datetime_to_str, datetime_from_str
+from .store import MemoryStore
+
+
+class MemoryAdminRepo(AdminRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def get(self):
+        row = self._store.admin
+        if row is None:
+            raise NoAdministratorFound()
+        username, password, updated_at, sign, tip = row
+        return Admin(username, datetime_from_str(updated_at), sign, tip,
+                     encrypted_password=password)
+
+    def set(self, admin: Admin):
+        self._store.apply('set_admin', [
+            admin.username, admin.password,
+            datetime_to_str(admin.updated_at), admin.sign, admin.tip])
+
+    def version(self):
+        return self._store.admin_version
+
+
+class MemoryHostRepo(HostRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def next_identity(self):
+        return 'HOST_' + str(uuid4())
+
+    def save(self, host: Host, *, include_services=True):
+        with self._store.atomic():
+            self._store.apply('save_host', host.id, host.name, host.detail,
+                              host.address)
+            if not include_services:
+                return
+            service_ids = {service.id for service in host.services}
+            for service_id in list(self._store.services_of_host[host.id]):
+                if service_id not in service_ids:
+                    self._store.apply('delete_service', service_id)
+            for service in host.services:
+                self._store.apply('save_service', service.id, host.id,
+                                  service.name, service.detail, service.port)
+
+    def save_many(self, hosts):
+        with self._store.atomic():
+            for host in hosts:
+                self.save(host)
+
+    def delete(self, id):
+        self._store.apply('delete_host', id)
+
+    def delete_many(self, ids):
+        deleted = []
+        with self._store.atomic():
+            for id in ids:
+                if id in self._store.hosts:
+                    self.delete(id)
+                    deleted.append(id)
+        return deleted
+
+    def all(self, *, fields=None, include_services=True):
+        with self._store.lock:
+            return [self._host(id, include_services)
+                    for id in self._store.host_ids]
+
+    def page(self, after_id, limit, *, fields=None, include_services=True):
+        with self._store.lock:
+            return [self._host(id, include_services) for id in
+                    self._store.host_ids_after(after_id, limit)]
+
+    def host_of_id(self, host_id):
+        with self._store.lock:
+            if host_id not in self._store.hosts:
+                return None
+            return self._host(host_id)
+
+    def exists(self, host_id):
+        return host_id in self._store.hosts
+
+    def lock_for_update(self, host_id):
+        # Writers are serialized by the store lock held in atomic().
+        return self.exists(host_id)
+
+    def _host(self, id, include_services=True):
+        if not include_services:
+            return Host.from_row(id, *self._store.hosts[id])
+        services = self._store.services
+        return Host.from_row(
+            id, *self._store.hosts[id],
+            [Service.from_row(service_id, *services[service_id][1:])
+             for service_id in self._store.services_of_host[id]])
+
+
+class MemoryServiceRepo(ServiceRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def next_identity(self):
+        return 'SERVICE_' + str(uuid4())
+
+    def save(self, host_id, service: Service):
+        self._store.apply('save_service', service.id, host_id, service.name,
+                          service.detail, service.port)
+
+    def delete(self, id):
+        self._store.apply('delete_service', id)
+
+    def delete_many(self, ids):
+        deleted = []
+        with self._store.atomic():
+            for id in ids:
+                if id in self._store.services:
+                    self.delete(id)
+                    deleted.append(id)
+        return deleted
+
+
+class MemoryServiceStatusRepo(ServiceStatusRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def save_many(self, statuses):
+        self._store.save_probe_data('statuses', [
+            (status.service_id, status) for status in statuses])
+
+    def status_of(self, service_id):
+        return self._store.statuses.get(service_id)
+
+
+class MemoryProbeHistoryRepo(ProbeHistoryRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def get_many(self, service_ids):
+        histories = self._store.histories
+        return {service_id: ProbeHistory.from_bytes(histories[service_id])
+                for service_id in service_ids if service_id in histories}
+
+    def save_many(self, histories):
+        self._store.save_probe_data('histories', [
+            (service_id, history.to_bytes())
+            for service_id, history in histories.items()])
+
+
+class MemoryChangeLogRepo(ChangeLogRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def append(self, revision, changes):
+        if changes:
+            self._store.apply('append_changes', revision,
+                              [list(change) for change in changes])
+
+    def after(self, revision, limit):
+        with self._store.lock:
+            return [Event(*change) for change in
+                    self._store.changes_after(revision, limit)]
+
+    def oldest(self):
+        changes = self._store.changes
+        return changes[0][0] if changes else None
+
+    def compact(self, revision):
+        oldest = self.oldest()
+        if oldest is not None and oldest <= revision:
+            self._store.apply('compact_changes', revision)
+
+
+class MemoryCatalogRepo(CatalogRepo):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def revision(self):
+        return self._store.revision
+
+    def bump(self):
+        self._store.apply('bump')
+
+
+class MemoryTransactionManager(TransactionManager):
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def atomic(self):
+        return self._store.atomic()
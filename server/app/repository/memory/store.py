@@ -0,0 +1,203 @@
+import json
+import os
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from threading import RLock
+
+
+class MemoryStore(object):
+    r"""Catalog tables held in dicts, indexed for the repository queries.
+
+    Every mutation goes through :meth:`apply`, which makes it revertible
+    inside :meth:`atomic` and appends it to the optional journal so that
+    the store can be rebuilt on restart. The store belongs to one process;
+    threads are serialized by a reentrant lock.
+    """
+
+    def __init__(self, journal_path=None):
+        self.lock = RLock()
+        self.admin = None
+        self.admin_version = None
+        self.revision = 0
+        self.hosts = {}
+        self.host_ids = []
+        self.services = {}
+        self.services_of_host = {}
+        self.statuses = {}
+        self.histories = {}
+        # (revision, type, data) ordered by revision
+        self.changes = []
+        self._depth = 0
+        self._undo = []
+        self._pending = []
+        self._journal = None
+        if journal_path:
+            self._replay(journal_path)
+            self._journal = open(journal_path, 'a', encoding='utf-8')
+
+    def _replay(self, journal_path):
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                if line.strip():
+                    op, *args = json.loads(line)
+                    getattr(self, '_' + op)(*args)
+
+    @contextmanager
+    def atomic(self):
+        with self.lock:
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    for undo in reversed(self._undo):
+                        undo()
+                    self._undo, self._pending = [], []
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self._write(self._pending)
+                self._undo, self._pending = [], []
+
+    def apply(self, op, *args):
+        with self.lock:
+            undo = getattr(self, '_' + op)(*args)
+            if self._depth:
+                self._undo.append(undo)
+                self._pending.append([op, *args])
+            else:
+                self._write([[op, *args]])
+
+    def _write(self, records):
+        if self._journal and records:
+            self._journal.write(''.join(
+                json.dumps(record) + '\n' for record in records))
+            self._journal.flush()
+
+    def _set_admin(self, admin):
+        previous = self.admin, self.admin_version
+        self.admin = admin
+        self.admin_version = (self.admin_version or 0) + 1
+
+        def undo():
+            self.admin, self.admin_version = previous
+
+        return undo
+
+    def _bump(self):
+        self.revision += 1
+
+        def undo():
+            self.revision -= 1
+
+        return undo
+
+    def _save_host(self, id, name, detail, address):
+        previous = self.hosts.get(id)
+        self.hosts[id] = (name, detail, address)
+        if previous is None:
+            insort(self.host_ids, id)
+            self.services_of_host.setdefault(id, {})
+
+        def undo():
+            if previous is None:
+                self._forget_host(id)
+            else:
+                self.hosts[id] = previous
+
+        return undo
+
+    def _forget_host(self, id):
+        del self.hosts[id]
+        del self.host_ids[bisect_left(self.host_ids, id)]
+        del self.services_of_host[id]
+
+    def _delete_host(self, id):
+        if id not in self.hosts:
+            return lambda: None
+        row = self.hosts[id]
+        undo_services = [self._delete_service(service_id) for service_id in
+                         list(self.services_of_host[id])]
+        self._forget_host(id)
+
+        def undo():
+            self._save_host(id, *row)
+            for undo_service in reversed(undo_services):
+                undo_service()
+
+        return undo
+
+    def _save_service(self, id, host_id, name, detail, port):
+        previous = self.services.get(id)
+        if previous is not None and previous[0] != host_id:
+            del self.services_of_host[previous[0]][id]
+        self.services[id] = (host_id, name, detail, port)
+        self.services_of_host.setdefault(host_id, {})[id] = None
+
+        def undo():
+            self._delete_service(id)
+            if previous is not None:
+                self._save_service(id, *previous)
+
+        return undo
+
+    def _delete_service(self, id):
+        previous = self.services.pop(id, None)
+        if previous is None:
+            return lambda: None
+        self.services_of_host[previous[0]].pop(id, None)
+        # Not undone: probe data is refreshed by the next probe anyway.
+        self.statuses.pop(id, None)
+        self.histories.pop(id, None)
+
+        def undo():
+            self._save_service(id, *previous)
+
+        return undo
+
+    def _append_changes(self, revision, changes):
+        count = len(changes)
+        self.changes.extend((revision, type, data) for type, data in changes)
+
+        def undo():
+            del self.changes[len(self.changes) - count:]
+
+        return undo
+
+    def _compact_changes(self, revision):
+        # (revision + 1,) sorts before every change of revision + 1.
+        index = bisect_left(self.changes, (revision + 1,))
+        dropped = self.changes[:index]
+        del self.changes[:index]
+
+        def undo():
+            self.changes[:0] = dropped
+
+        return undo
+
+    def save_probe_data(self, table, rows):
+        r"""Store probe results, neither journaled nor undone.
+
+        :param table: ``statuses`` or ``histories``
+        :param rows: list of ``(service_id, row)``
+        """
+        table = getattr(self, table)
+        with self.lock:
+            for service_id, row in rows:
+                if service_id in self.services:
+                    table[service_id] = row
+
+    def changes_after(self, revision, limit):
+        start = bisect_left(self.changes, (revision + 1,))
+        end = start + limit
+        if end < len(self.changes):
+            end = bisect_left(self.changes, (self.changes[end - 1][0] + 1,))
+        return self.changes[start:end]
+
+    def host_ids_after(self, after_id, limit):
+        start = 0 if after_id is None else bisect_right(self.host_ids,
+                                                        after_id)
+        return self.host_ids[start:start + limit]
@@ -1,16 +1,31 @@
 from flask_migrate import Migrate
 
-from .models import db
+from .instrumentation import instrument
+from .models import db, enable_foreign_keys
 from .repos import (SqlalchemyAdminRepo, SqlalchemyHostRepo,
-                    SqlalchemyServiceRepo)
+                    SqlalchemyServiceRepo, SqlalchemyCatalogRepo,
+                    SqlalchemyTransactionManager, SqlalchemyServiceStatusRepo,
+                    SqlalchemyProbeHistoryRepo, SqlalchemyChangeLogRepo)
 
 
 def get_repos(app):
     db.init_app(app)
-    Migrate(app, db)
+    Migrate(app, db, render_as_batch=True, compare_type=True)
+    engine = db.get_engine(app)
+    enable_foreign_keys(engine)
+    instrument(engine)
 
     return {
         'admin': SqlalchemyAdminRepo(),
         'host': SqlalchemyHostRepo(),
         'service': SqlalchemyServiceRepo(),
+        'catalog': SqlalchemyCatalogRepo(),
+        'transaction': SqlalchemyTransactionManager(),
+        'service_status': SqlalchemyServiceStatusRepo(),
+        'probe_history': SqlalchemyProbeHistoryRepo(),
+        'change_log': SqlalchemyChangeLogRepo(),
     }
+
+
+def init(app):
+    db.create_all(app=app)
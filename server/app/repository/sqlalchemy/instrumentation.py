@@ -0,0 +1,36 @@
+from time import perf_counter
+
+from sqlalchemy import event
+
+from app.domain import metrics, timing
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('statement_started_at', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    seconds = perf_counter() - conn.info['statement_started_at'].pop()
+    metrics.record_statement(seconds)
+    timings = timing.current()
+    if timings is not None:
+        timings.add('sql', seconds)
+
+
+def _handle_error(exception_context):
+    started_at = exception_context.connection is not None and \
+        exception_context.connection.info.get('statement_started_at')
+    if started_at:
+        started_at.pop()
+
+
+def instrument(engine):
+    r"""Count the statements executed by ``engine`` and their duration in
+    :mod:`app.domain.metrics` and in the ``sql`` timing phase."""
+    if not event.contains(engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
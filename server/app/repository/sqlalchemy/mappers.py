@@ -1,5 +1,5 @@
-from app.domain.entities import Admin, Host, Service
-from .models import AdminModel, HostModel, ServiceModel
+from app.domain.entities import Admin, Host, Service, ServiceStatus
+from .models import AdminModel, HostModel, ServiceModel, ServiceStatusModel
 
 
 def _extract_properties(o, *properties):
@@ -26,8 +26,13 @@ def admin_2_admin_model(admin: Admin):
 
 
 def service_model_2_service(service_model: ServiceModel):
-    return Service(
-        **_extract_properties(service_model, 'id', 'name', 'detail', 'port'))
+    return Service.from_row(service_model.id, service_model.name,
+                            service_model.detail, service_model.port)
+
+
+def service_2_row(service: Service, host_id):
+    return {'id': service.id, 'name': service.name, 'detail': service.detail,
+            'port': service.port, 'host_id': host_id}
 
 
 def service_2_service_model(service: Service, host_id):
@@ -35,11 +40,29 @@ def service_2_service_model(service: Service, host_id):
         service, 'id', 'name', 'detail', 'port'), host_id=host_id)
 
 
-def host_model_2_host(host_model: HostModel):
-    return Host(**_extract_properties(
-        host_model, 'id', 'name', 'detail', 'address'),
-                services=[service_model_2_service(service) for service in
-                          host_model.services])
+def host_model_2_host(host_model: HostModel, fields=None,
+                      include_services=True):
+    r"""
+
+    :param fields: host attributes to read besides the id, None for all;
+                   the others are left None without being loaded
+    :param include_services: otherwise services are left empty
+    """
+    if fields is None:
+        name, detail, address = \
+            host_model.name, host_model.detail, host_model.address
+    else:
+        name, detail, address = (
+            getattr(host_model, field) if field in fields else None
+            for field in ('name', 'detail', 'address'))
+    services = [service_model_2_service(service) for service in
+                host_model.services] if include_services else None
+    return Host.from_row(host_model.id, name, detail, address, services)
+
+
+def host_2_row(host: Host):
+    return {'id': host.id, 'name': host.name, 'detail': host.detail,
+            'address': host.address}
 
 
 def host_2_host_model(host: Host):
@@ -48,3 +71,15 @@ def host_2_host_model(host: Host):
                      services=[service_2_service_model(service, host.id) for
                                service in
                                host.services])
+
+
+def service_status_model_2_service_status(
+        service_status_model: ServiceStatusModel):
+    return ServiceStatus(service_status_model.service_id,
+                         service_status_model.reachable,
+                         service_status_model.latency,
+                         service_status_model.checked_at)
+
+
+def service_status_2_row(service_status: ServiceStatus):
+    return service_status._asdict()
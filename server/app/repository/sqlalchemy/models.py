@@ -1,6 +1,26 @@
+from sqlite3 import Connection as SQLiteConnection
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import MetaData, event
+
+# Named constraints can be dropped by later migrations, see
+# schema.name_constraints for the tables created before.
+db = SQLAlchemy(metadata=MetaData(naming_convention={
+    'ix': 'ix_%(column_0_label)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}))
 
-db = SQLAlchemy()
+
+def enable_foreign_keys(engine):
+    r"""Have SQLite enforce ON DELETE CASCADE on the connections of
+    ``engine``. Not done for every engine: the batch migrations of alembic
+    drop rebuilt tables, which would cascade to their children.
+    """
+    @event.listens_for(engine, 'connect')
+    def enable(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, SQLiteConnection):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA foreign_keys=ON')
+            cursor.close()
 
 
 class AdminModel(db.Model):
@@ -12,6 +32,8 @@ class AdminModel(db.Model):
     sign = db.Column(db.String(10))
     tip = db.Column(db.Text)
     updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=0,
+                        server_default='0')
 
     def __repr__(self):
         return '<Admin {username}>'.format(username=self.username)
@@ -24,7 +46,9 @@ class HostModel(db.Model):
     name = db.Column(db.String(50), nullable=False)
     detail = db.Column(db.Text)
     address = db.Column(db.Text, nullable=False)
-    services = db.relationship('ServiceModel', lazy='joined', backref='host')
+    # Loaded per query by the repository, see SqlalchemyHostRepo._query.
+    services = db.relationship('ServiceModel', backref='host',
+                               passive_deletes=True)
 
     def __repr__(self):
         return '<Host {name}, {address}>'.format(name=self.name,
@@ -35,10 +59,65 @@ class ServiceModel(db.Model):
     __tablename__ = 'services'
 
     id = db.Column(db.String(50), primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(50), nullable=False, index=True)
     detail = db.Column(db.Text)
-    port = db.Column(db.Integer, nullable=False)
-    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id'), nullable=False)
+    port = db.Column(db.Integer, nullable=False, index=True)
+    host_id = db.Column(db.String(50),
+                        db.ForeignKey('hosts.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
 
     def __repr__(self):
         return '<Service {name}, {port}>'.format(name=self.name, port=self.port)
+
+
+class ServiceStatusModel(db.Model):
+    __tablename__ = 'service_statuses'
+
+    service_id = db.Column(db.String(50),
+                           db.ForeignKey('services.id', ondelete='CASCADE'),
+                           primary_key=True)
+    reachable = db.Column(db.Boolean, nullable=False)
+    latency = db.Column(db.Float)
+    checked_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return '<ServiceStatus {service_id}, {reachable}>'.format(
+            service_id=self.service_id, reachable=self.reachable)
+
+
+class ProbeHistoryModel(db.Model):
+    __tablename__ = 'probe_histories'
+
+    service_id = db.Column(db.String(50),
+                           db.ForeignKey('services.id', ondelete='CASCADE'),
+                           primary_key=True)
+    # ProbeHistory.to_bytes()
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return '<ProbeHistory {service_id}>'.format(
+            service_id=self.service_id)
+
+
+class ChangeModel(db.Model):
+    __tablename__ = 'changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+    type = db.Column(db.String(20), nullable=False)
+    # JSON
+    data = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return '<Change {revision}, {type}>'.format(revision=self.revision,
+                                                    type=self.type)
+
+
+class CatalogModel(db.Model):
+    __tablename__ = 'catalog'
+
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<Catalog {revision}>'.format(revision=self.revision)
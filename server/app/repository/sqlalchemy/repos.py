@@ -1,12 +1,57 @@
+import json
+from contextlib import contextmanager
+from threading import local
 from uuid import uuid4
 
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only, noload
+
+try:
+    from sqlalchemy.orm import selectinload
+except ImportError:  # SQLAlchemy < 1.2
+    from sqlalchemy.orm import subqueryload as selectinload
+
 from app.domain.entities import Admin, Host, Service
+from app.domain.events import Event
 from app.domain.errors import NoAdministratorFound
-from app.domain.repos import AdminRepo, HostRepo, ServiceRepo
+from app.domain.history import ProbeHistory
+from app.domain.timing import phase
+from app.domain.repos import (AdminRepo, HostRepo, ServiceRepo, CatalogRepo,
+                              TransactionManager, ServiceStatusRepo,
+                              ProbeHistoryRepo, ChangeLogRepo)
 from .mappers import (admin_2_admin_model, admin_model_2_admin,
-                      host_model_2_host, host_2_host_model,
-                      service_2_service_model)
-from .models import db, AdminModel, HostModel, ServiceModel
+                      host_model_2_host, host_2_row, service_2_row,
+                      service_status_model_2_service_status,
+                      service_status_2_row)
+from .models import (db, AdminModel, HostModel, ServiceModel, CatalogModel,
+                     ServiceStatusModel, ProbeHistoryModel, ChangeModel)
+from .upsert import upsert
+
+_transaction = local()
+
+
+def _commit():
+    if not getattr(_transaction, 'depth', 0):
+        db.session.commit()
+
+
+def _delete_known(model, ids):
+    r"""Delete the rows of ``model`` whose id is in ``ids``.
+
+    :return: the ids of the deleted rows, once each, in the order of ``ids``
+    """
+    known = {id for id, in db.session.query(model.id).filter(
+        model.id.in_(ids))}
+    if known:
+        model.query.filter(model.id.in_(known)).delete(
+            synchronize_session=False)
+    _commit()
+    deleted = []
+    for id in ids:
+        if id in known:
+            known.remove(id)
+            deleted.append(id)
+    return deleted
 
 
 class SqlalchemyAdminRepo(AdminRepo):
@@ -20,30 +65,100 @@ class SqlalchemyAdminRepo(AdminRepo):
         admin_model = admin_2_admin_model(admin)
         admin_model.id = 1
         db.session.merge(admin_model)
-        db.session.commit()
+        db.session.flush()
+        AdminModel.query.filter_by(id=1).update(
+            {AdminModel.version: AdminModel.version + 1})
+        _commit()
+
+    def version(self):
+        return db.session.query(AdminModel.version).filter_by(id=1).scalar()
 
 
 class SqlalchemyHostRepo(HostRepo):
     def next_identity(self):
         return 'HOST_' + str(uuid4())
 
-    def save(self, host: Host):
-        host_model = host_2_host_model(host)
-        db.session.merge(host_model)
-        db.session.commit()
+    def save(self, host: Host, *, include_services=True):
+        upsert(HostModel.__table__, [host_2_row(host)])
+        if include_services:
+            stale_services = ServiceModel.query.filter_by(host_id=host.id)
+            service_ids = [service.id for service in host.services]
+            if service_ids:
+                stale_services = stale_services.filter(
+                    ServiceModel.id.notin_(service_ids))
+            stale_services.delete(synchronize_session=False)
+            upsert(ServiceModel.__table__, [
+                service_2_row(service, host.id) for service in host.services])
+        _commit()
+
+    def save_many(self, hosts):
+        if not hosts:
+            return
+        db.session.execute(HostModel.__table__.insert(),
+                           [host_2_row(host) for host in hosts])
+        services = [service_2_row(service, host.id)
+                    for host in hosts for service in host.services]
+        if services:
+            db.session.execute(ServiceModel.__table__.insert(), services)
+        _commit()
 
     def delete(self, id):
-        HostModel.query.filter_by(id=id).delete()
-        ServiceModel.query.filter_by(host_id=id).delete()
-        db.session.commit()
+        # Services go with their host through ON DELETE CASCADE.
+        HostModel.query.filter_by(id=id).delete(synchronize_session=False)
+        _commit()
+
+    def delete_many(self, ids):
+        # Services go with their host through ON DELETE CASCADE.
+        return _delete_known(HostModel, ids)
+
+    @staticmethod
+    def _query(fields, services_loader):
+        r"""Query hosts loading only ``fields`` and services with
+        ``services_loader``.
+
+        Listings load services with one extra SELECT ... IN rather than a
+        join repeating every host row once per service.
+        """
+        query = HostModel.query.options(services_loader(HostModel.services))
+        if fields is not None:
+            columns = [field for field in ('name', 'detail', 'address')
+                       if field in fields]
+            query = query.options(load_only('id', *columns))
+        return query
+
+    @staticmethod
+    def _services_loader(include_services):
+        return selectinload if include_services else noload
 
-    def all(self):
-        host_models = HostModel.query.all()
-        return [host_model_2_host(host_model) for host_model in host_models]
+    def all(self, *, fields=None, include_services=True):
+        host_models = self._query(
+            fields, self._services_loader(include_services)).order_by(
+            HostModel.id).all()
+        with phase('map'):
+            return [host_model_2_host(host_model, fields, include_services)
+                    for host_model in host_models]
+
+    def page(self, after_id, limit, *, fields=None, include_services=True):
+        query = self._query(fields, self._services_loader(include_services))
+        if after_id is not None:
+            query = query.filter(HostModel.id > after_id)
+        host_models = query.order_by(HostModel.id).limit(limit).all()
+        with phase('map'):
+            return [host_model_2_host(host_model, fields, include_services)
+                    for host_model in host_models]
 
     def host_of_id(self, host_id):
-        host_model = HostModel.query.filter_by(id=host_id).first()
-        return host_model_2_host(host_model)
+        host_model = self._query(None, joinedload).filter_by(
+            id=host_id).first()
+        return host_model_2_host(host_model) if host_model else None
+
+    def exists(self, host_id):
+        return db.session.query(HostModel.id).filter_by(
+            id=host_id).first() is not None
+
+    def lock_for_update(self, host_id):
+        return db.session.query(HostModel.id).filter_by(
+            id=host_id).with_for_update().first() is not None
 
 
 class SqlalchemyServiceRepo(ServiceRepo):
@@ -51,10 +166,119 @@ class SqlalchemyServiceRepo(ServiceRepo):
         return 'SERVICE_' + str(uuid4())
 
     def save(self, host_id, service: Service):
-        service_model = service_2_service_model(service, host_id)
-        db.session.merge(service_model)
-        db.session.commit()
+        upsert(ServiceModel.__table__, [service_2_row(service, host_id)])
+        _commit()
 
     def delete(self, id):
-        ServiceModel.query.filter_by(id=id).delete()
-        db.session.commit()
+        ServiceModel.query.filter_by(id=id).delete(synchronize_session=False)
+        _commit()
+
+    def delete_many(self, ids):
+        return _delete_known(ServiceModel, ids)
+
+
+# Stay below the 999 bound parameters SQLite accepts per statement.
+_CHUNK_SIZE = 500
+
+
+def _chunks(items):
+    for start in range(0, len(items), _CHUNK_SIZE):
+        yield items[start:start + _CHUNK_SIZE]
+
+
+def _upsert_probe_data(table, rows):
+    r"""Upsert rows keyed by ``service_id``, skipping unknown services."""
+    for chunk in _chunks(rows):
+        known = {id for id, in db.session.query(ServiceModel.id).filter(
+            ServiceModel.id.in_([row['service_id'] for row in chunk]))}
+        upsert(table, [row for row in chunk if row['service_id'] in known],
+               key='service_id')
+    _commit()
+
+
+class SqlalchemyServiceStatusRepo(ServiceStatusRepo):
+    def save_many(self, statuses):
+        _upsert_probe_data(ServiceStatusModel.__table__,
+                           [service_status_2_row(status)
+                            for status in statuses])
+
+    def status_of(self, service_id):
+        model = ServiceStatusModel.query.get(service_id)
+        return service_status_model_2_service_status(model) if model else None
+
+
+class SqlalchemyProbeHistoryRepo(ProbeHistoryRepo):
+    def get_many(self, service_ids):
+        histories = {}
+        for chunk in _chunks(list(service_ids)):
+            histories.update(
+                (service_id, ProbeHistory.from_bytes(data))
+                for service_id, data in db.session.query(
+                    ProbeHistoryModel.service_id, ProbeHistoryModel.data
+                ).filter(ProbeHistoryModel.service_id.in_(chunk)))
+        return histories
+
+    def save_many(self, histories):
+        _upsert_probe_data(ProbeHistoryModel.__table__, [
+            {'service_id': service_id, 'data': history.to_bytes()}
+            for service_id, history in histories.items()])
+
+
+class SqlalchemyChangeLogRepo(ChangeLogRepo):
+    def append(self, revision, changes):
+        if changes:
+            db.session.execute(ChangeModel.__table__.insert(), [
+                {'revision': revision, 'type': type,
+                 'data': json.dumps(data, separators=(',', ':'))}
+                for type, data in changes])
+        _commit()
+
+    def after(self, revision, limit):
+        query = db.session.query(
+            ChangeModel.revision, ChangeModel.type, ChangeModel.data).filter(
+            ChangeModel.revision > revision)
+        last = query.order_by(ChangeModel.id).offset(limit - 1).limit(1) \
+            .first()
+        if last is not None:
+            query = query.filter(ChangeModel.revision <= last.revision)
+        return [Event(revision, type, json.loads(data))
+                for revision, type, data in query.order_by(ChangeModel.id)]
+
+    def oldest(self):
+        return db.session.query(func.min(ChangeModel.revision)).scalar()
+
+    def compact(self, revision):
+        ChangeModel.query.filter(ChangeModel.revision <= revision).delete(
+            synchronize_session=False)
+        _commit()
+
+
+class SqlalchemyCatalogRepo(CatalogRepo):
+    def revision(self):
+        revision = db.session.query(CatalogModel.revision).filter_by(
+            id=1).scalar()
+        return revision or 0
+
+    def bump(self):
+        updated = CatalogModel.query.filter_by(id=1).update(
+            {CatalogModel.revision: CatalogModel.revision + 1})
+        if not updated:
+            db.session.add(CatalogModel(id=1, revision=1))
+        _commit()
+
+
+class SqlalchemyTransactionManager(TransactionManager):
+    @contextmanager
+    def atomic(self):
+        depth = getattr(_transaction, 'depth', 0)
+        _transaction.depth = depth + 1
+        try:
+            yield
+        except BaseException:
+            _transaction.depth = depth
+            if not depth:
+                db.session.rollback()
+            raise
+        _transaction.depth = depth
+        if not depth:
+            db.session.commit()
@@ -0,0 +1,33 @@
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import inspect
+
+from .models import db
+
+
+def name_constraints(engine):
+    r"""Rebuild the SQLite tables having foreign keys without a name,
+    created before the naming convention of :data:`db`, so that migrations
+    can drop them.
+
+    :return: names of the tables rebuilt
+    """
+    if engine.dialect.name != 'sqlite':
+        return []
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        tables = [table for table in inspector.get_table_names()
+                  if any(fk['name'] is None
+                         for fk in inspector.get_foreign_keys(table))]
+        if not tables:
+            return []
+        # Dropping the old table would otherwise cascade to its children.
+        connection.execute('PRAGMA foreign_keys=OFF')
+        operations = Operations(MigrationContext.configure(connection))
+        with connection.begin():
+            for table in tables:
+                with operations.batch_alter_table(
+                        table, recreate='always',
+                        naming_convention=db.metadata.naming_convention):
+                    pass
+    return tables
@@ -0,0 +1,62 @@
+import sqlite3
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+
+from .models import db
+
+_SQLITE_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+def upsert(table, rows, key='id'):
+    r"""Insert ``rows`` into ``table``, updating those whose ``key`` exists.
+
+    Uses the dialect's native ``INSERT ... ON CONFLICT DO UPDATE`` as one
+    (executemany) statement. Other databases fall back to one SELECT of the
+    existing keys, then one UPDATE and one INSERT executemany.
+
+    :param rows: list of dicts holding the same columns
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite' and _SQLITE_UPSERT:
+        statement = text(
+            'INSERT INTO {table} ({columns}) VALUES ({values}) '
+            'ON CONFLICT ({key}) DO UPDATE SET {updates}'.format(
+                table=table.name, key=key,
+                columns=', '.join(columns),
+                values=', '.join(':' + column for column in columns),
+                updates=', '.join(
+                    '{0} = excluded.{0}'.format(column)
+                    for column in columns if column != key)))
+        # Typed parameters, so that dates and booleans are stored as the
+        # ORM would.
+        db.session.execute(statement.bindparams(
+            *(bindparam(column, type_=table.c[column].type)
+              for column in columns)), rows)
+    elif dialect == 'postgresql':
+        statement = postgresql.insert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={column: statement.excluded[column]
+                  for column in columns if column != key}), rows)
+    else:
+        _upsert_fallback(table, rows, key)
+
+
+def _upsert_fallback(table, rows, key):
+    key_column = table.c[key]
+    existing = {row[0] for row in db.session.execute(
+        db.select([key_column]).where(
+            key_column.in_([row[key] for row in rows])))}
+    updates = [dict(row, _key=row[key]) for row in rows
+               if row[key] in existing]
+    inserts = [row for row in rows if row[key] not in existing]
+    if updates:
+        db.session.execute(
+            table.update().where(key_column == db.bindparam('_key')),
+            updates)
+    if inserts:
+        db.session.execute(table.insert(), inserts)
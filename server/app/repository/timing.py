@@ -0,0 +1,50 @@
+from collections.abc import Iterator
+
+from app.domain.timing import phase
+
+
+class TimedRepo(object):
+    r"""Proxy timing every method call of ``repo`` as the ``repo`` phase,
+    and every item of the iterators it returns.
+    """
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __getattr__(self, name):
+        value = getattr(self._repo, name)
+        if not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            with phase('repo'):
+                result = value(*args, **kwargs)
+            if isinstance(result, Iterator):
+                return _timed_iterator(result)
+            return result
+
+        # Later lookups skip __getattr__.
+        setattr(self, name, timed)
+        return timed
+
+
+def _timed_iterator(iterator):
+    while True:
+        with phase('repo'):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def time_repos(repos):
+    r"""Wrap the repositories of ``repos`` in :class:`TimedRepo`, except the
+    transaction manager whose blocks span other calls.
+
+    :return: the same dict
+    """
+    for key, repo in repos.items():
+        if key != 'transaction':
+            repos[key] = TimedRepo(repo)
+    return repos
@@ -2,9 +2,13 @@ from flask import request
 from flask_restplus import Api
 
 from app.domain.errors import NoAdministratorFound, SDException
+from app.domain.timing import phase
 from app.domain.usecases import get_user_by_token
-from . import restful_helper, host, auth, service
+from . import restful_helper, host, auth, service, resolve, \
+    events, metrics
 from .response_helper import Status, respond
+from .metrics import register_metrics
+from .timing import register_timing, register_profiling
 
 
 def register(app):
@@ -21,14 +25,26 @@ def register(app):
             return respond({'msg': 'Unknown error just happened.'},
                            Status.INTERNAL_SERVER_ERROR)
 
+    if app.config['METRICS']:
+        register_metrics(app)
+    if app.config['SERVER_TIMING']:
+        register_timing(app)
+
     @app.before_request
     def parse_token():
         token = request.headers.get('token', None)
-        user = get_user_by_token(token)
+        with phase('auth'):
+            user = get_user_by_token(token)
         request.user = user
 
+    register_profiling(app)
+
     api = Api()
     api.add_namespace(auth.api)
     api.add_namespace(host.api)
     api.add_namespace(service.api)
+    api.add_namespace(resolve.api)
+    api.add_namespace(events.api)
+    if app.config['METRICS']:
+        api.add_namespace(metrics.api)
     api.init_app(app)
@@ -0,0 +1,61 @@
+from threading import Lock
+
+from flask import current_app, request
+from flask_restplus import Resource, Namespace
+
+from app.domain.usecases import catalog_events
+from .permission import anonymous_required
+from .response_helper import Status, respond, respond_event_stream
+
+api = Namespace('events')
+
+
+class Subscribers(object):
+    r"""Number of clients following the events in this process."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = Lock()
+
+    def join(self, limit):
+        r""":return: whether the client may follow, fewer than ``limit``
+                 clients following already"""
+        with self._lock:
+            if self.count >= limit:
+                return False
+            self.count += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.count -= 1
+
+
+subscribers = Subscribers()
+
+
+def _last_event_id():
+    try:
+        return int(request.headers.get('Last-Event-ID'))
+    except (TypeError, ValueError):
+        return None
+
+
+@api.route('')
+class Events(Resource):
+    @anonymous_required
+    def get(self):
+        config = current_app.config
+        if not subscribers.join(config['EVENT_MAX_SUBSCRIBERS']):
+            return respond({'msg': 'Too many clients following the events, '
+                                   'retry later.'},
+                           Status.SERVICE_UNAVAILABLE)
+        try:
+            response = respond_event_stream(catalog_events(
+                _last_event_id(), config['EVENT_KEEPALIVE']))
+        except BaseException:
+            subscribers.leave()
+            raise
+        # The server closes the response when the client disconnects.
+        response.call_on_close(subscribers.leave)
+        return response
@@ -1,11 +1,17 @@
+from flask import current_app, request
 from flask_restplus import Resource, Namespace
 
-from app.domain.errors import EmptyField
-from app.domain.usecases import add_host, delete_host, list_all_host, \
-    modify_host
+from app.domain.entities import Host as HostEntity, serialize_many, \
+    serialize_each
+from app.domain.errors import EmptyField, InvalidBatch
+from app.domain.utils import load_json_or_ndjson
+from app.domain.usecases import add_host, delete_host, delete_hosts, \
+    modify_host, iterate_all_host, list_host_page, catalog_revision, \
+    import_hosts, catalog_changes
 from .permission import admin_required, anonymous_required
-from .response_helper import Status, respond
-from .restful_helper import parse_argument
+from .response_helper import Status, respond, respond_stream, \
+    respond_not_modified
+from .restful_helper import parse_argument, parse_id_list, comma_separated
 
 api = Namespace('host')
 
@@ -24,9 +30,12 @@ class Host(Resource):
         return respond(status=Status.CREATED)
 
     @admin_required
-    def delete(self, id):
+    def delete(self, id=None):
         try:
-            delete_host(id)
+            if id is None:
+                delete_hosts(parse_id_list())
+            else:
+                delete_host(id)
         except EmptyField:
             return respond({'msg': 'Which host do u wanna delete?'},
                            Status.BAD_REQUEST)
@@ -34,8 +43,57 @@ class Host(Resource):
 
     @anonymous_required
     def get(self):
-        hosts = list_all_host()
-        return respond([host.to_dict() for host in hosts])
+        etag = str(catalog_revision())
+        if request.if_none_match.contains_weak(etag):
+            return respond_not_modified(etag)
+        response = self._list_hosts()
+        if response.status_code == Status.SUCCESS.code:
+            response.set_etag(etag)
+        return response
+
+    @staticmethod
+    def _list_hosts():
+        args = parse_argument({'name': 'limit', 'type': int}, 'cursor',
+                              {'name': 'fields', 'type': comma_separated},
+                              {'name': 'include', 'type': comma_separated})
+        unknown = (set(args['fields'] or ()) - set(HostEntity.dict_keys)) | \
+                  (set(args['include'] or ()) - {'services'})
+        if unknown:
+            return respond(
+                {'msg': 'Unknown field: {field}'.format(
+                    field=', '.join(sorted(unknown)))},
+                Status.BAD_REQUEST)
+        fields = args['fields']
+        if fields is not None and args['include']:
+            fields += ('services',)
+        options = {'fields': fields,
+                   'include_services': fields is None or 'services' in fields}
+
+        config = current_app.config
+        max_size = config['HOST_LISTING_MAX_SIZE']
+        if args['limit'] is not None or args['cursor'] is not None:
+            limit = args['limit']
+            if limit is None:
+                limit = config['HOST_PAGE_SIZE']
+            elif limit <= 0:
+                return respond({'msg': 'Limit should be positive.'},
+                               Status.BAD_REQUEST)
+            hosts, next_cursor = list_host_page(
+                args['cursor'], min(limit, max_size), **options)
+            return respond({'hosts': serialize_many(hosts, fields),
+                            'next_cursor': next_cursor})
+        if config['STREAM_HOST_LISTING']:
+            # Fetched batch by batch, so the stream needs no cap.
+            hosts = iterate_all_host(config['HOST_BATCH_SIZE'], **options)
+            return respond_stream(serialize_each(hosts, fields))
+        hosts = list(iterate_all_host(config['HOST_BATCH_SIZE'],
+                                      max_size + 1, **options))
+        if len(hosts) > max_size:
+            return respond(
+                {'msg': 'More than {} hosts, paginate with limit and '
+                        'cursor.'.format(max_size)},
+                Status.BAD_REQUEST)
+        return respond(serialize_many(hosts, fields))
 
     @admin_required
     def put(self, id):
@@ -51,3 +109,46 @@ class Host(Resource):
                     {'msg': 'Required field: {field}'.format(field=e.field)},
                     Status.BAD_REQUEST)
         return respond()
+
+
+@api.route('/bulk')
+class HostBulk(Resource):
+    @admin_required
+    def post(self):
+        try:
+            items = load_json_or_ndjson(request.get_data(as_text=True))
+        except ValueError:
+            return respond({'msg': 'Expect a JSON array or NDJSON of hosts.'},
+                           Status.BAD_REQUEST)
+        if not isinstance(items, list):
+            return respond({'msg': 'Expect a JSON array or NDJSON of hosts.'},
+                           Status.BAD_REQUEST)
+        try:
+            ids = import_hosts(items)
+        except InvalidBatch as e:
+            return respond({'msg': 'No host imported, invalid items found.',
+                            'errors': e.errors}, Status.BAD_REQUEST)
+        return respond({'ids': ids}, Status.CREATED)
+
+
+@api.route('/changes')
+class HostChanges(Resource):
+    @anonymous_required
+    def get(self):
+        args = parse_argument({'name': 'since', 'type': int},
+                              {'name': 'limit', 'type': int})
+        config = current_app.config
+        limit = args['limit']
+        if limit is None:
+            limit = config['HOST_CHANGES_PAGE_SIZE']
+        elif limit <= 0:
+            return respond({'msg': 'Limit should be positive.'},
+                           Status.BAD_REQUEST)
+        result = catalog_changes(
+            args['since'], min(limit, config['HOST_LISTING_MAX_SIZE']))
+        if result.hosts is not None:
+            return respond({'revision': result.revision,
+                            'hosts': serialize_many(result.hosts)})
+        return respond({'revision': result.revision,
+                        'changes': [change._asdict()
+                                    for change in result.changes]})
@@ -0,0 +1,63 @@
+from time import perf_counter
+
+from flask import current_app, g, request
+from flask_restplus import Resource, Namespace
+
+from app.domain import metrics
+from app.domain.metrics import registry
+from app.domain.usecases import token_cache
+
+api = Namespace('metrics')
+
+# Not timed: the stream of /events stays open as long as its client.
+_UNTIMED_ROUTES = frozenset(('/metrics', '/events'))
+
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Latency of requests.',
+    ('route', 'method'))
+responses = registry.counter(
+    'http_responses_total', 'Responses sent.', ('route', 'method', 'status'))
+request_statements = registry.histogram(
+    'http_request_db_statements', 'SQL statements per request.',
+    ('route', 'method'), buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100))
+request_db_seconds = registry.histogram(
+    'http_request_db_seconds', 'Seconds of SQL per request.',
+    ('route', 'method'))
+
+
+@api.route('')
+class Metrics(Resource):
+    def get(self):
+        return current_app.response_class(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def register_metrics(app):
+    r"""Record the latency, status and SQL statements of every routed
+    request. Must be registered before any other ``before_request``
+    handler.
+    """
+    metrics.register_cache('token', token_cache)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started_at = perf_counter()
+        metrics.start_statements()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started_at = g.pop('metrics_started_at', None)
+        statements = metrics.stop_statements()
+        rule = request.url_rule
+        if started_at is None or rule is None or \
+                rule.rule in _UNTIMED_ROUTES:
+            return response
+        labels = (rule.rule, request.method)
+        request_seconds.labels(*labels).observe(perf_counter() - started_at)
+        responses.labels(*labels, str(response.status_code)).inc()
+        if statements is not None:
+            count, seconds = statements
+            request_statements.labels(*labels).observe(count)
+            request_db_seconds.labels(*labels).observe(seconds)
+        return response
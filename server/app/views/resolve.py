@@ -0,0 +1,17 @@
+from flask_restplus import Resource, Namespace
+
+from app.domain.usecases import resolve_service
+from .permission import anonymous_required
+from .response_helper import Status, respond
+
+api = Namespace('resolve')
+
+
+@api.route('/<name>')
+class Resolve(Resource):
+    @anonymous_required
+    def get(self, name):
+        endpoints = resolve_service(name)
+        if not endpoints:
+            return respond({'msg': 'Service not found.'}, Status.NOT_FOUND)
+        return respond(endpoints)
@@ -1,16 +1,23 @@
-from flask import jsonify
+from itertools import chain
+
+from flask import jsonify, json, current_app, request, stream_with_context
 from enum import Enum
 
+from app.domain.timing import phase
+from .timing import is_profiled
+
 
 class Status(Enum):
     SUCCESS = (200, 'OK')
     CREATED = (201, 'Created')
+    NOT_MODIFIED = (304, 'Not modified')
 
     BAD_REQUEST = (400, 'Bad Request')
     UNAUTHORIZED = (401, 'Unauthorized')
     NOT_FOUND = (404, 'Not found')
 
     INTERNAL_SERVER_ERROR = (500, 'Internal server error')
+    SERVICE_UNAVAILABLE = (503, 'Service unavailable')
 
     def __init__(self, code, default_msg):
         self.code = code
@@ -20,6 +27,85 @@ class Status(Enum):
 def respond(data=None, status=Status.SUCCESS):
     if not data:
         data = {'msg': status.default_msg}
-    response = jsonify(data)
+    with phase('json'):
+        response = jsonify(data)
     response.status_code = status.code
     return response
+
+
+def respond_not_modified(etag):
+    response = current_app.response_class(status=Status.NOT_MODIFIED.code)
+    response.set_etag(etag)
+    return response
+
+
+def respond_stream(items, status=Status.SUCCESS):
+    r"""Stream a JSON array item by item, byte-identical to :func:`respond`.
+
+    Profiled requests are buffered instead, so that the profile and the
+    ``Server-Timing`` header cover the items.
+
+    :param items: iterable of json serializable objects, consumed lazily
+                  inside the current request context
+    """
+    items = iter(items)
+    try:
+        first = next(items)
+    except StopIteration:
+        return respond(None, status)
+
+    indent = None
+    separators = (',', ':')
+    if current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] and \
+            not request.is_xhr:
+        indent = 2
+        separators = (', ', ': ')
+
+    def generate():
+        if indent is None:
+            yield '['
+            item_separator = separators[0]
+            newline = ''
+        else:
+            newline = '\n' + ' ' * indent
+            yield '[' + newline
+            item_separator = separators[0] + newline
+        for index, item in enumerate(chain((first,), items)):
+            with phase('json'):
+                encoded = json.dumps(item, indent=indent,
+                                     separators=separators)
+            if newline:
+                encoded = encoded.replace('\n', newline)
+            yield encoded if index == 0 else item_separator + encoded
+        yield ('\n]' if newline else ']') + '\n'
+
+    body = ''.join(generate()) if is_profiled() else \
+        stream_with_context(generate())
+    response = current_app.response_class(
+        body, mimetype=current_app.config['JSONIFY_MIMETYPE'])
+    response.status_code = status.code
+    return response
+
+
+def respond_event_stream(events):
+    r"""Stream Server-Sent Events.
+
+    :param events: iterable of :class:`Event`, or None to send a comment
+                   keeping idle connections open, consumed lazily inside
+                   the current request context
+    """
+    def generate():
+        for event in events:
+            if event is None:
+                yield ': keepalive\n\n'
+            else:
+                yield 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+                    event.id, event.type,
+                    json.dumps(event.data, separators=(',', ':')))
+
+    response = current_app.response_class(
+        stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tells nginx not to buffer the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
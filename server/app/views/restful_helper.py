@@ -1,3 +1,4 @@
+from flask import request
 from flask_restplus import reqparse
 
 
@@ -20,3 +21,33 @@ def parse_argument(*args):
         else:
             raise TypeError('Not supported arg type: {}.'.format(str(arg)))
     return parser.parse_args()
+
+
+def parse_id_list(name='ids'):
+    r"""Ids given as ``{name: [...]}`` in a JSON body, or repeated
+    ``name=`` query/form arguments.
+
+    :rtype: list
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and isinstance(body.get(name), list):
+        return body[name]
+    return request.values.getlist(name)
+
+
+def comma_separated(value):
+    r"""``type`` of a ``a,b,c`` argument, parsed to ``('a', 'b', 'c')``."""
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def port_number(value):
+    r"""``type`` of a TCP port argument, None when empty.
+
+    :raise ValueError: not a port number
+    """
+    if value == '':
+        return None
+    port = int(value)
+    if not 0 < port < 65536:
+        raise ValueError('{} is not a port number.'.format(port))
+    return port
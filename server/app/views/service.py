@@ -1,10 +1,11 @@
 from flask_restplus import Resource, Namespace
 
-from app.domain.errors import EmptyField
-from app.domain.usecases import add_service, modify_service, delete_service
-from .permission import admin_required
+from app.domain.errors import EmptyField, HostNotFound, NoProbeHistory
+from app.domain.usecases import add_service, modify_service, \
+    delete_service, delete_services, service_uptime
+from .permission import admin_required, anonymous_required
 from .response_helper import Status, respond
-from .restful_helper import parse_argument
+from .restful_helper import parse_argument, parse_id_list, port_number
 
 api = Namespace('service')
 
@@ -13,19 +14,25 @@ api = Namespace('service')
 class Service(Resource):
     @admin_required
     def post(self):
-        args = parse_argument('host_id', 'name', 'detail', 'port')
+        args = parse_argument('host_id', 'name', 'detail',
+                              {'name': 'port', 'type': port_number})
         try:
             add_service(**args)
         except EmptyField as e:
             return respond(
                 {'msg': 'Required field: {field}'.format(field=e.field)},
                 Status.BAD_REQUEST)
+        except HostNotFound:
+            return respond({'msg': 'Host not found.'}, Status.NOT_FOUND)
         return respond(status=Status.CREATED)
 
     @admin_required
-    def delete(self, id):
+    def delete(self, id=None):
         try:
-            delete_service(id)
+            if id is None:
+                delete_services(parse_id_list())
+            else:
+                delete_service(id)
         except EmptyField:
             return respond({'msg': 'Which service do u wanna delete?'},
                            Status.BAD_REQUEST)
@@ -33,7 +40,8 @@ class Service(Resource):
 
     @admin_required
     def put(self, id):
-        args = parse_argument('host_id', 'name', 'detail', 'port')
+        args = parse_argument('host_id', 'name', 'detail',
+                              {'name': 'port', 'type': port_number})
         try:
             modify_service(id, **args)
         except EmptyField as e:
@@ -44,4 +52,23 @@ class Service(Resource):
                 return respond(
                     {'msg': 'Required field: {field}'.format(field=e.field)},
                     Status.BAD_REQUEST)
+        except HostNotFound:
+            return respond({'msg': 'Host not found.'}, Status.NOT_FOUND)
         return respond()
+
+
+@api.route('/<id>/uptime')
+class ServiceUptime(Resource):
+    @anonymous_required
+    def get(self, id):
+        args = parse_argument({'name': 'window', 'type': int,
+                               'default': 86400})
+        if args['window'] <= 0:
+            return respond({'msg': 'Window should be positive.'},
+                           Status.BAD_REQUEST)
+        try:
+            summary = service_uptime(id, args['window'])
+        except NoProbeHistory:
+            return respond({'msg': 'Service never probed.'},
+                           Status.NOT_FOUND)
+        return respond(dict(summary, id=id, window=args['window']))
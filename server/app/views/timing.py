@@ -0,0 +1,87 @@
+import cProfile
+import os
+import re
+from datetime import datetime
+from uuid import uuid4
+
+from flask import g, request
+
+from app.domain import timing
+from app.domain.usecases import is_valid_admin
+
+
+def server_timing(timings, streamed=False):
+    r"""``Server-Timing`` header value of ``timings``, in milliseconds.
+
+    Phases overlap: ``repo`` includes ``map``, ``total`` everything but the
+    body of a ``streamed`` response, flagged by a ``stream`` entry.
+    """
+    entries = [
+        '{};dur={:.3f}'.format(name, seconds * 1000) for name, seconds in
+        list(timings.durations.items()) + [('total', timings.elapsed())]]
+    if streamed:
+        entries.append('stream;desc="body not timed"')
+    return ', '.join(entries)
+
+
+def is_profiled():
+    return g.get('profiler') is not None
+
+
+def _profile_path(directory):
+    slug = re.sub(r'[^\w]+', '_', request.path).strip('_') or 'root'
+    return os.path.join(directory, '{:%Y%m%d-%H%M%S}-{}-{}-{}.prof'.format(
+        datetime.now(), request.method, slug, uuid4().hex[:8]))
+
+
+def register_timing(app):
+    r"""Time requests from before any other ``before_request`` handler and
+    add a ``Server-Timing`` header. Streamed bodies are not included.
+    """
+    @app.before_request
+    def start_timing():
+        timing.start()
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = timing.stop()
+        if timings is not None:
+            response.headers['Server-Timing'] = server_timing(
+                timings, response.is_streamed)
+        return response
+
+    @app.teardown_request
+    def stop_timing(exception=None):
+        timing.stop()
+
+
+def register_profiling(app):
+    r"""Profile a request of an administrator asking ``?profile=1`` and dump
+    the stats to ``PROFILE_DIR``, named in the ``X-Profile`` header.
+
+    Must be registered after the user is parsed from the token.
+    """
+    @app.before_request
+    def start_profiling():
+        if request.args.get('profile') == '1' and \
+                is_valid_admin(request.user):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def dump_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            directory = app.config['PROFILE_DIR']
+            os.makedirs(directory, exist_ok=True)
+            path = _profile_path(directory)
+            profiler.dump_stats(path)
+            response.headers['X-Profile'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def stop_profiling(exception=None):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
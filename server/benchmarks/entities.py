@@ -0,0 +1,135 @@
+r"""Memory and construction time of host/service entities.
+
+Compares the former dict-backed entities with the ``__slots__`` ones, built
+either through the validating constructors or the trusted ``from_row``.
+
+Run from the server directory::
+
+    python -m benchmarks.entities
+"""
+import timeit
+import tracemalloc
+
+from app.domain.entities import Host, Service
+from app.domain.errors import EmptyField
+
+HOSTS = 10000
+SERVICES_PER_HOST = 10
+
+
+class DictService(object):
+    def __init__(self, id, name, detail, port):
+        self.id = id
+        self.name = name
+        self.detail = detail
+        self.port = port
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, id):
+        if not id:
+            raise EmptyField('id')
+        self._id = id
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        if not name:
+            raise EmptyField('name')
+        self._name = name
+
+    @property
+    def port(self):
+        return self._port
+
+    @port.setter
+    def port(self, port):
+        if not port:
+            raise EmptyField('port')
+        self._port = port
+
+
+class DictHost(object):
+    def __init__(self, id, name, detail, address, services=None):
+        self.id = id
+        self.name = name
+        self.detail = detail
+        self.address = address
+        self.services = []
+        if services:
+            self.services.extend(services)
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, id):
+        if not id:
+            raise EmptyField('id')
+        self._id = id
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        if not name:
+            raise EmptyField('name')
+        self._name = name
+
+    @property
+    def address(self):
+        return self._address
+
+    @address.setter
+    def address(self, address):
+        if not address:
+            raise EmptyField('address')
+        self._address = address
+
+
+ROWS = [('HOST_{}'.format(i), 'host{}'.format(i), 'detail',
+         '10.0.{}.{}'.format(i // 256, i % 256),
+         [('SERVICE_{}_{}'.format(i, j), 'service{}'.format(j), None, 8000 + j)
+          for j in range(SERVICES_PER_HOST)])
+        for i in range(HOSTS)]
+
+
+def build_with(host_factory, service_factory):
+    return [host_factory(id, name, detail, address,
+                         [service_factory(*service) for service in services])
+            for id, name, detail, address, services in ROWS]
+
+
+CANDIDATES = (
+    ('dict-backed, validated', DictHost, DictService),
+    ('__slots__, validated', Host, Service),
+    ('__slots__, from_row', Host.from_row, Service.from_row),
+)
+
+
+def main():
+    print('{} hosts x {} services'.format(HOSTS, SERVICES_PER_HOST))
+    for label, host_factory, service_factory in CANDIDATES:
+        seconds = min(timeit.repeat(
+            lambda: build_with(host_factory, service_factory),
+            number=1, repeat=3))
+        tracemalloc.start()
+        catalog = build_with(host_factory, service_factory)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del catalog
+        print('{:24} {:8.1f} ms {:8.1f} MiB'.format(
+            label, seconds * 1000, size / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
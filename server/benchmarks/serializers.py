@@ -0,0 +1,63 @@
+r"""Compare compiled serializers with the former reflective ``to_dict``.
+
+Run from the server directory::
+
+    python -m benchmarks.serializers
+"""
+import timeit
+
+from app.domain.entities import Host, Service, ToDictMixin, serialize_many
+
+HOSTS = 2000
+SERVICES_PER_HOST = 10
+
+
+def reflective_to_dict(obj):
+    def parse_field(field):
+        if isinstance(field, tuple) or isinstance(field, list):
+            key, *rest = field
+            alias = rest[0] if rest else key
+        elif isinstance(field, str):
+            key = field
+            alias = key
+        else:
+            raise TypeError()
+        return alias, traverse(getattr(obj, key))
+
+    def traverse(value):
+        if isinstance(value, ToDictMixin):
+            return reflective_to_dict(value)
+        elif isinstance(value, (list, tuple)):
+            return [traverse(item) for item in value]
+        elif isinstance(value, dict):
+            return {key: traverse(value) for key, value in value.items()}
+        else:
+            return value
+
+    return dict(parse_field(field) for field in obj._dict_fields)
+
+
+def build_catalog():
+    return [Host('HOST_{}'.format(i), 'host{}'.format(i), 'detail',
+                 '10.0.{}.{}'.format(i // 256, i % 256),
+                 [Service('SERVICE_{}_{}'.format(i, j), 'service{}'.format(j),
+                          None, 8000 + j) for j in range(SERVICES_PER_HOST)])
+            for i in range(HOSTS)]
+
+
+def main():
+    hosts = build_catalog()
+    assert serialize_many(hosts) == [reflective_to_dict(h) for h in hosts]
+    reflective = min(timeit.repeat(
+        lambda: [reflective_to_dict(host) for host in hosts],
+        number=5, repeat=3)) / 5
+    compiled = min(timeit.repeat(
+        lambda: serialize_many(hosts), number=5, repeat=3)) / 5
+    print('{} hosts x {} services'.format(HOSTS, SERVICES_PER_HOST))
+    print('reflective to_dict: {:8.2f} ms'.format(reflective * 1000))
+    print('serialize_many:     {:8.2f} ms ({:.1f}x)'.format(
+        compiled * 1000, reflective / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+r"""Issue and verify throughput of the v1 tokens (PyJWT, ``auth_at`` string)
+and the v2 ones (:class:`TokenCodec`, epoch ``iat``/``exp``).
+
+Verifying includes reading the authentication time back from the claims.
+
+Run from the server directory::
+
+    python -m benchmarks.tokens
+"""
+import timeit
+from datetime import datetime
+
+import jwt
+
+from app.domain.tokens import TokenCodec
+from app.domain.utils import datetime_to_str, datetime_from_str, \
+    claims_auth_at
+
+SECRET_KEY = 'Yes, I can.'
+NUMBER = 20000
+
+
+def issue_v1(auth_at):
+    return jwt.encode({'role': 'anonymous', 'sign': 'sign',
+                       'auth_at': datetime_to_str(auth_at)},
+                      SECRET_KEY, algorithm='HS256').decode('utf-8')
+
+
+def verify_v1(token):
+    claims = jwt.decode(token.encode('utf-8'), SECRET_KEY,
+                        algorithms=['HS256'])
+    return datetime_from_str(claims['auth_at'])
+
+
+def main():
+    codec = TokenCodec(SECRET_KEY)
+    auth_at = datetime.now()
+
+    def issue_v2(auth_at):
+        iat = round(auth_at.timestamp(), 6)
+        return codec.encode({'role': 'anonymous', 'sign': 'sign',
+                             'iat': iat, 'exp': int(iat) + 7 * 86400})
+
+    def verify_v2(token):
+        return claims_auth_at(codec.decode(token))
+
+    v1_token, v2_token = issue_v1(auth_at), issue_v2(auth_at)
+    assert verify_v1(v1_token) == auth_at
+    assert verify_v2(v2_token) == auth_at
+    candidates = [
+        ('v1 issue', lambda: issue_v1(auth_at)),
+        ('v2 issue', lambda: issue_v2(auth_at)),
+        ('v1 verify', lambda: verify_v1(v1_token)),
+        ('v2 verify', lambda: verify_v2(v2_token)),
+        ('v1 token, v2 verify', lambda: claims_auth_at(
+            codec.decode(v1_token))),
+    ]
+    print('{} tokens, {} / {} bytes'.format(NUMBER, len(v1_token),
+                                            len(v2_token)))
+    for label, func in candidates:
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print('{:20} {:10.0f} /s {:8.2f} us'.format(
+            label, NUMBER / seconds, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,32 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'Yes, I can.'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     AUTH_VALID_PERIOD_IN_DAY = 7
-    DB = 'sqlalchemy'
+    TOKEN_CACHE_SIZE = 1024
+    STREAM_HOST_LISTING = True
+    HOST_BATCH_SIZE = 500
+    HOST_PAGE_SIZE = 100
+    HOST_LISTING_MAX_SIZE = 10000
+    DB = os.environ.get('DB') or 'sqlalchemy'
+    MEMORY_JOURNAL_PATH = os.environ.get('MEMORY_JOURNAL_PATH')
+    REPOSITORY_CACHE_SIZE = 10000
+    RESOLVE_MAX_STALENESS = 1.0
+    PROBE_CONCURRENCY = 500
+    PROBE_TIMEOUT = 1.0
+    PROBE_MIN_INTERVAL = 10.0
+    PROBE_MAX_INTERVAL = 300.0
+    PROBE_JITTER = 0.1
+    PROBE_PER_HOST_CONCURRENCY = 4
+    PROBE_SYNC_INTERVAL = 5.0
+    EVENT_BACKLOG_SIZE = 1000
+    EVENT_KEEPALIVE = 15.0
+    # Per process, below its threads in uwsgi.ini to leave some to the API.
+    EVENT_MAX_SUBSCRIBERS = 48
+    CHANGE_LOG_SIZE = 10000
+    HOST_CHANGES_PAGE_SIZE = 1000
+    SERVER_TIMING = True
+    METRICS = True
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(basedir,
+                                                                'profiles')
 
 
 class DevConfig(Config):
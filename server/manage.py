@@ -3,7 +3,7 @@ import os
 import click
 
 from app import create_app
-from app.domain.errors import EmptyField
+from app.domain.errors import EmptyField, InvalidBatch
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
 
@@ -32,5 +32,66 @@ def set_admin(username, password, sign, tip):
         click.echo('Initialized db data.')
 
 
+@app.cli.command('import-hosts')
+@click.argument('file', type=click.File(encoding='utf-8'))
+def import_hosts(file):
+    from app.domain.usecases import import_hosts
+    from app.domain.utils import load_json_or_ndjson
+
+    try:
+        ids = import_hosts(load_json_or_ndjson(file.read()))
+    except ValueError:
+        click.echo('!!!Expect a JSON array or NDJSON of hosts.')
+    except InvalidBatch as e:
+        for error in e.errors:
+            click.echo('!!!Host #{index}: {field} {msg}.'.format(**error))
+        click.echo('No host imported.')
+    else:
+        click.echo('Imported {} hosts.'.format(len(ids)))
+
+
+@app.cli.command('name-constraints')
+def name_constraints():
+    from app.repository.sqlalchemy.models import db
+    from app.repository.sqlalchemy.schema import name_constraints
+
+    tables = name_constraints(db.get_engine(app))
+    click.echo('Named the constraints of {} tables.'.format(len(tables)))
+
+
+@app.cli.command()
+def probe():
+    from time import monotonic
+    from app.domain.usecases import probe_services
+
+    started_at = monotonic()
+    statuses = probe_services(concurrency=app.config['PROBE_CONCURRENCY'],
+                              timeout=app.config['PROBE_TIMEOUT'])
+    unreachable = [status.service_id for status in statuses
+                   if not status.reachable]
+    for service_id in unreachable:
+        click.echo('!!!{} is unreachable.'.format(service_id))
+    click.echo('Probed {} services in {:.1f}s, {} unreachable.'.format(
+        len(statuses), monotonic() - started_at, len(unreachable)))
+
+
+@app.cli.command('schedule-probes')
+def schedule_probes():
+    from app.domain.usecases import schedule_probes
+
+    click.echo('Probing services until interrupted.')
+    try:
+        schedule_probes(
+            min_interval=app.config['PROBE_MIN_INTERVAL'],
+            max_interval=app.config['PROBE_MAX_INTERVAL'],
+            jitter=app.config['PROBE_JITTER'],
+            concurrency=app.config['PROBE_CONCURRENCY'],
+            per_host_concurrency=app.config['PROBE_PER_HOST_CONCURRENCY'],
+            timeout=app.config['PROBE_TIMEOUT'],
+            sync_interval=app.config['PROBE_SYNC_INTERVAL'])
+    except KeyboardInterrupt:
+        click.echo('Stopped.')
+
+
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from app.domain.cache import LRUCache
+
+
+class TestLRUCache(object):
+    def test_hit_and_miss(self):
+        cache = LRUCache(2)
+        assert cache.get('a') is None
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1,
+                                 'maxsize': 2}
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_expiration(self):
+        cache = LRUCache()
+        cache.set('a', 1, expires_at=datetime.now() - timedelta(seconds=1))
+        cache.set('b', 2, expires_at=datetime.now() + timedelta(days=1))
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert len(cache) == 1
+
+    def test_validate_drops_entries_on_new_stamp(self):
+        cache = LRUCache()
+        cache.validate(1)
+        cache.set('a', 1)
+        cache.validate(1)
+        assert cache.get('a') == 1
+        cache.validate(2)
+        assert cache.get('a') is None
+
+    def test_resize(self):
+        cache = LRUCache(3)
+        for key in 'abc':
+            cache.set(key, key)
+        cache.resize(1)
+        assert len(cache) == 1
+        assert cache.get('c') == 'c'
@@ -1,6 +1,10 @@
 from datetime import datetime, timedelta
 
-from app.domain.entities import Admin, ToDictMixin
+import pytest
+
+from app.domain.entities import (Admin, Host, Service, ToDictMixin,
+                                  serialize_many)
+from app.domain.errors import EmptyField
 
 
 class TestAdmin(object):
@@ -37,6 +41,37 @@ class TestAdmin(object):
         assert admin.auth_at == admin_data['auth_at']
 
 
+class TestHost(object):
+    def test_init_validates(self):
+        with pytest.raises(EmptyField) as exc_info:
+            Host('fake_id', '', None, '127.0.0.1')
+        assert exc_info.value.field == 'name'
+
+    def test_from_row(self):
+        service = Service.from_row('fake_id1', 'nginx', None, 80)
+        host = Host.from_row('fake_id', 'localhost', None, '127.0.0.1',
+                             [service])
+        assert host.to_dict() == Host('fake_id', 'localhost', None,
+                                      '127.0.0.1', [service]).to_dict()
+
+    def test_slots(self):
+        host = Host('fake_id', 'localhost', None, '127.0.0.1')
+        assert not hasattr(host, '__dict__')
+        assert not hasattr(Service('fake_id', 'nginx', None, 80), '__dict__')
+
+
+class TestService(object):
+    def test_init_validates(self):
+        with pytest.raises(EmptyField) as exc_info:
+            Service('fake_id', 'nginx', None, None)
+        assert exc_info.value.field == 'port'
+
+    def test_setter_validates(self):
+        service = Service.from_row('fake_id', 'nginx', None, 80)
+        with pytest.raises(EmptyField):
+            service.name = ''
+
+
 class Point(ToDictMixin):
     _dict_fields = ('x', 'y')
 
@@ -60,12 +95,31 @@ class Square(ToDictMixin):
         self.vertexes = vertexes
 
 
-class ToDictMixinTestCase(object):
+class Label(ToDictMixin):
+    _dict_fields = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def to_dict(self, fields=None):
+        return {'text': self.text.upper()}
+
+
+class BoldLabel(Label):
+    _dict_fields = ('text', 'weight')
+
+
+class TestToDictMixin(object):
     def test_single_object(self):
         point_data = {'x': 3, 'y': 4}
         point = Point(**point_data)
         assert point.to_dict() == point_data
 
+    def test_own_to_dict(self):
+        assert Label('a').to_dict() == {'text': 'A'}
+        assert BoldLabel('a').to_dict() == {'text': 'A'}
+        assert BoldLabel.dict_keys == ('text', 'weight')
+
     def test_nested_object(self):
         start_point_data = {'x': 0, 'y': 1}
         end_point_data = {'x': 3, 'y': 4}
@@ -94,3 +148,46 @@ class ToDictMixinTestCase(object):
         point_data = {'lng': 1, 'lat': 2}
         point = GeoPoint(point_data['lng'], point_data['lat'])
         assert point.to_dict() == point_data
+
+    def test_serializer_follows_subclass_fields(self):
+        class Point3D(Point):
+            _dict_fields = ('x', 'y', 'z')
+
+            def __init__(self, x, y, z):
+                super().__init__(x, y)
+                self.z = z
+
+        assert Point(1, 2).to_dict() == {'x': 1, 'y': 2}
+        assert Point3D(1, 2, 3).to_dict() == {'x': 1, 'y': 2, 'z': 3}
+
+    def test_projection(self):
+        class GeoPoint(Point):
+            _dict_fields = (('x', 'lng'), ('y', 'lat'))
+
+        assert Point(1, 2).to_dict(['y']) == {'y': 2}
+        assert Point(1, 2).to_dict(('y', 'x', 'unknown')) == {'x': 1, 'y': 2}
+        assert Point(1, 2).to_dict(()) == {}
+        assert GeoPoint(1, 2).to_dict(['lat']) == {'lat': 2}
+        assert Point(1, 2).to_dict(['y']) is not Point(1, 2).to_dict(['y'])
+        assert len(Point._projections) == 3
+
+
+def test_serialize_many():
+    services = [Service('s1', 'nginx', None, 80)]
+    hosts = [Host('h1', 'localhost', 'this machine', '127.0.0.1', services),
+             Host('h2', 'server', None, '8.8.8.8')]
+    assert serialize_many(hosts) == [
+        {'id': 'h1', 'name': 'localhost', 'detail': 'this machine',
+         'address': '127.0.0.1',
+         'services': [{'id': 's1', 'name': 'nginx', 'detail': None,
+                       'port': 80}]},
+        {'id': 'h2', 'name': 'server', 'detail': None, 'address': '8.8.8.8',
+         'services': []}]
+
+
+def test_serialize_many_projection():
+    hosts = [Host('h1', 'localhost', 'this machine', '127.0.0.1',
+                  [Service('s1', 'nginx', None, 80)])]
+    assert serialize_many(hosts, ('id', 'services')) == [
+        {'id': 'h1', 'services': [{'id': 's1', 'name': 'nginx',
+                                   'detail': None, 'port': 80}]}]
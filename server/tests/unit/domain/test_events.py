@@ -0,0 +1,59 @@
+from threading import Thread
+
+import pytest
+
+from app.domain.events import Event, EventBus
+
+
+@pytest.fixture
+def bus():
+    bus = EventBus(maxlen=3)
+    bus.publish(1, [('host.created', {'id': 'h1'})])
+    bus.publish(2, [('host.deleted', {'id': 'h1'}),
+                    ('host.deleted', {'id': 'h2'})])
+    return bus
+
+
+class TestEventBus(object):
+    def test_wait(self, bus):
+        assert bus.wait(0, 0) == (2, [
+            Event(1, 'host.created', {'id': 'h1'}),
+            Event(2, 'host.deleted', {'id': 'h1'}),
+            Event(2, 'host.deleted', {'id': 'h2'})], True)
+        assert bus.wait(1, 0) == (2, [
+            Event(2, 'host.deleted', {'id': 'h1'}),
+            Event(2, 'host.deleted', {'id': 'h2'})], True)
+
+    def test_timeout(self, bus):
+        assert bus.wait(2, 0.01) == (2, [], True)
+
+    def test_older_revisions_ignored(self, bus):
+        bus.publish(2, [('host.created', {'id': 'h3'})])
+        bus.publish(None, [('host.created', {'id': 'h3'})])
+        assert bus.wait(1, 0)[1] == [
+            Event(2, 'host.deleted', {'id': 'h1'}),
+            Event(2, 'host.deleted', {'id': 'h2'})]
+
+    def test_gap(self, bus):
+        bus.publish(4, [('service.deleted', {'id': 's1'})])
+        assert bus.wait(2, 0) == (
+            4, [Event(4, 'service.deleted', {'id': 's1'})], False)
+
+    def test_evicted(self, bus):
+        for revision in range(3, 6):
+            bus.publish(revision, [])
+        assert bus.wait(0, 0) == (5, [], False)
+        bus.resize(10)
+        assert bus.maxlen == 10
+
+    def test_wakes_up_subscribers(self, bus):
+        received = []
+        subscribers = [Thread(target=lambda: received.append(bus.wait(2, 5)))
+                       for _ in range(20)]
+        for subscriber in subscribers:
+            subscriber.start()
+        bus.publish(3, [('host.updated', {'id': 'h3'})])
+        for subscriber in subscribers:
+            subscriber.join(5)
+        assert received == [
+            (3, [Event(3, 'host.updated', {'id': 'h3'})], True)] * 20
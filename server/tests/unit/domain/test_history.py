@@ -0,0 +1,84 @@
+import zlib
+
+import pytest
+
+from app.domain.history import RingBuffer, ProbeHistory, LATENCY_BINS
+
+
+class TestRingBuffer(object):
+    def test_overwrite_oldest(self):
+        ring = RingBuffer(3, ('I', 'd'))
+        assert ring.last() is None
+        for value in range(5):
+            ring.append(value, value / 2)
+        assert len(ring) == 3
+        assert [ring.columns[0][index] for index in ring.indexes()] == [
+            2, 3, 4]
+        assert ring.columns[1][ring.last()] == 2.0
+
+    def test_bytes_round_trip(self):
+        ring = RingBuffer(4, ('I', 'd'))
+        for value in range(6):
+            ring.append(value, value / 2)
+        data = ring.to_bytes()
+        copy, offset = RingBuffer.from_bytes(('I', 'd'), data + b'rest')
+        assert data[offset:] == b''
+        assert (copy.start, copy.size) == (ring.start, ring.size)
+        assert copy.columns == ring.columns
+
+
+class TestProbeHistory(object):
+    @pytest.fixture
+    def history(self):
+        history = ProbeHistory(raw_size=4, minutes=10, hours=5)
+        for minute in range(120):
+            at = 3600 * 100 + minute * 60
+            history.record(at, True, 0.0002)
+            history.record(at + 10, minute % 4 != 0, 0.003)
+        return history
+
+    def test_samples_keep_the_last_probes(self, history):
+        assert len(history.samples()) == 4
+        at, reachable, latency = history.samples()[-1]
+        assert (at, reachable) == (3600 * 102 - 50, True)
+        assert latency == pytest.approx(0.003)
+
+    def test_unreachable_sample(self):
+        history = ProbeHistory()
+        history.record(60, False)
+        assert history.samples() == [(60, False, None)]
+
+    def test_summary_from_minutes(self, history):
+        summary = history.summary(3600 * 102 - 300, 3600 * 102)
+        assert summary['probes'] == 10
+        assert summary['uptime'] == 0.9
+        assert summary['latency'] == {
+            'p50': LATENCY_BINS[0], 'p90': 0.004, 'p99': 0.004}
+
+    def test_summary_from_hours(self, history):
+        summary = history.summary(3600 * 99, 3600 * 102)
+        assert summary['probes'] == 240
+        assert summary['uptime'] == 0.875
+
+    def test_empty_window(self, history):
+        assert history.summary(0, 60) == {
+            'probes': 0, 'uptime': None,
+            'latency': {'p50': None, 'p90': None, 'p99': None}}
+
+    def test_slower_than_all_bins(self):
+        history = ProbeHistory()
+        history.record(60, True, 100)
+        assert history.summary(0, 120, (50,))['latency'] == {
+            'p50': LATENCY_BINS[-1]}
+
+    def test_bytes_round_trip(self, history):
+        data = history.to_bytes()
+        copy = ProbeHistory.from_bytes(data)
+        assert copy.samples() == history.samples()
+        assert copy.summary(3600 * 99, 3600 * 102) == history.summary(
+            3600 * 99, 3600 * 102)
+        assert len(ProbeHistory().to_bytes()) < 200
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            ProbeHistory.from_bytes(zlib.compress(b'\x09'))
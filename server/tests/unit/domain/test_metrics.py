@@ -0,0 +1,61 @@
+from threading import Thread
+
+from app.domain.cache import LRUCache
+from app.domain.metrics import Counter, Histogram, Registry, \
+    register_cache, registry
+
+
+def test_counter_threads():
+    counter = Counter()
+
+    def count():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value() == 8000
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.value() == ([2, 3, 4], 5.65)
+
+
+def test_render():
+    metrics = Registry()
+    requests = metrics.histogram('requests_seconds', 'Latency.', ('route',),
+                                 buckets=(0.5, 1))
+    requests.labels('/a"b').observe(0.25)
+    metrics.counter('statements_total', 'Statements.').labels().inc(3)
+    metrics.callback('ratio', 'Ratio.', 'gauge', lambda: [({'x': 'y'}, 0.5)])
+    assert metrics.render() == '\n'.join([
+        '# HELP ratio Ratio.',
+        '# TYPE ratio gauge',
+        'ratio{x="y"} 0.5',
+        '# HELP requests_seconds Latency.',
+        '# TYPE requests_seconds histogram',
+        'requests_seconds_bucket{route="/a\\"b",le="0.5"} 1',
+        'requests_seconds_bucket{route="/a\\"b",le="1"} 1',
+        'requests_seconds_bucket{route="/a\\"b",le="+Inf"} 1',
+        'requests_seconds_sum{route="/a\\"b"} 0.25',
+        'requests_seconds_count{route="/a\\"b"} 1',
+        '# HELP statements_total Statements.',
+        '# TYPE statements_total counter',
+        'statements_total 3']) + '\n'
+
+
+def test_cache_hit_ratio():
+    cache = LRUCache()
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.get('a')
+    register_cache('test', cache)
+    assert 'cache_hit_ratio{cache="test"} 0.6666666666666666' in \
+           registry.render()
@@ -0,0 +1,54 @@
+import socket
+
+import pytest
+
+from app.domain.prober import probe_endpoints
+
+
+@pytest.fixture
+def listening_ports():
+    sockets = []
+    for _ in range(20):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(50)
+        sockets.append(sock)
+    yield [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_probe_endpoints(listening_ports, closed_port):
+    endpoints = [('127.0.0.1', port) for port in listening_ports]
+    endpoints.insert(3, ('127.0.0.1', closed_port))
+    results = probe_endpoints(endpoints, concurrency=4, timeout=1)
+    assert [reachable for reachable, _ in results] == \
+        [True] * 3 + [False] + [True] * 17
+    assert results[3] == (False, None)
+    assert all(latency >= 0 for _, latency in results[:3])
+
+
+def test_unresolvable_address():
+    assert probe_endpoints([('host.invalid', 80)], timeout=1) == \
+        [(False, None)]
+
+
+def test_invalid_endpoints(listening_ports):
+    endpoints = [('a..b', 80), ('127.0.0.1', 70000),
+                 ('127.0.0.1', listening_ports[0])]
+    results = probe_endpoints(endpoints, timeout=1)
+    assert results[:2] == [(False, None), (False, None)]
+    assert results[2][0]
+
+
+def test_no_endpoint():
+    assert probe_endpoints([]) == []
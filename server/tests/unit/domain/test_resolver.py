@@ -0,0 +1,81 @@
+import pytest
+
+from app.domain.entities import Host, Service
+from app.domain.resolver import ServiceIndex
+
+
+@pytest.fixture
+def hosts():
+    return [Host('h1', 'web1', None, '10.0.0.1',
+                 [Service('s1', 'nginx', None, 80),
+                  Service('s2', 'redis', None, 6379)]),
+            Host('h2', 'web2', None, '10.0.0.2',
+                 [Service('s3', 'nginx', None, 80)])]
+
+
+@pytest.fixture
+def index(hosts):
+    index = ServiceIndex()
+    index.sync(1, lambda: hosts)
+    return index
+
+
+class TestServiceIndex(object):
+    def test_sync(self, index):
+        assert index.endpoints('nginx') == ['10.0.0.1:80', '10.0.0.2:80']
+        assert index.endpoints('redis') == ['10.0.0.1:6379']
+        assert index.endpoints('mysql') == []
+        assert index.revision == 1
+        assert index.is_fresh()
+
+    def test_sync_same_revision_does_not_reload(self, index):
+        index.sync(1, lambda: pytest.fail('reloaded'))
+
+    def test_stale_after_max_staleness(self, index):
+        index.max_staleness = 0
+        assert not index.is_fresh()
+
+    def test_put_service(self, index):
+        index.put_service(2, 'h2', Service('s4', 'redis', None, 6380))
+        assert index.endpoints('redis') == ['10.0.0.1:6379', '10.0.0.2:6380']
+        index.put_service(3, 'h2', Service('s3', 'apache', None, 8080))
+        assert index.endpoints('nginx') == ['10.0.0.1:80']
+        assert index.endpoints('apache') == ['10.0.0.2:8080']
+        assert index.revision == 3
+
+    def test_remove_services(self, index):
+        index.remove_services(2, ['s1', 's2', 'unknown'])
+        assert index.endpoints('nginx') == ['10.0.0.2:80']
+        assert index.endpoints('redis') == []
+
+    def test_modify_host_address(self, index):
+        index.put_hosts(2, [Host('h1', 'web1', None, '10.0.1.1')],
+                        include_services=False)
+        assert index.endpoints('nginx') == ['10.0.0.2:80', '10.0.1.1:80']
+        assert index.endpoints('redis') == ['10.0.1.1:6379']
+
+    def test_put_hosts_with_services(self, index):
+        index.put_hosts(2, [Host('h1', 'web1', None, '10.0.0.1',
+                                 [Service('s1', 'nginx', None, 81)]),
+                            Host('h3', 'db', None, '10.0.0.3',
+                                 [Service('s5', 'redis', None, 6379)])])
+        assert index.endpoints('nginx') == ['10.0.0.1:81', '10.0.0.2:80']
+        assert index.endpoints('redis') == ['10.0.0.3:6379']
+
+    def test_remove_hosts(self, index):
+        index.remove_hosts(2, ['h1'])
+        assert index.endpoints('nginx') == ['10.0.0.2:80']
+        assert index.endpoints('redis') == []
+
+    def test_same_endpoint_listed_once(self, index):
+        index.put_service(2, 'h1', Service('s4', 'nginx', None, 80))
+        assert index.endpoints('nginx') == ['10.0.0.1:80', '10.0.0.2:80']
+        index.remove_services(3, ['s1'])
+        assert index.endpoints('nginx') == ['10.0.0.1:80', '10.0.0.2:80']
+
+    def test_missed_revision_invalidates(self, index, hosts):
+        index.remove_services(3, ['s1'])
+        assert index.revision is None
+        assert not index.is_fresh()
+        index.sync(3, lambda: hosts[1:])
+        assert index.endpoints('nginx') == ['10.0.0.2:80']
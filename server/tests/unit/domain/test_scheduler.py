@@ -0,0 +1,193 @@
+import asyncio
+import socket
+from itertools import count
+
+import pytest
+
+from app.domain.entities import Host, Service
+from app.domain.events import Event
+from app.domain import scheduler
+from app.domain.scheduler import ProbeSchedule, ProbeScheduler
+from app.domain.usecases import CatalogChanges
+
+
+def hosts_of(*endpoints):
+    return [Host('host_{}'.format(index), 'xxx', None, address,
+                 [Service('service_{}'.format(index), 'nginx', None, port)])
+            for index, (address, port) in enumerate(endpoints)]
+
+
+class TestProbeSchedule(object):
+    @pytest.fixture
+    def schedule(self):
+        schedule = ProbeSchedule(min_interval=10, max_interval=40, jitter=0.1,
+                                 random=lambda: 0.5)
+        schedule.sync(hosts_of(('10.0.0.1', 80), ('10.0.0.2', 80)), 0)
+        return schedule
+
+    def test_new_services_spread_over_min_interval(self, schedule):
+        assert schedule.pop_due(4.9) == []
+        assert schedule.pop_due(5) == [('service_0', ('10.0.0.1', 80)),
+                                       ('service_1', ('10.0.0.2', 80))]
+        assert schedule.next_due() is None
+
+    def test_backoff_while_reachable(self, schedule):
+        schedule.pop_due(5)
+        for interval in (20, 40, 40):
+            schedule.record('service_0', True, 100)
+            assert schedule.interval_of('service_0') == interval
+            assert schedule.pop_due(100 + interval) == [
+                ('service_0', ('10.0.0.1', 80))]
+
+    def test_tighten_after_failure(self, schedule):
+        schedule.pop_due(5)
+        schedule.record('service_0', True, 10)
+        schedule.record('service_0', False, 10)
+        assert schedule.interval_of('service_0') == 10
+        assert schedule.next_due() == 20
+
+    def test_jitter(self):
+        values = iter([0, 0, 1])
+        schedule = ProbeSchedule(min_interval=10, jitter=0.1,
+                                 random=lambda: next(values))
+        schedule.sync(hosts_of(('10.0.0.1', 80), ('10.0.0.2', 80)), 0)
+        schedule.pop_due(0)
+        schedule.record('service_1', False, 0)
+        assert schedule.next_due() == 11
+
+    def test_sync_keeps_state_of_unchanged_services(self, schedule):
+        schedule.pop_due(5)
+        schedule.record('service_0', True, 5)
+        schedule.record('service_1', True, 5)
+        schedule.sync(hosts_of(('10.0.0.1', 80), ('10.0.0.2', 81),
+                               ('10.0.0.3', 80)), 10)
+        assert len(schedule) == 3
+        assert schedule.interval_of('service_0') == 20
+        assert schedule.interval_of('service_1') == 10
+        assert [service_id for service_id, _ in schedule.pop_due(15)] == [
+            'service_1', 'service_2']
+
+        schedule.sync(hosts_of(('10.0.0.1', 80)), 20)
+        assert len(schedule) == 1
+        assert schedule.endpoints() == {('10.0.0.1', 80)}
+        schedule.record('service_1', True, 20)
+        assert [service_id for service_id, _ in schedule.pop_due(100)] == [
+            'service_0']
+
+    def test_apply_changes(self, schedule):
+        schedule.pop_due(5)
+        schedule.record('service_0', True, 5)
+        schedule.record('service_1', True, 5)
+        schedule.apply([
+            Event(1, 'host.created', {
+                'id': 'host_2', 'name': 'xxx', 'detail': None,
+                'address': '10.0.0.3', 'services': [{
+                    'id': 'service_2', 'name': 'nginx', 'detail': None,
+                    'port': 80}]}),
+            Event(2, 'host.updated', {
+                'id': 'host_1', 'name': 'xxx', 'detail': None,
+                'address': '10.0.0.4'}),
+            Event(3, 'service.created', {
+                'id': 'service_3', 'name': 'nginx', 'detail': None,
+                'port': 81, 'host_id': 'host_0'}),
+            Event(4, 'service.updated', {
+                'id': 'service_0', 'name': 'nginx', 'detail': None,
+                'port': 80, 'host_id': 'host_0'}),
+            Event(5, 'service.deleted', {'id': 'service_2'})], 10)
+        assert schedule.endpoints() == {
+            ('10.0.0.1', 80), ('10.0.0.4', 80), ('10.0.0.1', 81)}
+        assert schedule.interval_of('service_0') == 20
+        assert schedule.interval_of('service_1') == 10
+        assert [service_id for service_id, _ in schedule.pop_due(15)] == [
+            'service_1', 'service_3']
+
+        schedule.apply([Event(6, 'host.deleted', {'id': 'host_0'})], 20)
+        assert schedule.endpoints() == {('10.0.0.4', 80)}
+
+
+class TestProbeScheduler(object):
+    @pytest.fixture
+    def port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(10)
+        yield sock.getsockname()[1]
+        sock.close()
+
+    def test_run(self, port):
+        statuses, calls = [], []
+        hosts = hosts_of(('127.0.0.1', port), ('127.0.0.1', port))
+        created = Event(2, 'service.created', {
+            'id': 'service_2', 'name': 'nginx', 'detail': None,
+            'port': port, 'host_id': 'host_0'})
+
+        def changes(since):
+            calls.append(since)
+            if since is None:
+                return CatalogChanges(1, hosts=hosts)
+            if since == 1:
+                return CatalogChanges(2, [created])
+            return CatalogChanges(since, [])
+
+        scheduler = ProbeScheduler(
+            changes, statuses.extend,
+            schedule=ProbeSchedule(min_interval=0.01, max_interval=0.02),
+            per_host_concurrency=1, sync_interval=0)
+        scheduler.run(until=lambda: len(statuses) >= 9, tick=0.01)
+        assert {status.service_id for status in statuses} == {
+            'service_0', 'service_1', 'service_2'}
+        assert all(status.reachable for status in statuses)
+        assert calls[:3] == [None, 1, 2]
+        assert set(calls[3:]) == {2}
+
+    def test_errors_do_not_stop_probing(self, monkeypatch):
+        statuses, saves, syncs = [], count(), count()
+
+        async def probe(address, port, timeout):
+            if port == 70000:
+                raise OverflowError()
+            return True, 0.01
+
+        def save_statuses(results):
+            if next(saves) == 0:
+                raise RuntimeError()
+            statuses.extend(results)
+
+        def changes(since):
+            if next(syncs) == 0:
+                raise RuntimeError()
+            if since is None:
+                return CatalogChanges(1, hosts=hosts_of(
+                    ('10.0.0.1', 80), ('10.0.0.2', 70000)))
+            return CatalogChanges(since, [])
+
+        monkeypatch.setattr(scheduler, 'probe', probe)
+        ProbeScheduler(
+            changes, save_statuses,
+            schedule=ProbeSchedule(min_interval=0.001, max_interval=0.002),
+            sync_interval=0).run(until=lambda: len(statuses) >= 6,
+                                 tick=0.001)
+        reachable = {status.service_id: status.reachable
+                     for status in statuses}
+        assert reachable == {'service_0': True, 'service_1': False}
+
+    def test_per_host_concurrency(self, monkeypatch):
+        in_flight, peaks, statuses = {}, {}, []
+
+        async def probe(address, port, timeout):
+            in_flight[address] = in_flight.get(address, 0) + 1
+            peaks[address] = max(peaks.get(address, 0), in_flight[address])
+            await asyncio.sleep(0.01)
+            in_flight[address] -= 1
+            return True, 0.01
+
+        monkeypatch.setattr(scheduler, 'probe', probe)
+        hosts = hosts_of(*[('10.0.0.{}'.format(index % 2), 80 + index)
+                           for index in range(8)])
+        ProbeScheduler(
+            lambda since: CatalogChanges(0, []) if since == 0 else
+            CatalogChanges(0, hosts=hosts), statuses.extend,
+            schedule=ProbeSchedule(min_interval=0.001, max_interval=1),
+            per_host_concurrency=2).run(until=lambda: len(statuses) >= 8,
+                                        tick=0.001)
+        assert peaks == {'10.0.0.0': 2, '10.0.0.1': 2}
@@ -0,0 +1,30 @@
+import pytest
+
+from app.domain import timing
+
+
+@pytest.fixture(autouse=True)
+def stopped():
+    timing.stop()
+    yield
+    timing.stop()
+
+
+def test_phases_add_up():
+    timings = timing.start()
+    for _ in range(2):
+        with timing.phase('repo'):
+            pass
+    with pytest.raises(RuntimeError):
+        with timing.phase('json'):
+            raise RuntimeError()
+    assert timing.stop() is timings
+    assert list(timings.durations) == ['repo', 'json']
+    assert timings.elapsed() >= sum(timings.durations.values()) > 0
+
+
+def test_not_collected_when_stopped():
+    with timing.phase('repo'):
+        pass
+    assert timing.current() is None
+    assert timing.stop() is None
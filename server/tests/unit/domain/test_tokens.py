@@ -0,0 +1,48 @@
+import time
+
+import jwt
+import pytest
+
+from app.domain.tokens import TokenCodec
+
+
+@pytest.fixture
+def codec():
+    return TokenCodec('secret')
+
+
+class TestTokenCodec(object):
+    def test_round_trip(self, codec):
+        claims = {'role': 'anonymous', 'sign': 'x', 'iat': 1}
+        token = codec.encode(claims)
+        assert codec.decode(token) == claims
+
+    def test_compatible_with_pyjwt(self, codec):
+        claims = {'role': 'admin', 'auth_at': '2017-01-01 00:00:00.000000'}
+        assert jwt.decode(codec.encode(claims), 'secret',
+                          algorithms=['HS256']) == claims
+        assert codec.decode(jwt.encode(claims, 'secret', algorithm='HS256')
+                            .decode('utf-8')) == claims
+
+    def test_other_header_decoded_by_pyjwt(self, codec):
+        claims = {'role': 'admin'}
+        token = jwt.encode(claims, 'secret', algorithm='HS256',
+                           headers={'kid': '1'}).decode('utf-8')
+        assert codec.decode(token) == claims
+
+    @pytest.mark.parametrize('token', [
+        '', 'abc', 'a.b.c', 'é',
+        TokenCodec('other').encode({'role': 'admin'}),
+        TokenCodec('secret').encode({'role': 'admin'})[:-2],
+        jwt.encode({'role': 'admin'}, 'secret',
+                   algorithm='HS512').decode('utf-8')])
+    def test_invalid(self, codec, token):
+        with pytest.raises(jwt.InvalidTokenError):
+            codec.decode(token)
+
+    def test_expired(self, codec):
+        token = codec.encode({'exp': int(time.time()) - 1})
+        with pytest.raises(jwt.ExpiredSignatureError):
+            codec.decode(token)
+        token = codec.encode({'exp': int(time.time()) + 60})
+        assert codec.decode(token)
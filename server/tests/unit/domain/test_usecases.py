@@ -1,18 +1,37 @@
 from datetime import datetime, timedelta
-from unittest.mock import Mock
+from unittest.mock import Mock, MagicMock
+
+import socket
+
+import jwt
 
 import pytest
 from flask import current_app
 
 from app import domain
-from app.domain.entities import Admin, Anonymous, Host
+from app.domain import usecases
+from app.domain.entities import Admin, Anonymous, Host, Service
+from app.domain.events import Event, EventBus
+from app.domain.history import ProbeHistory
+from app.domain.registry import repos
+from app.domain.resolver import ServiceIndex
+from app.domain.utils import datetime_to_str, encrypt_with_jwt
 from app.domain.errors import (IncorrectSign, IncorrectUsername,
-                               IncorrectPassword, EmptyField)
+                               IncorrectPassword, EmptyField, InvalidBatch,
+                               HostNotFound, NoProbeHistory)
 from app.domain.usecases import (
     set_admin, get_tip, auth_view_token, auth_admin_token, get_user_by_token,
     is_valid_admin, is_valid_anonymous, add_host, delete_host, list_all_host,
-    modify_host, add_service, delete_service, modify_service)
-from tests.unit.utils import FlaskAppContextEnvironment
+    modify_host, add_service, delete_service, modify_service, token_cache,
+    iterate_all_host, list_host_page, import_hosts, delete_hosts,
+    delete_services, resolve_service, service_index, probe_services,
+    schedule_probes, service_uptime, catalog_events, catalog_changes)
+from app.repository.sqlalchemy import (
+    SqlalchemyAdminRepo, SqlalchemyHostRepo, SqlalchemyServiceRepo,
+    SqlalchemyCatalogRepo, SqlalchemyTransactionManager,
+    SqlalchemyChangeLogRepo)
+from app.repository.sqlalchemy.models import db
+from tests.unit.utils import FlaskAppContextEnvironment, query_budget
 
 
 @pytest.fixture
@@ -31,6 +50,28 @@ def anonymous_data():
             'auth_at': datetime.now() - timedelta(days=1)}
 
 
+@pytest.fixture(autouse=True)
+def transaction():
+    manager = MagicMock()
+    domain.inject_repos(transaction=manager)
+    return manager
+
+
+@pytest.fixture(autouse=True)
+def catalog_repo():
+    repo = Mock()
+    repo.revision.return_value = 0
+    domain.inject_repos(catalog=repo)
+    return repo
+
+
+@pytest.fixture(autouse=True)
+def change_log_repo():
+    repo = Mock()
+    domain.inject_repos(change_log=repo)
+    return repo
+
+
 @pytest.fixture
 def admin_repo():
     repo = Mock()
@@ -143,6 +184,59 @@ class TestGetUserByToken(FlaskAppContextEnvironment):
         assert user.auth_at == admin_data['auth_at']
         assert user.role == Admin.role
 
+    @pytest.mark.parametrize('claims', [
+        {'role': 'admin'},
+        {'role': 'anonymous', 'sign': 'bullshit'}])
+    def test_v1_token(self, app_context, set_repo_get, admin_data, claims):
+        auth_at = admin_data['auth_at']
+        token = jwt.encode(dict(claims, auth_at=datetime_to_str(auth_at)),
+                           current_app.config['SECRET_KEY'],
+                           algorithm='HS256').decode('utf-8')
+        user = get_user_by_token(token)
+        assert (user.role, user.auth_at) == (claims['role'], auth_at)
+
+    def test_expired_token(self, app_context, set_repo_get, anonymous_data):
+        token = encrypt_with_jwt({'role': 'anonymous', 'sign': 'bullshit',
+                                  'iat': 0, 'exp': 1})
+        assert get_user_by_token(token) is None
+
+    def test_cached_token(self, app_context, set_repo_get, anonymous_data):
+        token = Anonymous(**anonymous_data).token()
+        get_user_by_token(token)
+        hits = token_cache.hits
+        user = get_user_by_token(token)
+        assert token_cache.hits == hits + 1
+        assert user.auth_at == anonymous_data['auth_at']
+
+    def test_admin_update_drops_cached_tokens(self, app_context, set_repo_get,
+                                              admin_repo, anonymous_data):
+        token = Anonymous(**anonymous_data).token()
+        assert is_valid_anonymous(get_user_by_token(token))
+        user = get_user_by_token(token)
+        assert len(token_cache)
+        admin_repo.get.return_value.updated_at = datetime.now()
+        assert not is_valid_anonymous(user)
+        assert not len(token_cache)
+
+    @pytest.mark.parametrize('version', ['v1', 'v2'])
+    def test_token_issued_before_update(self, app_context, set_repo_get,
+                                        admin_repo, anonymous_data, version):
+        updated_at = datetime.now().replace(microsecond=500000) - \
+            timedelta(hours=1)
+        admin_repo.get.return_value.updated_at = updated_at
+        auth_at = updated_at - timedelta(milliseconds=1)
+        if version == 'v1':
+            token = jwt.encode({'role': 'anonymous', 'sign': 'bullshit',
+                                'auth_at': datetime_to_str(auth_at)},
+                               current_app.config['SECRET_KEY'],
+                               algorithm='HS256').decode('utf-8')
+        else:
+            token = Anonymous(anonymous_data['sign'], auth_at).token()
+        assert not is_valid_anonymous(get_user_by_token(token))
+        token = Anonymous(anonymous_data['sign'],
+                          updated_at + timedelta(milliseconds=1)).token()
+        assert is_valid_anonymous(get_user_by_token(token))
+
 
 class TestValidAdmin(FlaskAppContextEnvironment):
     def test_valid_admin(self, app_context, set_repo_get, admin_data):
@@ -196,9 +290,11 @@ class TestIsValidAnonymous(FlaskAppContextEnvironment):
 
 
 class TestSaveHost(object):
-    def test_success_save(self, host_repo):
+    def test_success_save(self, host_repo, transaction, catalog_repo):
         add_host('localhost', 'this machine', '127.0.0.1')
         host_repo.save.assert_called_once()
+        transaction.atomic.assert_called_once()
+        catalog_repo.bump.assert_called_once()
 
     @pytest.mark.parametrize(
         'host_data, expected',
@@ -211,9 +307,10 @@ class TestSaveHost(object):
 
 
 class TestDeleteHost(object):
-    def test_success_delete(self, host_repo):
+    def test_success_delete(self, host_repo, catalog_repo):
         delete_host(1)
         host_repo.delete.assert_called_once()
+        catalog_repo.bump.assert_called_once()
 
     def test_empty_id(self, host_repo):
         with pytest.raises(EmptyField) as exc_info:
@@ -222,15 +319,63 @@ class TestDeleteHost(object):
         assert exc_info.value.field == 'id'
 
 
+class TestDeleteHosts(object):
+    def test_success_delete(self, host_repo, catalog_repo, change_log_repo):
+        catalog_repo.revision.return_value = 3
+        host_repo.delete_many.return_value = [1]
+        delete_hosts([1, 2])
+        host_repo.delete_many.assert_called_once_with([1, 2])
+        catalog_repo.bump.assert_called_once()
+        change_log_repo.append.assert_called_once_with(
+            3, [('host.deleted', {'id': 1})])
+
+    def test_unknown_ids(self, host_repo, catalog_repo, change_log_repo):
+        host_repo.delete_many.return_value = []
+        delete_hosts([1, 2])
+        catalog_repo.bump.assert_not_called()
+        change_log_repo.append.assert_not_called()
+
+    def test_empty_ids(self, host_repo):
+        with pytest.raises(EmptyField) as exc_info:
+            delete_hosts([])
+        assert exc_info.value.field == 'ids'
+
+
 def test_list_host(host_repo):
     list_all_host()
     host_repo.all.assert_called_once()
 
 
+def test_iterate_host_limit(host_repo):
+    host_repo.iterate.return_value = iter(range(10))
+    assert list(iterate_all_host(batch_size=3, limit=4)) == [0, 1, 2, 3]
+    host_repo.iterate.assert_called_once_with(3, fields=None,
+                                              include_services=True)
+
+
+class TestListHostPage(object):
+    @pytest.fixture
+    def hosts(self):
+        return [Host('fake_{}'.format(i), 'xxx', 'yyy', 'zzz')
+                for i in range(2)]
+
+    def test_full_page(self, host_repo, hosts):
+        host_repo.page.return_value = hosts
+        assert list_host_page(None, 2) == (hosts, 'fake_1')
+        host_repo.page.assert_called_once_with(None, 2, fields=None,
+                                               include_services=True)
+
+    def test_last_page(self, host_repo, hosts):
+        host_repo.page.return_value = hosts
+        assert list_host_page('fake_0', 3) == (hosts, None)
+
+
 class TestModifyHost(object):
-    def test_success_modify(self, host_repo):
+    def test_success_modify(self, host_repo, catalog_repo):
         modify_host(1, 'localhost', '', '127.0.0.1')
         host_repo.save.assert_called_once()
+        assert host_repo.save.call_args[1] == {'include_services': False}
+        catalog_repo.bump.assert_called_once()
 
     @pytest.mark.parametrize(
         'host_data, expected',
@@ -245,9 +390,19 @@ class TestModifyHost(object):
 
 
 class TestAddService(object):
-    def test_success_save(self, service_repo, host_repo):
+    def test_success_save(self, service_repo, host_repo, catalog_repo):
         add_service(1, 'nginx', 'nginx for website', 80)
+        host_repo.lock_for_update.assert_called_once_with(1)
+        host_repo.host_of_id.assert_not_called()
         service_repo.save.assert_called_once()
+        catalog_repo.bump.assert_called_once()
+
+    def test_host_not_found(self, service_repo, host_repo, catalog_repo):
+        host_repo.lock_for_update.return_value = False
+        with pytest.raises(HostNotFound):
+            add_service(1, 'nginx', 'nginx for website', 80)
+        service_repo.save.assert_not_called()
+        catalog_repo.bump.assert_not_called()
 
     @pytest.mark.parametrize(
         'service_data, expected',
@@ -263,9 +418,10 @@ class TestAddService(object):
 
 
 class TestDeleteService(object):
-    def test_success_delete(self, service_repo):
+    def test_success_delete(self, service_repo, catalog_repo):
         delete_service(1)
         service_repo.delete.assert_called_once()
+        catalog_repo.bump.assert_called_once()
 
     def test_empty_id(self, service_repo):
         with pytest.raises(EmptyField) as exc_info:
@@ -274,10 +430,40 @@ class TestDeleteService(object):
         assert exc_info.value.field == 'id'
 
 
+class TestDeleteServices(object):
+    def test_success_delete(self, service_repo, catalog_repo,
+                            change_log_repo):
+        catalog_repo.revision.return_value = 3
+        service_repo.delete_many.return_value = [2]
+        delete_services([1, 2])
+        service_repo.delete_many.assert_called_once_with([1, 2])
+        catalog_repo.bump.assert_called_once()
+        change_log_repo.append.assert_called_once_with(
+            3, [('service.deleted', {'id': 2})])
+
+    def test_unknown_ids(self, service_repo, catalog_repo, change_log_repo):
+        service_repo.delete_many.return_value = []
+        delete_services([1, 2])
+        catalog_repo.bump.assert_not_called()
+        change_log_repo.append.assert_not_called()
+
+    def test_empty_ids(self, service_repo):
+        with pytest.raises(EmptyField) as exc_info:
+            delete_services([])
+        assert exc_info.value.field == 'ids'
+
+
 class TestModifyService(object):
-    def test_success_modify(self, service_repo):
+    def test_success_modify(self, service_repo, host_repo, catalog_repo):
         modify_service(1, 'nginx', '', 80, 2)
         service_repo.save.assert_called_once()
+        catalog_repo.bump.assert_called_once()
+
+    def test_host_not_found(self, service_repo, host_repo):
+        host_repo.lock_for_update.return_value = False
+        with pytest.raises(HostNotFound):
+            modify_service(1, 'nginx', '', 80, 2)
+        service_repo.save.assert_not_called()
 
     @pytest.mark.parametrize(
         'service_data, expected',
@@ -285,8 +471,337 @@ class TestModifyService(object):
          [[1, '', '', 80, 2], 'name'],
          [[1, 'nginx', '', None, 2], 'port'],
          [[1, 'nginx', '', 80, None], 'host_id']])
-    def test_fail_modify(self, service_repo, service_data, expected):
+    def test_fail_modify(self, service_repo, host_repo, service_data,
+                         expected):
         with pytest.raises(EmptyField) as exc_info:
             modify_service(*service_data)
         assert exc_info.type is EmptyField
         assert exc_info.value.field == expected
+
+
+class TestImportHosts(object):
+    @pytest.fixture
+    def items(self):
+        return [{'name': 'localhost', 'detail': 'this machine',
+                 'address': '127.0.0.1',
+                 'services': [{'name': 'nginx', 'detail': '', 'port': 80}]},
+                {'name': 'server1', 'address': '8.8.8.8'}]
+
+    def test_success_import(self, host_repo, service_repo, catalog_repo,
+                            items):
+        host_repo.next_identity.side_effect = ['fake_1', 'fake_2']
+        assert import_hosts(items) == ['fake_1', 'fake_2']
+        hosts = host_repo.save_many.call_args[0][0]
+        assert [len(host.services) for host in hosts] == [1, 0]
+        catalog_repo.bump.assert_called_once()
+
+    def test_invalid_items(self, host_repo, service_repo, items):
+        items[0]['services'][0]['port'] = None
+        items[1]['address'] = ''
+        items.append('abc')
+        items.append({'name': 'server2', 'address': '8.8.4.4',
+                      'services': 'nginx'})
+        items.append({'name': 'server3', 'address': '8.8.4.4',
+                      'services': [80]})
+        with pytest.raises(InvalidBatch) as exc_info:
+            import_hosts(items)
+        assert exc_info.value.errors == [
+            {'index': 0, 'field': 'services[0].port', 'msg': 'is required'},
+            {'index': 1, 'field': 'address', 'msg': 'is required'},
+            {'index': 2, 'field': 'host', 'msg': 'should be an object'},
+            {'index': 3, 'field': 'services', 'msg': 'should be an array'},
+            {'index': 4, 'field': 'services[0]',
+             'msg': 'should be an object'}]
+        host_repo.save_many.assert_not_called()
+
+
+class TestResolveService(object):
+    @pytest.fixture(autouse=True)
+    def index(self):
+        service_index.invalidate()
+        yield service_index
+        service_index.invalidate()
+
+    @pytest.fixture
+    def catalog(self, host_repo, catalog_repo):
+        host_repo.iterate.return_value = [
+            Host('fake_1', 'xxx', 'yyy', '10.0.0.1',
+                 [Service('fake_2', 'nginx', '', 80)])]
+        catalog_repo.revision.return_value = 1
+        return catalog_repo
+
+    def test_built_once(self, host_repo, catalog):
+        assert resolve_service('nginx') == ['10.0.0.1:80']
+        assert resolve_service('redis') == []
+        host_repo.iterate.assert_called_once_with(fields=('address',))
+        catalog.revision.assert_called_once_with()
+
+    def test_updated_by_writes(self, host_repo, service_repo, catalog):
+        resolve_service('nginx')
+        catalog.revision.return_value = 2
+        service_repo.next_identity.return_value = 'fake_3'
+        add_service('fake_1', 'redis', '', 6379)
+        catalog.revision.return_value = 3
+        modify_host('fake_1', 'xxx', 'yyy', '10.0.0.2')
+        assert resolve_service('redis') == ['10.0.0.2:6379']
+        assert resolve_service('nginx') == ['10.0.0.2:80']
+        host_repo.iterate.assert_called_once()
+
+    def test_rebuilt_on_foreign_write(self, host_repo, catalog, index):
+        resolve_service('nginx')
+        index.max_staleness = 0
+        catalog.revision.return_value = 2
+        host_repo.iterate.return_value = []
+        try:
+            assert resolve_service('nginx') == []
+        finally:
+            index.max_staleness = 1.0
+
+
+class TestProbeServices(object):
+    @pytest.fixture
+    def status_repo(self, history_repo):
+        repo = Mock()
+        domain.inject_repos(service_status=repo)
+        return repo
+
+    @pytest.fixture
+    def history_repo(self):
+        repo = Mock()
+        repo.get_many.return_value = {}
+        domain.inject_repos(probe_history=repo)
+        return repo
+
+    @pytest.fixture
+    def port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(10)
+        yield sock.getsockname()[1]
+        sock.close()
+
+    def test_probe(self, host_repo, status_repo, history_repo, port):
+        host_repo.iterate.return_value = [
+            Host('fake_1', 'xxx', 'yyy', '127.0.0.1',
+                 [Service('fake_2', 'nginx', '', port),
+                  Service('fake_3', 'nginx-alias', '', port)]),
+            Host('fake_4', 'xxx', 'yyy', 'host.invalid',
+                 [Service('fake_5', 'redis', '', 6379)])]
+        statuses = probe_services(concurrency=2, timeout=1)
+        assert [(status.service_id, status.reachable)
+                for status in statuses] == [
+            ('fake_2', True), ('fake_3', True), ('fake_5', False)]
+        assert statuses[0].latency == statuses[1].latency
+        status_repo.save_many.assert_called_once_with(statuses)
+        host_repo.iterate.assert_called_once_with(fields=('address',))
+        histories = history_repo.save_many.call_args[0][0]
+        assert set(histories) == {'fake_2', 'fake_3', 'fake_5'}
+        assert histories['fake_5'].samples()[0][1:] == (False, None)
+
+    def test_schedule_probes(self, host_repo, status_repo, catalog_repo,
+                             port):
+        host_repo.iterate.return_value = [
+            Host('fake_1', 'xxx', 'yyy', '127.0.0.1',
+                 [Service('fake_2', 'nginx', '', port)])]
+        schedule_probes(min_interval=0.01, until=lambda: bool(
+            status_repo.save_many.call_count))
+        status, = status_repo.save_many.call_args[0][0]
+        assert (status.service_id, status.reachable) == ('fake_2', True)
+        host_repo.iterate.assert_called_once_with(fields=('address',))
+
+
+class TestServiceUptime(object):
+    @pytest.fixture
+    def history_repo(self):
+        repo = Mock()
+        domain.inject_repos(probe_history=repo)
+        return repo
+
+    def test_uptime(self, history_repo):
+        history = ProbeHistory()
+        at = datetime.now().timestamp()
+        history.record(at - 7200, False)
+        history.record(at - 30, True, 0.001)
+        history.record(at - 20, False)
+        history_repo.get_many.return_value = {'fake_1': history}
+        summary = service_uptime('fake_1', 3600)
+        assert (summary['probes'], summary['uptime']) == (2, 0.5)
+        assert summary['latency']['p50'] == 0.001
+        history_repo.get_many.assert_called_once_with(['fake_1'])
+
+    def test_never_probed(self, history_repo):
+        history_repo.get_many.return_value = {}
+        with pytest.raises(NoProbeHistory):
+            service_uptime('fake_1', 3600)
+
+
+class TestCatalogEvents(object):
+    @pytest.fixture(autouse=True)
+    def bus(self, monkeypatch):
+        bus = EventBus()
+        monkeypatch.setattr(usecases, 'event_bus', bus)
+        return bus
+
+    def test_published_by_writes(self, host_repo, service_repo,
+                                 catalog_repo, bus):
+        catalog_repo.revision.return_value = 1
+        host_repo.next_identity.return_value = 'fake_1'
+        add_host('xxx', 'yyy', '10.0.0.1')
+        catalog_repo.revision.return_value = 2
+        modify_host('fake_1', 'xxx', 'zzz', '10.0.0.1')
+        catalog_repo.revision.return_value = 3
+        service_repo.next_identity.return_value = 'fake_2'
+        add_service('fake_1', 'nginx', '', 80)
+        catalog_repo.revision.return_value = 4
+        service_repo.delete_many.return_value = ['fake_2']
+        delete_services(['fake_2'])
+        catalog_repo.revision.return_value = 5
+        delete_host('fake_1')
+        assert bus.wait(0, 0) == (5, [
+            Event(1, 'host.created', {
+                'id': 'fake_1', 'name': 'xxx', 'detail': 'yyy',
+                'address': '10.0.0.1', 'services': []}),
+            Event(2, 'host.updated', {
+                'id': 'fake_1', 'name': 'xxx', 'detail': 'zzz',
+                'address': '10.0.0.1'}),
+            Event(3, 'service.created', {
+                'id': 'fake_2', 'name': 'nginx', 'detail': '', 'port': 80,
+                'host_id': 'fake_1'}),
+            Event(4, 'service.deleted', {'id': 'fake_2'}),
+            Event(5, 'host.deleted', {'id': 'fake_1'})], True)
+
+    def test_failed_write_not_published(self, host_repo, catalog_repo, bus):
+        catalog_repo.revision.return_value = 1
+        host_repo.delete.side_effect = RuntimeError
+        with pytest.raises(RuntimeError):
+            delete_host('fake_1')
+        assert bus.wait(0, 0) == (0, [], True)
+
+    def test_follow(self, catalog_repo, bus):
+        catalog_repo.revision.return_value = 1
+        events = catalog_events(keepalive=0.01)
+        bus.publish(2, [('host.deleted', {'id': 'fake_1'})])
+        assert next(events) == Event(2, 'host.deleted', {'id': 'fake_1'})
+        assert next(events) is None
+
+    def test_resume(self, bus):
+        bus.publish(2, [('host.deleted', {'id': 'fake_1'})])
+        bus.publish(3, [('host.deleted', {'id': 'fake_2'})])
+        events = catalog_events(2, keepalive=0)
+        assert next(events) == Event(3, 'host.deleted', {'id': 'fake_2'})
+
+    def test_reset_on_gap(self, bus):
+        bus.publish(3, [('host.deleted', {'id': 'fake_1'})])
+        events = catalog_events(1, keepalive=0)
+        assert next(events) == Event(3, 'reset', {})
+
+    def test_reset_on_foreign_write(self, catalog_repo):
+        catalog_repo.revision.return_value = 4
+        events = catalog_events(2, keepalive=0)
+        assert next(events) == Event(4, 'reset', {})
+        assert next(events) is None
+
+
+class TestCatalogChanges(object):
+    def test_logged_by_writes(self, service_repo, catalog_repo,
+                              change_log_repo, transaction):
+        catalog_repo.revision.return_value = 10002
+        service_repo.delete_many.return_value = ['fake_1', 'fake_2']
+        delete_services(['fake_1', 'fake_2'])
+        change_log_repo.append.assert_called_once_with(10002, [
+            ('service.deleted', {'id': 'fake_1'}),
+            ('service.deleted', {'id': 'fake_2'})])
+        change_log_repo.compact.assert_called_once_with(2)
+        transaction.atomic.assert_called_once()
+
+    def test_changes(self, catalog_repo, change_log_repo):
+        catalog_repo.revision.return_value = 5
+        change_log_repo.oldest.return_value = 3
+        change_log_repo.after.return_value = [
+            Event(3, 'host.deleted', {'id': 'fake_1'})]
+        assert catalog_changes(2, 10) == (
+            3, [Event(3, 'host.deleted', {'id': 'fake_1'})], None)
+        change_log_repo.after.assert_called_once_with(2, 10)
+
+    def test_truncated(self, catalog_repo, change_log_repo):
+        catalog_repo.revision.return_value = 5
+        change_log_repo.oldest.return_value = 3
+        change_log_repo.after.return_value = [
+            Event(3, 'host.deleted', {'id': 'fake_1'})]
+        assert catalog_changes(2, 1).revision == 3
+
+    def test_committed_meanwhile(self, catalog_repo, change_log_repo):
+        catalog_repo.revision.return_value = 5
+        change_log_repo.oldest.return_value = 3
+        change_log_repo.after.return_value = [
+            Event(4, 'host.deleted', {'id': 'fake_1'}),
+            Event(6, 'host.deleted', {'id': 'fake_2'})]
+        assert catalog_changes(2, 10).revision == 6
+
+    def test_up_to_date(self, catalog_repo, change_log_repo):
+        catalog_repo.revision.return_value = 5
+        assert catalog_changes(5, 10) == (5, [], None)
+        change_log_repo.after.assert_not_called()
+
+    @pytest.mark.parametrize('since, oldest', [
+        [None, 1], [1, 3], [6, 1], [2, None]])
+    def test_snapshot(self, host_repo, catalog_repo, change_log_repo,
+                      since, oldest):
+        catalog_repo.revision.return_value = 5
+        change_log_repo.oldest.return_value = oldest
+        hosts = [Host('fake_1', 'xxx', 'yyy', 'zzz')]
+        host_repo.all.return_value = hosts
+        assert catalog_changes(since, 10) == (5, None, hosts)
+        change_log_repo.after.assert_not_called()
+
+
+class TestQueryBudgets(FlaskAppContextEnvironment):
+    @pytest.fixture
+    def sqlalchemy_repos(self, app_context, transaction, catalog_repo,
+                         change_log_repo, monkeypatch):
+        db.drop_all()
+        db.create_all()
+        # Undone after the test, the other tests keep their repos and indexes.
+        for key, repo in {
+                'admin': SqlalchemyAdminRepo(), 'host': SqlalchemyHostRepo(),
+                'service': SqlalchemyServiceRepo(),
+                'catalog': SqlalchemyCatalogRepo(),
+                'transaction': SqlalchemyTransactionManager(),
+                'change_log': SqlalchemyChangeLogRepo()}.items():
+            monkeypatch.setattr(repos, key, repo, raising=False)
+        monkeypatch.setattr(usecases, 'service_index', ServiceIndex())
+        monkeypatch.setattr(usecases, 'event_bus', EventBus())
+        # The first revision inserts the catalog row.
+        add_host('localhost', None, '127.0.0.1')
+        yield
+        db.session.remove()
+        db.drop_all()
+
+    @pytest.mark.parametrize('count', [3, 30])
+    def test_list_all_host(self, sqlalchemy_repos, count):
+        SqlalchemyHostRepo().save_many(
+            [Host('fake_id{:02}'.format(i), 'localhost', None, '127.0.0.1',
+                  [Service('fake_service{:02}'.format(i), 'nginx', None, 80)])
+             for i in range(count)])
+        with query_budget(2, exact=True):
+            assert len(list_all_host()) == count + 1
+
+    def test_writes(self, sqlalchemy_repos):
+        # Besides the write: bump and read the revision, log the changes
+        # and compact the log.
+        with query_budget(6):
+            add_host('localhost', None, '127.0.0.1')
+        host_id = list_all_host()[0].id
+        with query_budget(6):
+            add_service(host_id, 'nginx', None, 80)
+        with query_budget(5):
+            modify_host(host_id, 'remote', None, '10.0.0.1')
+        with query_budget(5):
+            delete_host(host_id)
+
+    def test_get_user_by_token(self, sqlalchemy_repos):
+        set_admin('test', '123456', 'bullshit', 'tip')
+        token = auth_admin_token('test', '123456')
+        token_cache.clear()
+        with query_budget(1):
+            assert is_valid_admin(get_user_by_token(token))
@@ -0,0 +1,226 @@
+from datetime import datetime
+
+import pytest
+
+from app.domain.entities import Admin, Host, Service, ServiceStatus
+from app.domain.errors import NoAdministratorFound
+from app.domain.events import Event
+from app.domain.history import ProbeHistory
+from app.repository.memory import (MemoryStore, MemoryAdminRepo,
+                                   MemoryHostRepo, MemoryServiceRepo,
+                                   MemoryCatalogRepo, MemoryTransactionManager,
+                                   MemoryServiceStatusRepo,
+                                   MemoryProbeHistoryRepo,
+                                   MemoryChangeLogRepo)
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+@pytest.fixture
+def host_data():
+    return {'id': 'fake_id', 'name': 'localhost', 'detail': 'this machine',
+            'address': '127.0.0.1'}
+
+
+@pytest.fixture
+def service_data():
+    return {'id': 'fake_id1', 'name': 'nginx', 'detail': 'nginx service',
+            'port': 80}
+
+
+class TestAdminRepoImpl(object):
+    def test_admin_persistence(self, store):
+        repo = MemoryAdminRepo(store)
+        with pytest.raises(NoAdministratorFound):
+            repo.get()
+        assert repo.version() is None
+        updated_at = datetime.now()
+        repo.set(Admin('test', updated_at, original_password='123'))
+        admin = repo.get()
+        assert admin.username == 'test'
+        assert admin.updated_at == updated_at
+        assert admin.is_password_correct('123')
+        assert repo.version() == 1
+
+
+class TestHostRepoImpl(object):
+    def test_save_and_query(self, store, host_data, service_data):
+        repo = MemoryHostRepo(store)
+        repo.save(Host(**host_data, services=[Service(**service_data)]))
+        host = repo.host_of_id(host_data['id'])
+        assert host.to_dict() == dict(host_data, services=[service_data])
+        assert [h.id for h in repo.all()] == [host_data['id']]
+        assert repo.exists(host_data['id'])
+        assert not repo.lock_for_update('unknown')
+        assert repo.host_of_id('unknown') is None
+
+    def test_save_modified_host(self, store, host_data):
+        repo = MemoryHostRepo(store)
+        repo.save(Host(**host_data))
+        repo.save(Host(**dict(host_data, name='server1')))
+        hosts = repo.all()
+        assert len(hosts) == 1
+        assert hosts[0].name == 'server1'
+
+    def test_save_syncs_services(self, store, host_data, service_data):
+        repo = MemoryHostRepo(store)
+        services = [Service(**dict(service_data, id=id))
+                    for id in ('fake_id1', 'fake_id2')]
+        repo.save(Host(**host_data, services=services))
+        repo.save(Host(**host_data, services=services[1:]))
+        assert [s.id for s in repo.all()[0].services] == ['fake_id2']
+        repo.save(Host(**host_data), include_services=False)
+        assert [s.id for s in repo.all()[0].services] == ['fake_id2']
+
+    def test_page(self, store, host_data):
+        repo = MemoryHostRepo(store)
+        ids = ['fake_id{}'.format(i) for i in range(5)]
+        for id in reversed(ids):
+            repo.save(Host(**dict(host_data, id=id)))
+        assert [host.id for host in repo.page(None, 2)] == ids[:2]
+        assert [host.id for host in repo.page(ids[1], 2)] == ids[2:4]
+        assert [host.id for host in repo.iterate(2)] == ids
+
+    def test_without_services(self, store, host_data, service_data):
+        repo = MemoryHostRepo(store)
+        repo.save(Host(**host_data, services=[Service(**service_data)]))
+        assert repo.all(include_services=False)[0].services == []
+        assert len(repo.page(None, 1)[0].services) == 1
+
+    def test_delete(self, store, host_data, service_data):
+        repo = MemoryHostRepo(store)
+        repo.save(Host(**host_data, services=[Service(**service_data)]))
+        repo.delete(host_data['id'])
+        assert repo.all() == []
+        assert store.services == {}
+
+
+    def test_delete_many(self, store, host_data, service_data):
+        repo = MemoryHostRepo(store)
+        repo.save(Host(**host_data, services=[Service(**service_data)]))
+        repo.save(Host(**dict(host_data, id='fake_id2')))
+        assert repo.delete_many([host_data['id'], 'fake_id2', 'unknown',
+                                 'fake_id2']) == [host_data['id'], 'fake_id2']
+        assert repo.all() == []
+        assert store.services == {}
+
+
+class TestServiceRepoImpl(object):
+    def test_save_and_delete(self, store, host_data, service_data):
+        host_repo, service_repo = MemoryHostRepo(store), MemoryServiceRepo(
+            store)
+        host_repo.save(Host(**host_data))
+        service_repo.save(host_data['id'], Service(**service_data))
+        service_repo.save(host_data['id'],
+                          Service(**dict(service_data, port=8080)))
+        services = host_repo.host_of_id(host_data['id']).services
+        assert [service.port for service in services] == [8080]
+        service_repo.delete(service_data['id'])
+        assert host_repo.host_of_id(host_data['id']).services == []
+
+
+class TestServiceStatusRepoImpl(object):
+    def test_save_many(self, store, host_data, service_data):
+        MemoryHostRepo(store).save(Host(**host_data,
+                                        services=[Service(**service_data)]))
+        repo = MemoryServiceStatusRepo(store)
+        status = ServiceStatus(service_data['id'], True, 0.01, datetime.now())
+        repo.save_many([status, status._replace(service_id='unknown')])
+        assert repo.status_of(service_data['id']) == status
+        assert repo.status_of('unknown') is None
+        MemoryServiceRepo(store).delete(service_data['id'])
+        assert repo.status_of(service_data['id']) is None
+
+
+class TestProbeHistoryRepoImpl(object):
+    def test_save_many(self, store, host_data, service_data):
+        MemoryHostRepo(store).save(Host(**host_data,
+                                        services=[Service(**service_data)]))
+        repo = MemoryProbeHistoryRepo(store)
+        history = ProbeHistory()
+        history.record(60, True, 0.01)
+        repo.save_many({service_data['id']: history, 'unknown': history})
+        saved = repo.get_many([service_data['id'], 'unknown'])
+        assert list(saved) == [service_data['id']]
+        assert saved[service_data['id']] is not history
+        assert saved[service_data['id']].samples() == history.samples()
+        MemoryServiceRepo(store).delete(service_data['id'])
+        assert repo.get_many([service_data['id']]) == {}
+
+
+class TestChangeLogRepoImpl(object):
+    def test_after(self, store):
+        repo = MemoryChangeLogRepo(store)
+        assert repo.oldest() is None
+        repo.append(1, [('host.created', {'id': 'a'})])
+        repo.append(2, [('host.deleted', {'id': 'a'}),
+                        ('host.deleted', {'id': 'b'})])
+        repo.append(3, [])
+        repo.append(4, [('service.deleted', {'id': 'c'})])
+        assert repo.oldest() == 1
+        assert repo.after(0, 1) == [Event(1, 'host.created', {'id': 'a'})]
+        assert repo.after(0, 2) == repo.after(0, 3) == [
+            Event(1, 'host.created', {'id': 'a'}),
+            Event(2, 'host.deleted', {'id': 'a'}),
+            Event(2, 'host.deleted', {'id': 'b'})]
+        assert repo.after(2, 10) == [
+            Event(4, 'service.deleted', {'id': 'c'})]
+        assert repo.after(4, 10) == []
+
+    def test_compact(self, store):
+        repo = MemoryChangeLogRepo(store)
+        for revision in range(1, 4):
+            repo.append(revision, [('host.deleted', {'id': revision})])
+        repo.compact(-1)
+        repo.compact(2)
+        assert repo.oldest() == 3
+        with pytest.raises(RuntimeError):
+            with MemoryTransactionManager(store).atomic():
+                repo.compact(3)
+                repo.append(4, [('host.deleted', {'id': 4})])
+                raise RuntimeError()
+        assert repo.after(0, 10) == [Event(3, 'host.deleted', {'id': 3})]
+
+
+class TestTransactionManagerImpl(object):
+    def test_rollback(self, store, host_data, service_data):
+        host_repo, catalog_repo = MemoryHostRepo(store), MemoryCatalogRepo(
+            store)
+        host_repo.save(Host(**host_data, services=[Service(**service_data)]))
+        with pytest.raises(RuntimeError):
+            with MemoryTransactionManager(store).atomic():
+                host_repo.delete(host_data['id'])
+                host_repo.save(Host(**dict(host_data, id='fake_id2')))
+                catalog_repo.bump()
+                raise RuntimeError()
+        assert [host.to_dict() for host in host_repo.all()] == [
+            dict(host_data, services=[service_data])]
+        assert catalog_repo.revision() == 0
+
+
+def test_journal_replay(tmpdir, host_data, service_data):
+    path = str(tmpdir.join('journal'))
+    store = MemoryStore(path)
+    MemoryAdminRepo(store).set(
+        Admin('test', datetime.now(), original_password='123'))
+    with MemoryTransactionManager(store).atomic():
+        MemoryHostRepo(store).save(
+            Host(**host_data, services=[Service(**service_data)]))
+        MemoryCatalogRepo(store).bump()
+        MemoryChangeLogRepo(store).append(1, [('host.created',
+                                               {'id': host_data['id']})])
+    with pytest.raises(RuntimeError):
+        with MemoryTransactionManager(store).atomic():
+            MemoryCatalogRepo(store).bump()
+            raise RuntimeError()
+
+    replayed = MemoryStore(path)
+    assert MemoryAdminRepo(replayed).get().username == 'test'
+    assert [host.to_dict() for host in MemoryHostRepo(replayed).all()] == [
+        dict(host_data, services=[service_data])]
+    assert MemoryCatalogRepo(replayed).revision() == 1
+    assert MemoryChangeLogRepo(replayed).after(0, 10) == [
+        Event(1, 'host.created', {'id': host_data['id']})]
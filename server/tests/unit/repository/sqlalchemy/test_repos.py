@@ -1,13 +1,23 @@
 from datetime import datetime
 
 import pytest
+from sqlalchemy import event
 
-from app.domain.entities import Admin, Host, Service
+from app.domain.entities import Admin, Host, Service, ServiceStatus
 from app.domain.errors import NoAdministratorFound
+from app.domain import metrics, timing
+from app.domain.events import Event
+from app.domain.history import ProbeHistory
 from app.repository.sqlalchemy import (SqlalchemyAdminRepo, SqlalchemyHostRepo,
-                                       SqlalchemyServiceRepo)
-from app.repository.sqlalchemy.models import db
-from tests.unit.utils import FlaskAppContextEnvironment
+                                       SqlalchemyServiceRepo,
+                                       SqlalchemyCatalogRepo,
+                                       SqlalchemyTransactionManager,
+                                       SqlalchemyServiceStatusRepo,
+                                       SqlalchemyProbeHistoryRepo,
+                                       SqlalchemyChangeLogRepo)
+from app.repository.sqlalchemy import upsert
+from app.repository.sqlalchemy.models import db, ServiceModel
+from tests.unit.utils import FlaskAppContextEnvironment, query_budget
 
 
 class DbEnvironment(FlaskAppContextEnvironment):
@@ -59,6 +69,13 @@ class TestAdminRepoImpl(DbEnvironment):
         with pytest.raises(NoAdministratorFound):
             repo.get()
 
+    def test_version(self, table, repo, admin1_data, admin2_data):
+        assert repo.version() is None
+        repo.set(Admin(**admin1_data))
+        first_version = repo.version()
+        repo.set(Admin(**admin2_data))
+        assert repo.version() > first_version
+
 
 class TestHostRepoImpl(DbEnvironment):
     @pytest.fixture(scope='class')
@@ -124,18 +141,108 @@ class TestHostRepoImpl(DbEnvironment):
             else:
                 assert host2_data[key] == getattr(host_from_persistence, key)
 
+    @pytest.mark.parametrize('native_upsert', [True, False])
+    def test_save_syncs_services(self, table, repo, host1_data,
+                                 native_upsert, monkeypatch):
+        monkeypatch.setattr(upsert, '_SQLITE_UPSERT', native_upsert)
+        services = [Service('fake_service{}'.format(i), 'nginx', None, 80 + i)
+                    for i in range(3)]
+        repo.save(Host(**host1_data, services=services[:2]))
+        services[1].port = 8080
+        repo.save(Host(**host1_data, services=services[1:]))
+        saved = repo.host_of_id(host1_data['id']).services
+        assert sorted((s.id, s.port) for s in saved) == [
+            ('fake_service1', 8080), ('fake_service2', 82)]
+
+        repo.save(Host(**dict(host1_data, name='server1')),
+                  include_services=False)
+        saved_host = repo.host_of_id(host1_data['id'])
+        assert saved_host.name == 'server1'
+        assert len(saved_host.services) == 2
+
+    def test_save_many(self, table, repo, host1_data, host2_data):
+        service = Service('fake_service', 'nginx', 'nginx service', 80)
+        repo.save_many([Host(**host1_data, services=[service]),
+                        Host(**host2_data)])
+        hosts = repo.all()
+        assert [host.id for host in hosts] == [host1_data['id'],
+                                               host2_data['id']]
+        assert [s.to_dict() for s in hosts[0].services] == [service.to_dict()]
+
     def test_delete(self, table, repo, host1_data):
         host = Host(**host1_data)
         repo.save(host)
         repo.delete(repo.all()[0].id)
         assert len(repo.all()) == 0
 
+    def test_iterate(self, table, repo, host1_data):
+        ids = ['fake_id{}'.format(i) for i in range(5)]
+        for id in ids:
+            repo.save(Host(**dict(host1_data, id=id)))
+        assert [host.id for host in repo.iterate(batch_size=2)] == ids
+        assert [host.id for host in repo.iterate(batch_size=5)] == ids
+        assert [host.id for host in repo.all()] == ids
+
+    def test_page(self, table, repo, host1_data):
+        ids = ['fake_id{}'.format(i) for i in range(5)]
+        for id in reversed(ids):
+            repo.save(Host(**dict(host1_data, id=id)))
+        assert [host.id for host in repo.page(None, 2)] == ids[:2]
+        assert [host.id for host in repo.page(ids[1], 2)] == ids[2:4]
+        assert [host.id for host in repo.page(ids[3], 2)] == ids[4:]
+        assert repo.page(ids[4], 2) == []
+
+    def test_page_projection(self, table, repo, host1_data):
+        service = Service('fake_service', 'nginx', 'nginx service', 80)
+        repo.save(Host(**host1_data, services=[service]))
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context,
+                   executemany):
+            statements.append(statement)
+
+        db.session.expunge_all()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            host, = repo.page(None, 2, fields=('name',),
+                              include_services=False)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert (host.id, host.name, host.detail, host.address) == (
+            'fake_id1', 'localhost', None, None)
+        assert host.services == []
+        statement, = statements
+        assert 'detail' not in statement and 'services' not in statement
+
+        host, = repo.all(fields=('address',))
+        assert (host.name, host.address) == (None, '127.0.0.1')
+        assert [s.id for s in host.services] == ['fake_service']
+
+    def test_delete_many_cascades(self, table, repo, host1_data,
+                                  host2_data):
+        service = Service('fake_service', 'nginx', 'nginx service', 80)
+        repo.save_many([Host(**host1_data, services=[service]),
+                        Host(**host2_data)])
+        assert repo.delete_many([
+            host2_data['id'], 'unknown', host1_data['id'], host2_data['id']
+        ]) == [host2_data['id'], host1_data['id']]
+        assert repo.all() == []
+        assert ServiceModel.query.count() == 0
+
     def test_query_by_id(self, table, repo, host1_data):
         host = Host(**host1_data)
         repo.save(host)
         saved_host = repo.host_of_id(host.id)
         for key in host1_data.keys():
             assert getattr(host, key) == getattr(saved_host, key)
+        assert repo.host_of_id('unknown') is None
+
+    def test_exists(self, table, repo, host1_data):
+        repo.save(Host(**host1_data))
+        assert repo.exists(host1_data['id'])
+        assert repo.lock_for_update(host1_data['id'])
+        assert not repo.exists('unknown')
+        assert not repo.lock_for_update('unknown')
 
 
 class TestServiceRepoImpl(DbEnvironment):
@@ -223,3 +330,279 @@ class TestServiceRepoImpl(DbEnvironment):
         service_id = host_repo.all()[0].services[0].id
         service_repo.delete(service_id)
         assert len(host_repo.all()[0].services) == 0
+
+    def test_delete_many(self, table, host_repo, service_repo,
+                         host_data, service1_data, service2_data):
+        host_repo.save(Host(**host_data, services=[
+            Service(**service1_data), Service(**service2_data)]))
+        assert service_repo.delete_many([service1_data['id'], 'unknown']) \
+            == [service1_data['id']]
+        services = host_repo.all()[0].services
+        assert [service.id for service in services] == [service2_data['id']]
+
+
+class TestServiceStatusRepoImpl(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def repo(self):
+        return SqlalchemyServiceStatusRepo()
+
+    @pytest.fixture
+    def service(self, table):
+        service = Service('fake_service', 'nginx', None, 80)
+        SqlalchemyHostRepo().save(
+            Host('fake_host', 'localhost', None, '127.0.0.1', [service]))
+        return service
+
+    def test_save_many(self, repo, service):
+        checked_at = datetime(2017, 10, 1, 12, 30)
+        repo.save_many([ServiceStatus(service.id, True, 0.01, checked_at),
+                        ServiceStatus('unknown', True, 0.01, checked_at)])
+        assert repo.status_of(service.id) == ServiceStatus(
+            service.id, True, 0.01, checked_at)
+        assert repo.status_of('unknown') is None
+
+        repo.save_many([ServiceStatus(service.id, False, None, checked_at)])
+        assert not repo.status_of(service.id).reachable
+
+    def test_deleted_with_service(self, repo, service):
+        repo.save_many([ServiceStatus(service.id, True, 0.01,
+                                      datetime.now())])
+        SqlalchemyServiceRepo().delete(service.id)
+        assert repo.status_of(service.id) is None
+
+
+class TestProbeHistoryRepoImpl(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def repo(self):
+        return SqlalchemyProbeHistoryRepo()
+
+    @pytest.fixture
+    def service(self, table):
+        service = Service('fake_service', 'nginx', None, 80)
+        SqlalchemyHostRepo().save(
+            Host('fake_host', 'localhost', None, '127.0.0.1', [service]))
+        return service
+
+    def test_save_many(self, repo, service):
+        history = ProbeHistory()
+        history.record(60, True, 0.01)
+        repo.save_many({service.id: history, 'unknown': history})
+        histories = repo.get_many([service.id, 'unknown'])
+        assert list(histories) == [service.id]
+        assert histories[service.id].samples() == history.samples()
+
+        history.record(120, False)
+        repo.save_many({service.id: history})
+        assert len(repo.get_many([service.id])[service.id].samples()) == 2
+
+        SqlalchemyServiceRepo().delete(service.id)
+        assert repo.get_many([service.id]) == {}
+
+
+class TestChangeLogRepoImpl(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def repo(self):
+        return SqlalchemyChangeLogRepo()
+
+    def test_after(self, table, repo):
+        assert repo.oldest() is None
+        repo.append(1, [('host.created', {'id': 'a', 'services': []})])
+        repo.append(2, [('host.deleted', {'id': 'a'}),
+                        ('host.deleted', {'id': 'b'})])
+        repo.append(4, [('service.deleted', {'id': 'c'})])
+        assert repo.oldest() == 1
+        assert repo.after(0, 1) == [
+            Event(1, 'host.created', {'id': 'a', 'services': []})]
+        assert repo.after(0, 2) == repo.after(0, 3) == [
+            Event(1, 'host.created', {'id': 'a', 'services': []}),
+            Event(2, 'host.deleted', {'id': 'a'}),
+            Event(2, 'host.deleted', {'id': 'b'})]
+        assert repo.after(2, 10) == [
+            Event(4, 'service.deleted', {'id': 'c'})]
+        assert repo.after(4, 10) == []
+
+    def test_compact(self, table, repo):
+        for revision in range(1, 4):
+            repo.append(revision, [('host.deleted', {'id': revision})])
+        repo.compact(2)
+        assert repo.oldest() == 3
+        with pytest.raises(RuntimeError):
+            with SqlalchemyTransactionManager().atomic():
+                repo.compact(3)
+                repo.append(4, [('host.deleted', {'id': 4})])
+                raise RuntimeError()
+        assert repo.after(0, 10) == [Event(3, 'host.deleted', {'id': 3})]
+
+
+class TestInstrumentation(DbEnvironment):
+    def test_statements_counted(self, table):
+        total = metrics.db_statements.value()
+        metrics.start_statements()
+        timings = timing.start()
+        try:
+            SqlalchemyCatalogRepo().revision()
+        finally:
+            timing.stop()
+            count, seconds = metrics.stop_statements()
+        assert count == metrics.db_statements.value() - total == 1
+        assert seconds > 0
+        assert list(timings.durations) == ['sql']
+
+
+class TestCatalogRepoImpl(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def repo(self):
+        return SqlalchemyCatalogRepo()
+
+    def test_bump(self, table, repo):
+        assert repo.revision() == 0
+        repo.bump()
+        repo.bump()
+        assert repo.revision() == 2
+
+
+class TestTransactionManagerImpl(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def transaction(self):
+        return SqlalchemyTransactionManager()
+
+    @pytest.fixture(scope='class')
+    def host_repo(self):
+        return SqlalchemyHostRepo()
+
+    @pytest.fixture(scope='class')
+    def catalog_repo(self):
+        return SqlalchemyCatalogRepo()
+
+    @pytest.fixture
+    def host(self):
+        return Host('fake_id', 'localhost', 'this machine', '127.0.0.1')
+
+    def test_commit(self, table, transaction, host_repo, catalog_repo,
+                    host):
+        with transaction.atomic():
+            host_repo.save(host)
+            with transaction.atomic():
+                catalog_repo.bump()
+        db.session.rollback()
+        assert len(host_repo.all()) == 1
+        assert catalog_repo.revision() == 1
+
+    def test_rollback(self, table, transaction, host_repo, catalog_repo,
+                      host):
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                host_repo.save(host)
+                catalog_repo.bump()
+                raise RuntimeError()
+        assert host_repo.all() == []
+        assert catalog_repo.revision() == 0
+
+
+class TestQueryPlans(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def host_repo(self):
+        return SqlalchemyHostRepo()
+
+    @pytest.fixture(scope='class')
+    def service_repo(self):
+        return SqlalchemyServiceRepo()
+
+    @pytest.fixture
+    def statements(self, table, host_repo):
+        for i in range(3):
+            host_repo.save(Host('fake_id{}'.format(i), 'localhost', None,
+                                '127.0.0.1', [Service(
+                                    'fake_service{}'.format(i), 'nginx', None,
+                                    80)]))
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context,
+                   executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    @staticmethod
+    def plans(statements):
+        cursor = db.session.connection().connection.cursor()
+        for statement, parameters in statements:
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            yield ' / '.join(row[-1] for row in cursor.fetchall())
+
+    def assert_services_indexed(self, statements, index):
+        plans = list(self.plans(
+            [s for s in statements if 'services' in s[0]]))
+        assert plans
+        for plan in plans:
+            assert 'SCAN services' not in plan.replace('TABLE ', '')
+            assert index in plan
+
+    def test_host_listing(self, statements, host_repo):
+        host_repo.all()
+        host_repo.page('fake_id0', 1)
+        host_repo.host_of_id('fake_id1')
+        self.assert_services_indexed(statements, 'ix_services_host_id')
+
+    def test_host_services_sync(self, statements, host_repo):
+        host_repo.save(Host('fake_id1', 'localhost', None, '127.0.0.1'))
+        self.assert_services_indexed(
+            [s for s in statements if s[0].startswith('DELETE')],
+            'ix_services_host_id')
+
+    def test_lookup_by_name_and_port(self, statements):
+        ServiceModel.query.filter_by(name='nginx').all()
+        self.assert_services_indexed(statements, 'ix_services_name')
+        del statements[:]
+        ServiceModel.query.filter_by(port=80).all()
+        self.assert_services_indexed(statements, 'ix_services_port')
+
+
+class TestQueryBudgets(DbEnvironment):
+    @pytest.fixture(scope='class')
+    def host_repo(self):
+        return SqlalchemyHostRepo()
+
+    @pytest.fixture(params=[3, 30])
+    def hosts(self, request, table, host_repo):
+        hosts = [Host('fake_id{:02}'.format(i), 'localhost', None, '127.0.0.1',
+                      [Service('fake_service{:02}_{}'.format(i, j), 'nginx',
+                               None, 80 + j) for j in range(2)])
+                 for i in range(request.param)]
+        host_repo.save_many(hosts)
+        return hosts
+
+    def test_listing(self, host_repo, hosts):
+        # Hosts, then their services in one batch: never one per host.
+        with query_budget(2, exact=True):
+            assert len(host_repo.all()) == len(hosts)
+        with query_budget(2, exact=True):
+            assert len(host_repo.page(None, 100)) == len(hosts)
+        with query_budget(1, exact=True):
+            host_repo.all(include_services=False)
+        with query_budget(1, exact=True):
+            assert host_repo.host_of_id(hosts[-1].id).services
+
+    def test_writes(self, host_repo, hosts):
+        with query_budget(2):
+            host_repo.save_many([Host('fake_new', 'localhost', None,
+                                      '127.0.0.1', [Service(
+                                          'fake_new_service', 'nginx', None,
+                                          80)])])
+        with query_budget(3):
+            host_repo.save(hosts[0])
+        with query_budget(1):
+            SqlalchemyServiceRepo().save(hosts[0].id, hosts[0].services[0])
+        # The ids deleted are SELECTed first.
+        with query_budget(2):
+            host_repo.delete_many([host.id for host in hosts])
+
+    def test_admin(self, table):
+        repo = SqlalchemyAdminRepo()
+        # session.merge() SELECTs the row before writing it.
+        with query_budget(3):
+            repo.set(Admin('test', datetime.now(), original_password='123'))
+        with query_budget(1):
+            repo.get()
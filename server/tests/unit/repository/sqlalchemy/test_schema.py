@@ -0,0 +1,76 @@
+import sqlalchemy as sa
+from alembic.autogenerate import produce_migrations, render_python_code
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, inspect
+
+from app.repository.sqlalchemy.models import db, enable_foreign_keys
+from app.repository.sqlalchemy.schema import name_constraints
+
+# As created by the first version of the models.
+BASELINE_SCHEMA = [
+    '''CREATE TABLE admins (
+        id INTEGER NOT NULL, username VARCHAR(50) NOT NULL,
+        password VARCHAR(50) NOT NULL, sign VARCHAR(10), tip TEXT,
+        updated_at DATETIME, PRIMARY KEY (id), UNIQUE (username))''',
+    '''CREATE TABLE hosts (
+        id VARCHAR(50) NOT NULL, name VARCHAR(50) NOT NULL, detail TEXT,
+        address TEXT NOT NULL, PRIMARY KEY (id))''',
+    '''CREATE TABLE services (
+        id VARCHAR(50) NOT NULL, name VARCHAR(50) NOT NULL, detail TEXT,
+        port INTEGER NOT NULL, host_id INTEGER NOT NULL, PRIMARY KEY (id),
+        FOREIGN KEY(host_id) REFERENCES hosts (id))''',
+    "INSERT INTO hosts VALUES ('fake_id', 'localhost', NULL, '127.0.0.1')",
+    "INSERT INTO services VALUES ('fake_service', 'nginx', NULL, 80, "
+    "'fake_id')"]
+
+
+def migrate(engine):
+    r"""Generate the migration to the models and run it, like
+    ``flask db migrate`` and ``flask db upgrade`` with the options of
+    :func:`app.repository.sqlalchemy.get_repos`.
+
+    :return: whether there was anything to migrate
+    """
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={
+            'target_metadata': db.metadata, 'compare_type': True,
+            'render_as_batch': True})
+        upgrade_ops = produce_migrations(context, db.metadata).upgrade_ops
+        if upgrade_ops.is_empty():
+            return False
+        code = render_python_code(upgrade_ops, render_as_batch=True)
+        namespace = {'op': Operations(context), 'sa': sa}
+        # Indented as the body of upgrade() in a migration script.
+        exec('def upgrade():\n' + code, namespace)
+        with connection.begin():
+            namespace['upgrade']()
+    return True
+
+
+def test_upgrade_baseline_schema(tmpdir):
+    engine = create_engine('sqlite:///' + str(tmpdir.join('baseline.db')))
+    with engine.connect() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(statement)
+
+    assert name_constraints(engine) == ['services']
+    assert name_constraints(engine) == []
+    assert migrate(engine)
+    assert not migrate(engine)
+
+    inspector = inspect(engine)
+    [fk] = inspector.get_foreign_keys('services')
+    assert fk['name'] == 'fk_services_host_id_hosts'
+    columns = {column['name']: column['type']
+               for column in inspector.get_columns('services')}
+    assert isinstance(columns['host_id'], sa.String)
+    assert {index['name'] for index in inspector.get_indexes('services')} \
+        == {'ix_services_host_id', 'ix_services_name', 'ix_services_port'}
+    enable_foreign_keys(engine)
+    with engine.connect() as connection:
+        assert connection.execute(
+            'SELECT host_id FROM services').fetchall() == [('fake_id',)]
+        connection.execute("DELETE FROM hosts WHERE id = 'fake_id'")
+        assert connection.execute(
+            'SELECT count(*) FROM services').scalar() == 0
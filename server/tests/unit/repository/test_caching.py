@@ -0,0 +1,230 @@
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Event, Thread, local
+from unittest.mock import Mock
+
+import pytest
+
+from app.domain.entities import Admin, Host, Service
+from app.domain.errors import NoAdministratorFound
+from app.repository.caching import CachingAdminRepo, cache_catalog
+from app.repository.memory import (MemoryStore, MemoryHostRepo,
+                                   MemoryServiceRepo, MemoryCatalogRepo,
+                                   MemoryTransactionManager)
+
+
+class TestCachingAdminRepo(object):
+    @pytest.fixture
+    def admin(self):
+        return Admin('test', datetime.now(), original_password='123')
+
+    @pytest.fixture
+    def inner(self, admin):
+        repo = Mock()
+        repo.version.return_value = 1
+        repo.get.return_value = admin
+        return repo
+
+    @pytest.fixture
+    def repo(self, inner):
+        return CachingAdminRepo(inner)
+
+    def test_get_is_cached(self, repo, inner, admin):
+        for _ in range(3):
+            assert repo.get().username == admin.username
+        inner.get.assert_called_once()
+        assert inner.version.call_count == 3
+
+    def test_get_returns_copy(self, repo):
+        repo.get().auth_at = datetime.now()
+        assert repo.get().auth_at is None
+
+    def test_version_change_reloads(self, repo, inner):
+        repo.get()
+        inner.version.return_value = 2
+        repo.get()
+        assert inner.get.call_count == 2
+
+    def test_set_invalidates(self, repo, inner, admin):
+        repo.get()
+        repo.set(admin)
+        repo.get()
+        inner.set.assert_called_once_with(admin)
+        assert inner.get.call_count == 2
+
+    def test_no_admin(self, repo, inner):
+        inner.version.return_value = None
+        with pytest.raises(NoAdministratorFound):
+            repo.get()
+
+
+class TestCachingCatalogRepos(object):
+    @pytest.fixture
+    def engine(self):
+        store = MemoryStore()
+        return {'host': Mock(wraps=MemoryHostRepo(store)),
+                'service': Mock(wraps=MemoryServiceRepo(store)),
+                'catalog': MemoryCatalogRepo(store),
+                'transaction': MemoryTransactionManager(store)}
+
+    @pytest.fixture
+    def repos(self, engine):
+        repos = cache_catalog(dict(engine), 10)
+        for i in range(3):
+            repos['host'].save(Host(
+                'fake_id{}'.format(i), 'localhost', None, '127.0.0.1',
+                [Service('fake_service{}'.format(i), 'nginx', None, 80)]))
+        return repos
+
+    def write(self, repos, operation):
+        with repos['transaction'].atomic():
+            operation()
+            repos['catalog'].bump()
+
+    def test_listing_is_cached(self, repos, engine):
+        assert [host.id for host in repos['host'].all()] == [
+            'fake_id0', 'fake_id1', 'fake_id2']
+        repos['host'].all()
+        assert [host.id for host in repos['host'].page('fake_id0', 1)] == [
+            'fake_id1']
+        engine['host'].all.assert_called_once()
+        engine['host'].page.assert_not_called()
+
+    def test_listing_without_services(self, repos, engine):
+        repos['host'].all()
+        hosts = repos['host'].page(None, 2, include_services=False)
+        assert [host.services for host in hosts] == [[], []]
+        assert len(repos['host'].all()[0].services) == 1
+        engine['host'].all.assert_called_once()
+
+    def test_returns_copies(self, repos):
+        repos['host'].host_of_id('fake_id0').services.append(None)
+        repos['host'].all()[0].name = 'changed'
+        host = repos['host'].host_of_id('fake_id0')
+        assert len(host.services) == 1
+        assert host.name == 'localhost'
+
+    def test_host_write_invalidates_host_and_listing(self, repos, engine):
+        for id in ('fake_id0', 'fake_id1'):
+            repos['host'].host_of_id(id)
+        self.write(repos, lambda: repos['host'].save(
+            Host('fake_id0', 'server', None, '8.8.8.8')))
+        assert repos['host'].host_of_id('fake_id0').name == 'server'
+        repos['host'].host_of_id('fake_id1')
+        assert engine['host'].host_of_id.call_count == 3
+        assert repos['host'].all()[0].name == 'server'
+
+    def test_service_delete_invalidates_its_host(self, repos, engine):
+        repos['host'].host_of_id('fake_id0')
+        repos['host'].host_of_id('fake_id1')
+        self.write(repos, lambda: repos['service'].delete('fake_service0'))
+        assert repos['host'].host_of_id('fake_id0').services == []
+        repos['host'].host_of_id('fake_id1')
+        assert engine['host'].host_of_id.call_count == 3
+
+    def test_foreign_change_clears_cache(self, repos, engine):
+        repos['host'].all()
+        engine['catalog'].bump()
+        repos['host'].all()
+        assert engine['host'].all.call_count == 2
+
+    def test_rolled_back_write_clears_cache(self, repos, engine):
+        repos['host'].host_of_id('fake_id1')
+        with pytest.raises(RuntimeError):
+            with repos['transaction'].atomic():
+                repos['catalog'].bump()
+                raise RuntimeError()
+        engine['catalog'].bump()
+        repos['host'].host_of_id('fake_id1')
+        assert engine['host'].host_of_id.call_count == 2
+
+    def test_projection(self, repos):
+        repos['host'].all()
+        [host] = repos['host'].page(None, 1, fields=('name',))
+        assert (host.name, host.address) == ('localhost', None)
+        assert host.services
+
+    def test_listing_from_iterate(self, repos, engine):
+        assert len(list(repos['host'].iterate(2))) == 3
+        assert len(repos['host'].page(None, 10)) == 3
+        repos['host'].all()
+        engine['host'].page.assert_not_called()
+        engine['host'].all.assert_not_called()
+
+    def test_write_keeps_pages_from_repo(self, repos, engine):
+        repos['host'].all()
+        self.write(repos, lambda: repos['host'].delete('fake_id2'))
+        assert len(repos['host'].page(None, 10)) == 2
+        engine['host'].page.assert_called_once()
+        engine['host'].all.assert_called_once()
+
+    def test_large_catalog_is_not_cached(self, engine):
+        repos = cache_catalog(dict(engine), 1)
+        for id in ('fake_id0', 'fake_id1'):
+            repos['host'].save(Host(id, 'localhost', None, '127.0.0.1'))
+        assert len(repos['host'].all()) == 2
+        assert len(repos['host'].all()) == 2
+        assert engine['host'].all.call_count == 2
+        for _ in range(2):
+            assert len(list(repos['host'].iterate(1))) == 2
+        # Iterated once by the cache, paged by the engine itself.
+        assert engine['host'].iterate.call_count == 2
+        engine['host'].page.assert_not_called()
+
+
+class StagingEngine(object):
+    r"""Host, catalog and transaction repos in one, whose transactions are
+    seen by other threads only once committed, like a database's."""
+
+    def __init__(self):
+        self.committed = [{}, 0]
+        self._local = local()
+
+    def _view(self):
+        return getattr(self._local, 'staged', None) or self.committed
+
+    @contextmanager
+    def atomic(self):
+        hosts, revision = self.committed
+        self._local.staged = [dict(hosts), revision]
+        try:
+            yield
+            self.committed = self._local.staged
+        finally:
+            self._local.staged = None
+
+    def save(self, host, *, include_services=True):
+        self._view()[0][host.id] = host
+
+    def host_of_id(self, host_id):
+        return self._view()[0].get(host_id)
+
+    def revision(self):
+        return self._view()[1]
+
+    def bump(self):
+        self._view()[1] += 1
+
+
+def test_read_during_write_is_not_kept():
+    engine = StagingEngine()
+    repos = cache_catalog(dict.fromkeys(
+        ('host', 'service', 'catalog', 'transaction'), engine), 10)
+    repos['host'].save(Host('fake_id0', 'old', None, '127.0.0.1'))
+    assert repos['host'].host_of_id('fake_id0').name == 'old'
+    written, read = Event(), Event()
+
+    def write():
+        with repos['transaction'].atomic():
+            repos['host'].save(Host('fake_id0', 'new', None, '127.0.0.1'))
+            repos['catalog'].bump()
+            written.set()
+            read.wait()
+
+    writer = Thread(target=write)
+    writer.start()
+    written.wait()
+    assert repos['host'].host_of_id('fake_id0').name == 'old'
+    read.set()
+    writer.join()
+    assert repos['host'].host_of_id('fake_id0').name == 'new'
@@ -0,0 +1,39 @@
+from unittest.mock import Mock
+
+from app.domain import timing
+from app.repository.timing import TimedRepo, time_repos
+
+
+def test_timed_repo():
+    repo = Mock()
+    repo.revision.return_value = 3
+    repo.size = 10
+    timed = TimedRepo(repo)
+    timings = timing.start()
+    try:
+        assert timed.revision() == 3
+        assert timed.size == 10
+    finally:
+        timing.stop()
+    assert list(timings.durations) == ['repo']
+    repo.revision.assert_called_once_with()
+
+
+def test_timed_iterator():
+    repo = Mock()
+    repo.iterate.return_value = iter([1, 2])
+    timings = timing.start()
+    try:
+        items = TimedRepo(repo).iterate()
+        durations = dict(timings.durations)
+        assert list(items) == [1, 2]
+    finally:
+        timing.stop()
+    assert timings.durations['repo'] > durations['repo']
+
+
+def test_time_repos():
+    host, transaction = Mock(), Mock()
+    repos = time_repos({'host': host, 'transaction': transaction})
+    assert isinstance(repos['host'], TimedRepo)
+    assert repos['transaction'] is transaction
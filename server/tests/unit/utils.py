@@ -1,6 +1,10 @@
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 
 from app import create_app
+from app.repository.sqlalchemy.models import db
 
 
 class FlaskAppEnvironment(object):
@@ -14,4 +18,33 @@ class FlaskAppContextEnvironment(FlaskAppEnvironment):
     def app_context(self, app):
         app_context = app.app_context()
         yield app_context.push()
-        app_context.pop()
\ No newline at end of file
+        app_context.pop()
+
+
+@contextmanager
+def query_budget(budget, *, exact=False, engine=None):
+    r"""Fail if the block executes more than ``budget`` SQL statements, or
+    another number if ``exact``, listing the statements executed.
+
+    Counts the ``before_cursor_execute`` events of ``engine``, the engine
+    of :data:`db` by default, so the app context must be pushed.
+
+    :return: the list of statements, filled when the block exits
+    """
+    engine = engine or db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    if len(statements) > budget or exact and len(statements) != budget:
+        pytest.fail('{} SQL statements, budget {}{}:\n{}'.format(
+            len(statements), 'exactly ' if exact else '', budget,
+            '\n'.join('{}. {}'.format(index, ' '.join(statement.split()))
+                      for index, statement in enumerate(statements, 1))),
+            pytrace=False)
@@ -0,0 +1,24 @@
+from app.views import events, permission
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestEvents(FlaskAppEnvironment):
+    def test_subscribers_capped(self, app, monkeypatch):
+        monkeypatch.setattr(permission, 'is_valid_admin', lambda user: False)
+        monkeypatch.setattr(permission, 'is_valid_anonymous',
+                            lambda user: True)
+        monkeypatch.setattr(events, 'catalog_events',
+                            lambda *args: iter([None]))
+        monkeypatch.setitem(app.config, 'EVENT_MAX_SUBSCRIBERS', 2)
+        client = app.test_client()
+        streams = [client.get('/events', buffered=False) for _ in range(2)]
+        assert [stream.status_code for stream in streams] == [200, 200]
+        assert client.get('/events').status_code == 503
+        streams.pop().close()
+        assert events.subscribers.count == 1
+        streams.append(client.get('/events', buffered=False))
+        assert streams[-1].status_code == 200
+        # Each stream keeps its request context pushed until closed.
+        for stream in reversed(streams):
+            stream.close()
+        assert events.subscribers.count == 0
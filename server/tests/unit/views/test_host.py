@@ -0,0 +1,75 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from app.domain.entities import Host
+from app.domain.usecases import CatalogChanges
+from app.views import host, permission
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestListHosts(FlaskAppEnvironment):
+    @pytest.fixture
+    def client(self, app, monkeypatch):
+        monkeypatch.setattr(permission, 'is_valid_admin', lambda user: False)
+        monkeypatch.setattr(permission, 'is_valid_anonymous',
+                            lambda user: True)
+        monkeypatch.setattr(host, 'catalog_revision', lambda: 1)
+        return app.test_client()
+
+    @pytest.fixture
+    def hosts(self, monkeypatch):
+        hosts = [Host('fake_id{}'.format(i), 'localhost', None, '127.0.0.1')
+                 for i in range(3)]
+        monkeypatch.setattr(host, 'list_host_page',
+                            Mock(return_value=(hosts, None)))
+        monkeypatch.setattr(host, 'iterate_all_host', Mock(
+            side_effect=lambda batch_size, limit=None, **options:
+            iter(hosts[:limit])))
+        return hosts
+
+    def test_page_limit(self, app, client, hosts):
+        assert client.get('/host?limit=2').status_code == 200
+        assert host.list_host_page.call_args[0] == (None, 2)
+        client.get('/host?cursor=fake_id0')
+        assert host.list_host_page.call_args[0] == (
+            'fake_id0', app.config['HOST_PAGE_SIZE'])
+        for limit in ('0', '-1'):
+            response = client.get('/host?limit=' + limit)
+            assert response.status_code == 400
+
+    def test_stream_uncapped(self, app, client, hosts, monkeypatch):
+        monkeypatch.setitem(app.config, 'STREAM_HOST_LISTING', True)
+        monkeypatch.setitem(app.config, 'HOST_LISTING_MAX_SIZE', 2)
+        response = client.get('/host')
+        assert response.status_code == 200
+        assert len(json.loads(response.get_data(as_text=True))) == 3
+
+    def test_buffered_too_large(self, app, client, hosts, monkeypatch):
+        monkeypatch.setitem(app.config, 'STREAM_HOST_LISTING', False)
+        monkeypatch.setitem(app.config, 'HOST_LISTING_MAX_SIZE', 3)
+        assert len(json.loads(client.get('/host').get_data(
+            as_text=True))) == 3
+        monkeypatch.setitem(app.config, 'HOST_LISTING_MAX_SIZE', 2)
+        response = client.get('/host')
+        assert response.status_code == 400
+        assert 'paginate' in json.loads(
+            response.get_data(as_text=True))['msg']
+
+
+class TestHostChanges(FlaskAppEnvironment):
+    def test_limit(self, app, monkeypatch):
+        monkeypatch.setattr(permission, 'is_valid_admin', lambda user: False)
+        monkeypatch.setattr(permission, 'is_valid_anonymous',
+                            lambda user: True)
+        monkeypatch.setattr(host, 'catalog_changes', Mock(
+            return_value=CatalogChanges(5, [])))
+        client = app.test_client()
+        client.get('/host/changes?since=5')
+        host.catalog_changes.assert_called_once_with(
+            5, app.config['HOST_CHANGES_PAGE_SIZE'])
+        for limit in ('0', '-1'):
+            response = client.get('/host/changes?since=5&limit=' + limit)
+            assert response.status_code == 400
+        host.catalog_changes.assert_called_once()
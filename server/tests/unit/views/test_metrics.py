@@ -0,0 +1,15 @@
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestMetrics(FlaskAppEnvironment):
+    def test_requests_recorded(self, app):
+        client = app.test_client()
+        client.get('/host')
+        response = client.get('/metrics')
+        assert response.mimetype == 'text/plain'
+        body = response.get_data(as_text=True)
+        assert 'http_responses_total{route="/host",method="GET",' \
+               'status="401"}' in body
+        assert 'http_request_duration_seconds_count{route="/host",' \
+               'method="GET"}' in body
+        assert 'route="/metrics"' not in body
@@ -0,0 +1,42 @@
+import pytest
+from flask import jsonify
+
+from app.domain.events import Event
+from app.views.response_helper import respond, respond_stream, \
+    respond_event_stream
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestRespondStream(FlaskAppEnvironment):
+    @pytest.fixture(params=[{}, {'X-Requested-With': 'XMLHttpRequest'}])
+    def headers(self, request):
+        return request.param
+
+    @pytest.mark.parametrize('data', [
+        [{'id': 1, 'services': []}],
+        [{'id': 1, 'name': 'a', 'services': [{'port': 80}, {'port': 443}]},
+         {'id': 2, 'name': 'b\nc', 'services': []}]])
+    def test_same_bytes_as_jsonify(self, app, headers, data):
+        with app.test_request_context('/', headers=headers):
+            expected = jsonify(data).get_data()
+            streamed = respond_stream(iter(data)).get_data()
+        assert streamed == expected
+
+    def test_empty(self, app):
+        with app.test_request_context('/'):
+            assert respond_stream(iter([])).get_data() == \
+                   respond([]).get_data()
+
+
+class TestRespondEventStream(FlaskAppEnvironment):
+    def test_frames(self, app):
+        with app.test_request_context('/'):
+            response = respond_event_stream(iter([
+                Event(3, 'host.deleted', {'id': 'a'}), None,
+                Event(4, 'reset', {})]))
+            data = response.get_data(as_text=True)
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert data == ('id: 3\nevent: host.deleted\ndata: {"id":"a"}\n\n'
+                        ': keepalive\n\n'
+                        'id: 4\nevent: reset\ndata: {}\n\n')
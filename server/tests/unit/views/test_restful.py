@@ -1,6 +1,6 @@
 import pytest
 
-from app.views.restful_helper import parse_argument
+from app.views.restful_helper import parse_argument, comma_separated
 from tests.unit.utils import FlaskAppEnvironment
 
 
@@ -17,3 +17,8 @@ class TestParseArgument(FlaskAppEnvironment):
         with app.test_request_context('/?name=Peter&age=18'):
             with pytest.raises(TypeError):
                 parse_argument(['name'])
+
+
+def test_comma_separated():
+    assert comma_separated('id, name,,address') == ('id', 'name', 'address')
+    assert comma_separated('') == ()
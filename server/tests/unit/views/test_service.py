@@ -0,0 +1,20 @@
+from unittest.mock import Mock
+
+from app.views import permission, service
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestService(FlaskAppEnvironment):
+    def test_port_range(self, app, monkeypatch):
+        monkeypatch.setattr(permission, 'is_valid_admin', lambda user: True)
+        monkeypatch.setattr(service, 'add_service', Mock())
+        client = app.test_client()
+        form = {'host_id': 'fake_id', 'name': 'nginx', 'detail': ''}
+        for port in ('0', '70000', 'http'):
+            response = client.post('/service', data=dict(form, port=port))
+            assert response.status_code == 400
+        service.add_service.assert_not_called()
+        response = client.post('/service', data=dict(form, port='8080'))
+        assert response.status_code == 201
+        service.add_service.assert_called_once_with(
+            host_id='fake_id', name='nginx', detail='', port=8080)
@@ -0,0 +1,40 @@
+import os
+from unittest.mock import Mock
+
+from app.domain.entities import Host
+from app.views import host, permission, timing as view_timing
+from tests.unit.utils import FlaskAppEnvironment
+
+
+class TestServerTiming(FlaskAppEnvironment):
+    def test_header(self, app):
+        response = app.test_client().get('/nowhere')
+        phases = [entry.split(';')[0] for entry in
+                  response.headers['Server-Timing'].split(', ')]
+        assert phases == ['auth', 'json', 'total']
+
+    def test_profile(self, app, tmpdir, monkeypatch):
+        monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmpdir))
+        client = app.test_client()
+        assert 'X-Profile' not in client.get('/nowhere?profile=1').headers
+        monkeypatch.setattr(view_timing, 'is_valid_admin', lambda user: True)
+        response = client.get('/nowhere?profile=1')
+        assert os.listdir(str(tmpdir)) == [response.headers['X-Profile']]
+
+    def test_streamed_listing(self, app, tmpdir, monkeypatch):
+        monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmpdir))
+        monkeypatch.setitem(app.config, 'STREAM_HOST_LISTING', True)
+        monkeypatch.setattr(permission, 'is_valid_admin', lambda user: True)
+        monkeypatch.setattr(view_timing, 'is_valid_admin', lambda user: True)
+        monkeypatch.setattr(host, 'catalog_revision', lambda: 1)
+        monkeypatch.setattr(host, 'iterate_all_host', Mock(
+            side_effect=lambda *args, **kwargs: iter(
+                [Host('fake_id', 'localhost', None, '127.0.0.1')])))
+        client = app.test_client()
+        phases = [entry.split(';')[0] for entry in client.get(
+            '/host').headers['Server-Timing'].split(', ')]
+        assert phases[-1] == 'stream'
+        phases = [entry.split(';')[0] for entry in client.get(
+            '/host?profile=1').headers['Server-Timing'].split(', ')]
+        assert {'serialize', 'json'} <= set(phases)
+        assert 'stream' not in phases